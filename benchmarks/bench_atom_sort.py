@@ -0,0 +1,81 @@
+"""Atom ordering: dataclass(order=True) comparisons vs precomputed sort keys.
+
+    PYTHONPATH=src python benchmarks/bench_atom_sort.py [--atoms 50000]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+from rt_collab.services.crdt import Atom, TextCRDT, _atom_key
+
+
+@dataclass(order=True)
+class LegacyAtom:
+    pos: List[int] = field(compare=True)
+    site_id: str = field(compare=True)
+    counter: int = field(compare=True)
+    char: str = field(compare=False, default="")
+    deleted: bool = field(compare=False, default=False)
+
+
+def timed(fn: Callable[[], object], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atoms", type=int, default=50_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    sites = [f"site-{i}" for i in range(8)]
+    raw = [
+        ([rng.randrange(2**16) for _ in range(rng.randint(1, 4))], rng.choice(sites), i)
+        for i in range(args.atoms)
+    ]
+    legacy = [LegacyAtom(pos=p, site_id=s, counter=c) for p, s, c in raw]
+    keyed = [Atom(pos=p, site_id=s, counter=c) for p, s, c in raw]
+
+    results = {}
+    results["sort"] = (timed(lambda: sorted(legacy)), timed(lambda: sorted(keyed, key=_atom_key)))
+
+    legacy_sorted = sorted(legacy)
+    keyed_sorted = sorted(keyed, key=_atom_key)
+    probes = rng.sample(range(args.atoms), 10_000)
+    results["bisect x10k"] = (
+        timed(lambda: [bisect_left(legacy_sorted, legacy[i]) for i in probes]),
+        timed(lambda: [bisect_left(keyed_sorted, keyed[i].key, key=_atom_key) for i in probes]),
+    )
+
+    # Merging a remote batch: append then re-sort (timsort merges the new run)
+    batch = 1_000
+    results[f"merge {batch} atoms"] = (
+        timed(lambda: sorted(legacy_sorted + legacy[:batch])),
+        timed(lambda: sorted(keyed_sorted + keyed[:batch], key=_atom_key)),
+    )
+
+    print(f"{'operation':<20} {'dataclass ms':>13} {'sort key ms':>12} {'speedup':>8}")
+    for name, (old, new) in results.items():
+        print(f"{name:<20} {old:>13.1f} {new:>12.1f} {old / new:>7.1f}x")
+
+    doc = TextCRDT(site_id="bench")
+    chars = 5_000
+    start = time.perf_counter()
+    for i in range(chars):
+        doc.local_insert(rng.randint(0, i), "x")
+    elapsed = time.perf_counter() - start
+    print(f"\nlocal_insert at random carets: {chars / elapsed:,.0f} chars/s over {chars} chars")
+
+
+if __name__ == "__main__":
+    main()
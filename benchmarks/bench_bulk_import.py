@@ -0,0 +1,61 @@
+"""Bulk document import/export throughput for large texts.
+
+    PYTHONPATH=src python benchmarks/bench_bulk_import.py [--mb 1 4]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from rt_collab.services.crdt import TextCRDT
+
+
+def make_text(size: int, seed: int = 3) -> str:
+    rng = random.Random(seed)
+    words = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+    parts, total = [], 0
+    while total < size:
+        w = rng.choice(words) + (" " if rng.random() > 0.1 else ".\n")
+        parts.append(w)
+        total += len(w)
+    return "".join(parts)[:size]
+
+
+def mb_per_s(size: int, seconds: float) -> str:
+    return f"{size / 2**20 / seconds:8.2f} MB/s ({seconds * 1000:8.1f} ms)"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 4])
+    parser.add_argument("--baseline-kb", type=int, default=32, help="size for the per-char local_insert baseline")
+    args = parser.parse_args()
+
+    small = make_text(args.baseline_kb * 1024)
+    start = time.perf_counter()
+    TextCRDT(site_id="bench").local_insert(0, small)
+    print(f"local_insert baseline {args.baseline_kb:>5} KB: {mb_per_s(len(small), time.perf_counter() - start)}")
+
+    for mb in args.mb:
+        text = make_text(int(mb * 2**20))
+        start = time.perf_counter()
+        doc = TextCRDT.from_text("bench", text)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assert doc.to_string() == text
+        export_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        streamed = sum(len(chunk) for chunk in doc.iter_chunks())
+        stream_s = time.perf_counter() - start
+        assert streamed == len(text)
+
+        print(f"{mb:>6} MB from_text:   {mb_per_s(len(text), load_s)}")
+        print(f"{mb:>6} MB to_string:   {mb_per_s(len(text), export_s)}")
+        print(f"{mb:>6} MB iter_chunks: {mb_per_s(len(text), stream_s)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Version diff cost: atom-id diff from the history journal vs diffing two texts.
+
+Builds a large doc, applies a handful of small edits, then times
+`history.diff(A, B)` against rebuilding both texts and running difflib.
+
+    PYTHONPATH=src python benchmarks/bench_history_diff.py [--chars 200000] [--edits 50]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import difflib
+import random
+import time
+import uuid
+
+from rt_collab.services.docs import InMemoryDocStore
+from rt_collab.services.history import history
+
+
+async def main_async(chars: int, edits: int) -> None:
+    rng = random.Random(11)
+    store = InMemoryDocStore()
+    doc_id = uuid.uuid4()
+    lines = "".join(f"line {i} of the document\n" for i in range(chars // 24))
+    await store.create_from_text(doc_id, lines)
+    for _ in range(edits):
+        text, _ = await store.snapshot_text(doc_id)
+        if rng.random() < 0.5:
+            await store.local_delete(doc_id, rng.randrange(len(text)), 5)
+        else:
+            await store.local_insert(doc_id, rng.randrange(len(text)), "edit ")
+    doc = store.peek(doc_id)
+    a, b = 1, doc.version
+
+    start = time.perf_counter()
+    diff = history.diff(doc_id, doc.crdt, a, b)
+    atom_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    old = (await history.text_at(doc_id, a)).splitlines()
+    new = (await history.text_at(doc_id, b)).splitlines()
+    text_hunks = sum(1 for op in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes() if op[0] != "equal")
+    text_s = time.perf_counter() - start
+
+    print(f"{len(lines):,} chars, {edits} edits between v{a} and v{b}\n")
+    print(f"{'path':<28} {'ms':>9} {'hunks':>7}")
+    print(f"{'history.diff (atom ids)':<28} {atom_s * 1000:>9.2f} {len(diff.hunks):>7}")
+    print(f"{'text_at x2 + difflib lines':<28} {text_s * 1000:>9.2f} {text_hunks:>7}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chars", type=int, default=200_000)
+    parser.add_argument("--edits", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.chars, args.edits))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Event-loop stalls from big CRDT operations, inline vs on the executor.
+
+A ticker coroutine wakes every millisecond while large pastes are applied to
+a big doc through the doc store; the worst and p99 tick lateness is what every
+other socket on the worker would feel.
+
+    PYTHONPATH=src python benchmarks/bench_loop_lag.py [--doc-chars 200000] [--paste 20000] [--pastes 3]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import List
+
+from rt_collab.core.config import get_settings
+from rt_collab.services.crdt import TextCRDT
+from rt_collab.services.docs import InMemoryDocStore
+
+
+async def ticker(lags: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def run_case(workers: int, doc_chars: int, paste: int, pastes: int) -> None:
+    get_settings().crdt_offload_workers = workers
+    store = InMemoryDocStore()
+    doc_id = uuid.uuid4()
+    await store.create_from_text(doc_id, "lorem ipsum " * (doc_chars // 12))
+    # A client replica of the doc, so its pastes land where a real client's would
+    remote = TextCRDT(site_id="remote")
+    remote.apply({
+        "type": "ins_batch",
+        "atoms": [{"pos": a.pos, "site": a.site_id, "ctr": a.counter, "ch": a.char} for a in store.peek(doc_id).crdt.atoms()],
+    })
+    # Ops are generated up front: only the server side should be on the clock
+    ops = [remote.local_insert(doc_chars // 2, "x" * paste) for _ in range(pastes)]
+    lags: List[float] = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    for op in ops:
+        await store.apply_ops(doc_id, op)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    lags.sort()
+    p99 = lags[int(0.99 * (len(lags) - 1))]
+    label = "inline (workers=0)" if not workers else f"executor (workers={workers})"
+    print(f"{label:<22} {elapsed:>8.2f} {max(lags) * 1000:>10.1f} {p99 * 1000:>9.1f} {statistics.median(lags) * 1000:>9.2f}")
+
+
+async def main_async(doc_chars: int, paste: int, pastes: int) -> None:
+    print(f"{pastes} pastes of {paste:,} chars into a {doc_chars:,}-char doc\n")
+    print(f"{'path':<22} {'seconds':>8} {'max lag ms':>10} {'p99 ms':>9} {'p50 ms':>9}")
+    for workers in (0, 2):
+        await run_case(workers, doc_chars, paste, pastes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--doc-chars", type=int, default=200_000)
+    parser.add_argument("--paste", type=int, default=20_000)
+    parser.add_argument("--pastes", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.doc_chars, args.paste, args.pastes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Op-row insert throughput against a local SQLite file.
+
+Compares one ORM object per op, literal `insert().values([...])` batches,
+executemany via `bulk_insert`, and `OpLog.append_many` (executemany plus
+sequence allocation) with random (uuid4) and time-ordered (uuid7) keys.
+
+    PYTHONPATH=src python benchmarks/bench_oplog_insert.py [--rows 20000] [--docs 20]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+from typing import Awaitable, Callable, List
+
+from rt_collab.core.config import get_settings
+from rt_collab.db import database
+from rt_collab.db.models import Base, Document, Operation
+from rt_collab.services.oplog import ID_SCHEMES, OpLog, OpRecord
+
+
+def make_records(rows: int, doc_ids: List[str], rng: random.Random) -> List[OpRecord]:
+    return [
+        OpRecord(
+            document_id=rng.choice(doc_ids),
+            client_id=f"client-{rng.randrange(50)}",
+            payload={"type": "ins", "pos": [rng.randrange(2**16), rng.randrange(2**17)], "ch": "x"},
+            applied_to_version=i,
+        )
+        for i in range(rows)
+    ]
+
+
+async def fresh_db(path: str, doc_ids: List[str]) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+    get_settings().database_url = f"sqlite+aiosqlite:///{path}"
+    await database.dispose_engine()
+    async with database.get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with database.bulk_session() as session:
+        await database.bulk_insert(session, Document.__table__, ({"id": d, "title": "bench"} for d in doc_ids))
+
+
+async def orm_per_row(records: List[OpRecord]) -> None:
+    seq = {}
+    async with database.get_session() as session:
+        for r in records:
+            seq[r.document_id] = seq.get(r.document_id, 0) + 1
+            session.add(
+                Operation(
+                    document_id=r.document_id,
+                    client_id=r.client_id,
+                    logical_ts=seq[r.document_id],
+                    payload_json=r.payload,
+                    applied_to_version=r.applied_to_version,
+                )
+            )
+            await session.flush()
+
+
+async def executemany(records: List[OpRecord]) -> None:
+    seq = {}
+    rows = []
+    for r in records:
+        seq[r.document_id] = seq.get(r.document_id, 0) + 1
+        rows.append(
+            {
+                "id": ID_SCHEMES["uuid4"](),
+                "document_id": r.document_id,
+                "client_id": r.client_id,
+                "logical_ts": seq[r.document_id],
+                "payload_json": r.payload,
+                "applied_to_version": r.applied_to_version,
+            }
+        )
+    async with database.bulk_session() as session:
+        await database.bulk_insert(session, Operation.__table__, rows)
+
+
+async def values_batches(records: List[OpRecord]) -> None:
+    # Literal multi-row VALUES per batch: one freshly compiled statement each time
+    from sqlalchemy import insert
+
+    rows = [
+        {
+            "id": ID_SCHEMES["uuid4"](),
+            "document_id": r.document_id,
+            "client_id": r.client_id,
+            "logical_ts": i,
+            "payload_json": r.payload,
+            "applied_to_version": r.applied_to_version,
+        }
+        for i, r in enumerate(records)
+    ]
+    size = get_settings().db_bulk_batch_size
+    async with database.bulk_session() as session:
+        for start in range(0, len(rows), size):
+            await session.execute(insert(Operation.__table__).values(rows[start : start + size]))
+
+
+def append_many(scheme: str) -> Callable[[List[OpRecord]], Awaitable[None]]:
+    async def run(records: List[OpRecord]) -> None:
+        async with database.bulk_session() as session:
+            await OpLog(id_scheme=scheme).append_many(session, records)
+
+    return run
+
+
+async def main_async(rows: int, docs: int) -> None:
+    rng = random.Random(7)
+    doc_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(docs)]
+    records = make_records(rows, doc_ids, rng)
+    path = os.path.join(tempfile.gettempdir(), "rt_collab_bench_oplog.db")
+    cases = [
+        ("orm add+flush per row", orm_per_row),
+        ("insert().values batches", values_batches),
+        ("executemany (uuid4)", executemany),
+        ("append_many (uuid4)", append_many("uuid4")),
+        ("append_many (uuid7)", append_many("uuid7")),
+    ]
+    print(f"{rows:,} op rows across {docs} docs, SQLite at {path}\n")
+    print(f"{'path':<24} {'seconds':>8} {'rows/s':>10}")
+    for name, fn in cases:
+        # The ORM path is orders of magnitude slower; a slice is enough to rate it
+        subset = records[: min(len(records), 2_000)] if fn is orm_per_row else records
+        await fresh_db(path, doc_ids)
+        start = time.perf_counter()
+        await fn(subset)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<24} {elapsed:>8.2f} {len(subset) / elapsed:>10,.0f}")
+    await database.dispose_engine()
+    os.remove(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--docs", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.rows, args.docs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Task queue throughput with batch handlers on vs off.
+
+Enqueues bursts of `email.notify` jobs (a few docs, several recipients each)
+and `snapshot.create` jobs spread over docs, then times how long the worker
+takes to drain them with the default handlers registered with and without
+batching.
+
+    PYTHONPATH=src python benchmarks/bench_queue_batching.py [--jobs 20000] [--docs 50]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Dict, List
+
+from rt_collab.core.config import get_settings
+from rt_collab.services.docs import store
+from rt_collab.services.job_handlers import register_default_handlers
+from rt_collab.services.notifications import notification_log
+from rt_collab.services.snapshots import snapshots
+from rt_collab.services.task_queue import JobStatus, TaskQueue
+
+
+async def drain(job_type: str, payloads: List[Dict[str, object]], batch_max: int) -> float:
+    settings = get_settings()
+    settings.queue_batch_max = batch_max
+    queue = TaskQueue()
+    register_default_handlers(queue)
+    jobs = [await queue.enqueue(job_type, payload) for payload in payloads]
+    start = time.perf_counter()
+    await queue.start()
+    last = jobs[-1]
+    while queue.get_job(last.id).status not in (JobStatus.succeeded, JobStatus.failed, JobStatus.dead):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    await queue.stop()
+    assert all(j.status == JobStatus.succeeded for j in jobs)
+    return elapsed
+
+
+async def main_async(jobs: int, docs: int) -> None:
+    doc_ids = [uuid.uuid4() for _ in range(docs)]
+    for i, doc_id in enumerate(doc_ids):
+        await store.create_from_text(doc_id, f"document {i} " * 200)
+    workloads = {
+        "email.notify": [
+            {"doc_id": str(doc_ids[i % 3]), "recipients": [f"user{r}@example.com" for r in range(4)], "message": "edited"}
+            for i in range(jobs)
+        ],
+        "snapshot.create": [{"doc_id": str(doc_ids[i % docs])} for i in range(jobs)],
+    }
+    print(f"{jobs:,} jobs per run, {docs} docs\n")
+    print(f"{'job type':<16} {'mode':<14} {'seconds':>8} {'jobs/s':>10}")
+    for job_type, payloads in workloads.items():
+        for mode, batch_max in (("single", 1), ("batch<=100", 100)):
+            await notification_log.reset()
+            await snapshots.reset()
+            elapsed = await drain(job_type, payloads, batch_max)
+            print(f"{job_type:<16} {mode:<14} {elapsed:>8.2f} {len(payloads) / elapsed:>10,.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=20_000)
+    parser.add_argument("--docs", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.jobs, args.docs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Startup cost: `import rt_collab.main` time and uvicorn time-to-first-accept.
+
+Each sample runs in a fresh interpreter so import caches don't flatter later runs.
+Also lists the slowest modules from `python -X importtime`.
+
+    PYTHONPATH=src python benchmarks/bench_startup.py [--runs 5] [--top 10]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Tuple
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import rt_collab.main; print(time.perf_counter() - t)"
+HEAVY = ("sqlalchemy", "redis", "uvicorn", "rt_collab.services.job_handlers")
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (src, env.get("PYTHONPATH")) if p)
+    return env
+
+
+def import_seconds() -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], env=_env(), capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def loaded_heavy_modules() -> List[str]:
+    snippet = f"import sys, rt_collab.main; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", snippet], env=_env(), capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+def slowest_imports(top: int) -> List[Tuple[int, str]]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import rt_collab.main"], env=_env(), capture_output=True, text=True
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", line)
+        # Only first-level imports, so cumulative times don't double count
+        if m and len(m.group(3)) <= 3:
+            rows.append((int(m.group(2)), m.group(4)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_accept_seconds(timeout: float = 30.0) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "rt_collab.main:app", "--port", str(port), "--log-level", "warning",
+         "--ws", "rt_collab.ws.transport:DeflateWebSocketProtocol"],
+        env=_env(),
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=0.5) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("server did not come up")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    imports = [import_seconds() * 1000 for _ in range(args.runs)]
+    accepts = [first_accept_seconds() * 1000 for _ in range(args.runs)]
+    print(f"{'metric':<28} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for name, samples in (("import rt_collab.main", imports), ("spawn -> first /healthz", accepts)):
+        print(f"{name:<28} {statistics.median(samples):>10.1f} {min(samples):>8.1f} {max(samples):>8.1f}")
+    heavy = loaded_heavy_modules()
+    print(f"\nheavy modules loaded at import: {', '.join(heavy) if heavy else 'none'}")
+    print("\nslowest top-level imports (cumulative ms):")
+    for micros, module in slowest_imports(args.top):
+        print(f"  {micros / 1000:>8.1f}  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""WebSocket frame codecs: JSON text vs the rtc.msgpack.v1 binary subprotocol.
+
+Reports bytes on the wire and encode/decode time per frame for representative
+ops, acks and presence frames.
+
+    PYTHONPATH=src python benchmarks/bench_ws_codec.py [--doc-chars 20000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from rt_collab.services.crdt import TextCRDT, anchor_to_wire
+from rt_collab.ws.codec import packb, unpackb
+
+try:
+    import orjson
+except ImportError:  # optional: only adds a reference column
+    orjson = None
+
+
+def per_call_us(fn: Callable[[], object], budget_s: float = 0.2) -> float:
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget_s:
+            return elapsed / calls * 1e6
+
+
+def build_frames(doc_chars: int, rng: random.Random) -> Dict[str, Any]:
+    doc = TextCRDT(site_id="bench-site")
+    for i in range(doc_chars // 20):
+        doc.local_insert(rng.randint(0, i * 20), "lorem ipsum dolor s ")
+    text = doc.to_string()
+    mid = len(text) // 2
+    cursors = {}
+    for n in range(20):
+        idx = rng.randint(0, len(text))
+        cursors[f"client-{n:02d}"] = {
+            "data": {"index": idx, "end": idx, "anchor": anchor_to_wire(doc.anchor_at(idx))},
+            "ts": 1_760_000_000_000 + n,
+        }
+    return {
+        "op.submit (1 char)": {"type": "op.submit", "op": doc.local_insert(mid, "x")},
+        "op.submit (paste 200)": {"type": "op.submit", "op": doc.local_insert(mid, "y" * 200)},
+        "op.submit (delete 50)": {"type": "op.submit", "op": doc.local_delete(mid, 50)},
+        "edit.insert": {"type": "edit.insert", "index": mid, "text": "x"},
+        "ack (no text)": {"type": "ack", "version": 123_456},
+        f"ack ({len(text)} chars)": {"type": "ack", "version": 123_457, "text": doc.to_string()},
+        "presence (20 cursors)": {"type": "presence", "updated": cursors, "removed": ["client-99"]},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--doc-chars", type=int, default=20_000)
+    args = parser.parse_args()
+
+    codecs: List[Tuple[str, Callable[[Any], Any], Callable[[Any], Any]]] = [
+        ("json", json.dumps, json.loads),
+        ("msgpack", packb, unpackb),
+    ]
+    if orjson is not None:
+        codecs.append(("orjson", orjson.dumps, orjson.loads))
+
+    frames = build_frames(args.doc_chars, random.Random(7))
+    header = f"{'frame':<24}" + "".join(f"{name + ' B':>14}{'enc us':>9}{'dec us':>9}" for name, _, _ in codecs)
+    print(header)
+    for label, frame in frames.items():
+        row = f"{label:<24}"
+        for _, encode, decode in codecs:
+            wire = encode(frame)
+            size = len(wire.encode() if isinstance(wire, str) else wire)
+            row += f"{size:>14,}{per_call_us(lambda: encode(frame)):>9.1f}{per_call_us(lambda: decode(wire)):>9.1f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Request
+from starlette.responses import Response, StreamingResponse
+
+from rt_collab.services.artifacts import Artifact, artifacts
+
+
+router = APIRouter(prefix="/v1")
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Resolve a single `bytes=` range to inclusive offsets; None means serve the whole body."""
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None  # multi-range or unknown unit: ignoring Range is allowed
+    first, last = match.groups()
+    if (not first and not last) or size == 0:
+        return None  # nothing to slice out of an empty artifact: serve it whole
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("unsatisfiable")
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable")
+    return start, end
+
+
+def _headers(artifact: Artifact) -> dict[str, str]:
+    return {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{artifact.filename}"',
+    }
+
+
+@router.get("/artifacts/{artifact_id}")
+async def download_artifact(artifact_id: str, request: Request) -> Any:
+    artifact = artifacts.get(artifact_id)
+    if not artifact:
+        raise HTTPException(status_code=404, detail="not_found")
+    headers = _headers(artifact)
+    range_header = request.headers.get("range")
+    if range_header:
+        try:
+            byte_range = _parse_range(range_header, artifact.size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{artifact.size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{artifact.size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                artifacts.iter_bytes(artifact, start, end),
+                status_code=206,
+                media_type=artifact.content_type,
+                headers=headers,
+            )
+    # No Content-Length: the body goes out with chunked transfer encoding
+    return StreamingResponse(artifacts.iter_bytes(artifact), media_type=artifact.content_type, headers=headers)
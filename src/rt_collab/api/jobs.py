@@ -4,10 +4,11 @@ import uuid
 from datetime import datetime
 from typing import Any, Dict
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel, Field
 
-from rt_collab.services.task_queue import Job, task_queue
+from rt_collab.core.config import get_settings
+from rt_collab.services.task_queue import Job, Schedule, task_queue
 
 
 router = APIRouter(prefix="/v1")
@@ -18,9 +19,28 @@ ALLOWED_JOB_TYPES = {
     "activity.digest",
     "email.notify",
     "backup.run",
+    "ops.compact",
 }
 
 
+def parse_api_keys(spec: str) -> Dict[str, str]:
+    """`"k1=acme,k2=globex"` -> {"k1": "acme", "k2": "globex"}."""
+    keys = {}
+    for part in spec.split(","):
+        key, _, tenant = part.partition("=")
+        if key.strip() and tenant.strip():
+            keys[key.strip()] = tenant.strip()
+    return keys
+
+
+def request_tenant(request: Request) -> str | None:
+    # Jobs are fair-queued per tenant. The tenant comes from the server's key
+    # table, never from the request itself, so a caller can't pick a fresh
+    # (unthrottled) tenant per request or pose as someone else
+    api_key = request.headers.get("x-api-key")
+    return parse_api_keys(get_settings().tenant_api_keys).get(api_key) if api_key else None
+
+
 class JobCreateRequest(BaseModel):
     type: str = Field(..., description="Job type identifier")
     payload: Dict[str, Any] = Field(default_factory=dict)
@@ -36,10 +56,12 @@ class JobResponse(BaseModel):
     max_attempts: int
     idempotency_key: str | None
     request_id: str | None
+    tenant: str = "default"
     enqueued_at: datetime
     next_run_at: datetime
     result: Dict[str, Any] | None
     error: str | None
+    progress: Dict[str, Any] | None = None
 
 
 def _serialize_job(job: Job) -> Dict[str, Any]:
@@ -51,10 +73,12 @@ def _serialize_job(job: Job) -> Dict[str, Any]:
         "max_attempts": job.max_attempts,
         "idempotency_key": job.idempotency_key,
         "request_id": job.request_id,
+        "tenant": job.tenant,
         "enqueued_at": job.enqueued_at,
         "next_run_at": job.next_run_at,
         "result": job.result,
         "error": job.error,
+        "progress": job.progress,
     }
 
 
@@ -68,6 +92,7 @@ async def create_job(req: JobCreateRequest, request: Request) -> Any:
         idempotency_key=req.idempotency_key,
         max_attempts=req.max_attempts,
         request_id=getattr(request.state, "request_id", None),
+        tenant=request_tenant(request),
     )
     return _serialize_job(job)
 
@@ -86,3 +111,102 @@ async def list_jobs(status: str | None = None) -> Any:
     if status:
         jobs = [j for j in jobs if j.status == status]
     return [_serialize_job(j) for j in jobs]
+
+
+class ScheduleCreateRequest(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    type: str
+    payload: Dict[str, Any] = Field(default_factory=dict)
+    every_s: float | None = Field(default=None, description="Interval in seconds (epoch-aligned)")
+    cron: str | None = Field(default=None, description="Five-field cron expression, UTC")
+    jitter_s: float | None = Field(default=None, description="Random delay added to each run; default SCHEDULE_JITTER_S")
+
+
+class ScheduleResponse(BaseModel):
+    name: str
+    type: str
+    payload: Dict[str, Any]
+    every_s: float | None
+    cron: str | None
+    jitter_s: float
+    tenant: str | None
+    paused: bool
+    next_run_at: datetime | None
+    last_run_at: datetime | None
+    last_job_id: uuid.UUID | None
+    runs: int
+    skipped: int
+
+
+def _serialize_schedule(schedule: Schedule) -> Dict[str, Any]:
+    return {
+        "name": schedule.name,
+        "type": schedule.job_type,
+        "payload": schedule.payload,
+        "every_s": schedule.every_s,
+        "cron": schedule.cron,
+        "jitter_s": schedule.jitter_s,
+        "tenant": schedule.tenant,
+        "paused": schedule.paused,
+        "next_run_at": None if schedule.paused else schedule.next_run_at,
+        "last_run_at": schedule.last_run_at,
+        "last_job_id": schedule.last_job_id,
+        "runs": schedule.runs,
+        "skipped": schedule.skipped,
+    }
+
+
+@router.get("/schedules", response_model=list[ScheduleResponse])
+async def list_schedules() -> Any:
+    return [_serialize_schedule(s) for s in task_queue.schedules()]
+
+
+@router.post("/schedules", response_model=ScheduleResponse)
+async def create_schedule(req: ScheduleCreateRequest, request: Request) -> Any:
+    if req.type not in ALLOWED_JOB_TYPES:
+        raise HTTPException(status_code=400, detail="unsupported_type")
+    jitter = req.jitter_s if req.jitter_s is not None else get_settings().schedule_jitter_s
+    try:
+        schedule = Schedule(
+            req.name,
+            req.type,
+            req.payload,
+            every_s=req.every_s,
+            cron=req.cron,
+            jitter_s=max(0.0, jitter),
+            tenant=request_tenant(request),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _serialize_schedule(task_queue.add_schedule(schedule))
+
+
+@router.get("/schedules/{name}", response_model=ScheduleResponse)
+async def get_schedule(name: str) -> Any:
+    schedule = task_queue.get_schedule(name)
+    if not schedule:
+        raise HTTPException(status_code=404, detail="not_found")
+    return _serialize_schedule(schedule)
+
+
+@router.post("/schedules/{name}/pause", response_model=ScheduleResponse)
+async def pause_schedule(name: str) -> Any:
+    schedule = task_queue.pause_schedule(name, True)
+    if not schedule:
+        raise HTTPException(status_code=404, detail="not_found")
+    return _serialize_schedule(schedule)
+
+
+@router.post("/schedules/{name}/resume", response_model=ScheduleResponse)
+async def resume_schedule(name: str) -> Any:
+    schedule = task_queue.pause_schedule(name, False)
+    if not schedule:
+        raise HTTPException(status_code=404, detail="not_found")
+    return _serialize_schedule(schedule)
+
+
+@router.delete("/schedules/{name}", status_code=204)
+async def delete_schedule(name: str) -> Response:
+    if not task_queue.remove_schedule(name):
+        raise HTTPException(status_code=404, detail="not_found")
+    return Response(status_code=204)
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
 import uuid
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, List
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from rt_collab.api.jobs import JobResponse
+from rt_collab.api.jobs import JobResponse, request_tenant
 from rt_collab.services.docs import store
-from rt_collab.services.task_queue import Job, task_queue
+from rt_collab.services.exporters import EXPORT_FORMATS
+from rt_collab.services.history import history
+from rt_collab.services.result_cache import result_cache
+from rt_collab.services.search import search_index
+from rt_collab.services.snapshot_cache import snapshot_cache
+from rt_collab.services.task_queue import Job
 
 
 router = APIRouter(prefix="/v1")
@@ -17,19 +24,24 @@ router = APIRouter(prefix="/v1")
 class CreateDocRequest(BaseModel):
     title: str = "Untitled"
     created_by: str | None = None
+    content: str | None = None  # optional initial text, bulk-loaded in one pass
 
 
 class CreateDocResponse(BaseModel):
     id: uuid.UUID
     title: str
+    version: int = 0
 
 
 @router.post("/docs", response_model=CreateDocResponse)
 async def create_doc(req: CreateDocRequest) -> Any:
     # In-memory only for MVP; DB persistence can be added later
     doc_id = uuid.uuid4()
-    await store.get_or_create(doc_id)
-    return CreateDocResponse(id=doc_id, title=req.title)
+    if req.content:
+        doc = await store.create_from_text(doc_id, req.content)
+    else:
+        doc = await store.get_or_create(doc_id)
+    return CreateDocResponse(id=doc_id, title=req.title, version=doc.version)
 
 
 class GetDocResponse(BaseModel):
@@ -38,19 +50,101 @@ class GetDocResponse(BaseModel):
     version: int
 
 
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison (RFC 9110 13.1.2): W/ prefixes don't matter for GET
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
 @router.get("/docs/{doc_id}", response_model=GetDocResponse)
-async def get_doc(doc_id: uuid.UUID) -> Any:
+async def get_doc(doc_id: uuid.UUID, request: Request, version: int | None = None) -> Any:
+    if version is not None:
+        return await _get_doc_version(doc_id, version)
+    # Body is spliced around the cached JSON encoding of the text, shared with WebSocket joins
+    entry = await snapshot_cache.get(doc_id, "json")
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    body = b'{"id": "%s", "text": %s, "version": %d}' % (str(doc_id).encode(), entry.payload, entry.version)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _get_doc_version(doc_id: uuid.UUID, version: int) -> Any:
     try:
-        text, version = await store.snapshot_text(doc_id)
-    except Exception as e:  # noqa: F841
-        # If not created yet, return empty
-        await store.get_or_create(doc_id)
-        text, version = "", 0
-    return GetDocResponse(id=doc_id, text=text, version=version)
+        text = await history.text_at(doc_id, version)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="version_unavailable")
+    # A past version never changes, so caches may keep it
+    headers = {"ETag": f'"{doc_id}-v{version}"', "Cache-Control": "max-age=86400, immutable"}
+    body = GetDocResponse(id=doc_id, text=text, version=version).model_dump_json()
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class HistoryEntry(BaseModel):
+    version: int
+    at: datetime
+    inserted: int
+    deleted: int
+    checkpoint: bool
+
+
+class HistoryResponse(BaseModel):
+    id: uuid.UUID
+    current_version: int
+    entries: List[HistoryEntry]
+
+
+@router.get("/docs/{doc_id}/history", response_model=HistoryResponse)
+async def get_doc_history(doc_id: uuid.UUID, limit: int = 50, before: int | None = None) -> Any:
+    current = history.current_version(doc_id)
+    if current is None:
+        raise HTTPException(status_code=404, detail="not_found")
+    entries = history.listing(doc_id, before=before, limit=max(1, min(limit, 1000)))
+    return HistoryResponse(id=doc_id, current_version=current, entries=entries)
+
+
+@router.get("/docs/{doc_id}/diff")
+async def diff_doc_versions(
+    doc_id: uuid.UUID, from_version: int = Query(alias="from"), to_version: int | None = Query(None, alias="to")
+) -> Any:
+    """NDJSON: a totals line, then inserted/deleted runs of atoms between the two versions."""
+    doc = store.peek(doc_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="not_found")
+    to_version = doc.version if to_version is None else to_version
+    if from_version > to_version:
+        raise HTTPException(status_code=400, detail="bad_range")
+    try:
+        diff = await store.diff(doc_id, from_version, to_version)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="version_unavailable")
+    return StreamingResponse(diff.iter_ndjson(doc_id), media_type="application/x-ndjson")
+
+
+class SearchResult(BaseModel):
+    doc_id: uuid.UUID
+    score: float
+    matches: Dict[str, int]
+
+
+class SearchResponse(BaseModel):
+    query: str
+    total: int
+    offset: int
+    results: List[SearchResult]
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_docs(q: str, limit: int = 20, offset: int = 0) -> Any:
+    page = search_index.search(q, limit=max(1, min(limit, 100)), offset=max(0, offset))
+    results = [SearchResult(doc_id=hit.doc_id, score=hit.score, matches=hit.matches) for hit in page.hits]
+    return SearchResponse(query=q, total=page.total, offset=offset, results=results)
 
 
 class ExportDocRequest(BaseModel):
-    format: str = "markdown"
+    format: str = "markdown"  # plain | markdown | html
 
 
 def _job_to_response(job: Job) -> JobResponse:
@@ -62,30 +156,38 @@ def _job_to_response(job: Job) -> JobResponse:
         max_attempts=job.max_attempts,
         idempotency_key=job.idempotency_key,
         request_id=job.request_id,
+        tenant=job.tenant,
         enqueued_at=job.enqueued_at,
         next_run_at=job.next_run_at,
         result=job.result,
         error=job.error,
+        progress=job.progress,
     )
 
 
 @router.post("/docs/{doc_id}/export", response_model=JobResponse)
 async def export_doc(doc_id: uuid.UUID, req: ExportDocRequest, request: Request) -> Any:
-    job = await task_queue.enqueue(
+    if req.format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="unsupported_format")
+    # One render per (doc, version, format); repeats at the same version reuse it
+    job = await result_cache.submit(
         "doc.export",
+        doc_id,
         {"doc_id": str(doc_id), "format": req.format},
-        idempotency_key=f"export-{doc_id}-{req.format}",
+        variant=req.format,
         request_id=getattr(request.state, "request_id", None),
+        tenant=request_tenant(request),
     )
     return _job_to_response(job)
 
 
 @router.post("/docs/{doc_id}/digest", response_model=JobResponse)
 async def digest_doc(doc_id: uuid.UUID, request: Request) -> Any:
-    job = await task_queue.enqueue(
+    job = await result_cache.submit(
         "activity.digest",
+        doc_id,
         {"doc_id": str(doc_id)},
-        idempotency_key=f"digest-{doc_id}",
         request_id=getattr(request.state, "request_id", None),
+        tenant=request_tenant(request),
     )
     return _job_to_response(job)
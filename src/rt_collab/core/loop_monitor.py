@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import List
+
+from rt_collab.core.config import get_settings
+from rt_collab.core.metrics import LOOP_LAG_BUCKETS_S, Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Measures how long the event loop is blocked.
+
+    A task sleeps LOOP_LAG_INTERVAL_MS at a time and records how late each
+    wake-up is; that lateness is time the loop spent running something else
+    without yielding. A watchdog thread checks the task's heartbeat, and when
+    the loop has been stuck past LOOP_LAG_WARN_MS it logs the loop thread's
+    current stack, which names the code doing the blocking while it happens.
+    """
+
+    def __init__(self) -> None:
+        self.lag = Histogram(LOOP_LAG_BUCKETS_S)
+        self.stalls = 0
+        self.max_lag_s = 0.0
+        self.last_stall_stack: str | None = None
+        self._beat = 0.0  # perf_counter() when the sampling task last went to sleep
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    def record(self, lag_s: float) -> None:
+        self.lag.observe(lag_s)
+        self.max_lag_s = max(self.max_lag_s, lag_s)
+        if lag_s * 1000 >= get_settings().loop_lag_warn_ms:
+            self.stalls += 1
+            logger.warning("event loop was blocked for %.0f ms", lag_s * 1000)
+
+    async def _run(self) -> None:
+        while True:
+            interval = get_settings().loop_lag_interval_ms / 1000
+            start = self._beat = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.record(max(0.0, time.perf_counter() - start - interval))
+
+    def _watch(self) -> None:
+        reported = 0.0
+        while not self._stopping.wait(get_settings().loop_lag_interval_ms / 2000):
+            settings = get_settings()
+            beat = self._beat
+            late_s = time.perf_counter() - beat - settings.loop_lag_interval_ms / 1000
+            if beat == reported or late_s * 1000 < settings.loop_lag_warn_ms:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            reported = beat
+            self.last_stall_stack = "".join(traceback.format_stack(frame))
+            logger.warning("event loop blocked for %.0f ms so far, in:\n%s", late_s * 1000, self.last_stall_stack)
+
+    async def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def render(self) -> List[str]:
+        lines = self.lag.render("event_loop_lag_seconds", "How late the loop woke a sampling timer (time spent blocked)")
+        lines += [
+            "# HELP event_loop_stalls_total Samples where the loop was blocked longer than LOOP_LAG_WARN_MS",
+            "# TYPE event_loop_stalls_total counter",
+            f"event_loop_stalls_total {self.stalls}",
+            "# HELP event_loop_max_lag_seconds Longest blocked-loop sample since start",
+            "# TYPE event_loop_max_lag_seconds gauge",
+            f"event_loop_max_lag_seconds {self.max_lag_s:.6f}",
+        ]
+        return lines
+
+
+loop_monitor = LoopLagMonitor()
@@ -1,7 +1,21 @@
 from __future__ import annotations
 
+import os
+import resource
 import statistics
-from typing import Dict, List
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+
+def process_rss_bytes() -> int:
+    """Current resident set size of this process (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            resident_pages = int(fh.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is KiB on Linux, bytes on macOS; treat it as KiB
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
 
 
 class QueueMetrics:
@@ -15,6 +29,8 @@ class QueueMetrics:
         }
         self.retries: int = 0
         self.latencies_ms: List[float] = []
+        self.batches: int = 0
+        self.batched_jobs: int = 0
 
     def record_status(self, status: str) -> None:
         self.status_counts[status] = self.status_counts.get(status, 0) + 1
@@ -22,6 +38,10 @@ class QueueMetrics:
     def record_retry(self) -> None:
         self.retries += 1
 
+    def record_batch(self, size: int) -> None:
+        self.batches += 1
+        self.batched_jobs += size
+
     def record_latency(self, latency_ms: float) -> None:
         self.latencies_ms.append(latency_ms)
 
@@ -38,3 +58,116 @@ class QueueMetrics:
             "p95_latency_ms": self.p95_latency_ms(),
             **self.status_counts,
         }
+
+
+class WsMetrics:
+    def __init__(self) -> None:
+        # Inbound edit ops rejected, by scope: connection / document bucket or a full inbound queue
+        self.throttled: Dict[str, int] = {"connection": 0, "document": 0, "inbound_queue": 0}
+
+    def record_throttle(self, scope: str) -> None:
+        self.throttled[scope] = self.throttled.get(scope, 0) + 1
+
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in Prometheus text format."""
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts: List[int] = [0] * len(self.buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.total += 1
+        self.sum += value
+        i = bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+
+    def render(self, name: str, help_text: str) -> List[str]:
+        return [f"# HELP {name} {help_text}", f"# TYPE {name} histogram", *self.series(name)]
+
+    def series(self, name: str, labels: str = "") -> List[str]:
+        """Sample lines only; `labels` like 'tenant="a"' is prepended to each label set."""
+        prefix = f"{labels}," if labels else ""
+        suffix = f"{{{labels}}}" if labels else ""
+        lines = []
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {running}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.total}')
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.total}")
+        return lines
+
+
+LATENCY_BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LOOP_LAG_BUCKETS_S = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUEUE_WAIT_BUCKETS_S = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0)
+
+
+def label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class TenantQueueMetrics:
+    """Per-tenant queue wait (ready -> started), jobs finished and handler busy time."""
+
+    def __init__(self) -> None:
+        self.wait: Dict[str, Histogram] = {}
+        self.completed: Dict[str, int] = {}
+        self.busy_s: Dict[str, float] = {}
+
+    def record_wait(self, tenant: str, wait_s: float) -> None:
+        hist = self.wait.get(tenant)
+        if hist is None:
+            hist = self.wait[tenant] = Histogram(QUEUE_WAIT_BUCKETS_S)
+        hist.observe(wait_s)
+
+    def record_done(self, tenant: str, jobs: int, busy_s: float) -> None:
+        self.completed[tenant] = self.completed.get(tenant, 0) + jobs
+        self.busy_s[tenant] = self.busy_s.get(tenant, 0.0) + busy_s
+
+    def forget(self, tenant: str) -> None:
+        self.wait.pop(tenant, None)
+        self.completed.pop(tenant, None)
+        self.busy_s.pop(tenant, None)
+
+    def render(self, depths: Dict[str, int], running: Dict[str, int]) -> List[str]:
+        lines: List[str] = []
+        for name, kind, help_text, values in (
+            ("queue_tenant_depth", "gauge", "Jobs queued per tenant", depths),
+            ("queue_tenant_running", "gauge", "Handler calls in flight per tenant", running),
+            ("queue_tenant_jobs_completed_total", "counter", "Jobs finished per tenant", self.completed),
+            ("queue_tenant_busy_seconds_total", "counter", "Handler time spent per tenant", self.busy_s),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f'{name}{{tenant="{label_value(t)}"}} {v:g}' for t, v in sorted(values.items())]
+        lines += [
+            "# HELP queue_tenant_wait_seconds Time from ready to started per tenant",
+            "# TYPE queue_tenant_wait_seconds histogram",
+        ]
+        for tenant, hist in sorted(self.wait.items()):
+            lines += hist.series("queue_tenant_wait_seconds", f'tenant="{label_value(tenant)}"')
+        return lines
+
+
+class DbMetrics:
+    def __init__(self) -> None:
+        self.query_latency = Histogram(LATENCY_BUCKETS_S)
+        # Time to get a pooled connection (includes connecting when the pool grows)
+        self.pool_wait = Histogram(LATENCY_BUCKETS_S)
+        self.pool_events: Dict[str, int] = {"checkout": 0, "checkin": 0, "connect": 0, "invalidate": 0}
+
+    def record_pool_event(self, event: str) -> None:
+        self.pool_events[event] = self.pool_events.get(event, 0) + 1
+
+    def render(self) -> List[str]:
+        lines = ["# HELP db_pool_events_total Connection pool events", "# TYPE db_pool_events_total counter"]
+        for event, count in self.pool_events.items():
+            lines.append(f'db_pool_events_total{{event="{event}"}} {count}')
+        lines += self.pool_wait.render("db_pool_wait_seconds", "Time spent acquiring a pooled connection")
+        lines += self.query_latency.render("db_query_latency_seconds", "Statement execution latency")
+        return lines
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from rt_collab.core.config import get_settings
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+
+# Lazily built like the DB engine: the client (and redis-py itself) is only
+# imported once something actually talks to Redis.
+_client: "Redis | None" = None
+
+
+def get_redis() -> "Redis":
+    global _client
+    if _client is None:
+        from redis.asyncio import Redis
+
+        _client = Redis.from_url(get_settings().redis_url)
+    return _client
+
+
+async def close_redis() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
@@ -1,24 +1,111 @@
 from __future__ import annotations
 
+import time
 from contextlib import asynccontextmanager
-
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterable, Mapping, Sequence
 
 from rt_collab.core.config import get_settings
+from rt_collab.core.metrics import DbMetrics
+
+if TYPE_CHECKING:
+    from sqlalchemy import Table
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+
+# Created on first use rather than at import: importing the app (tests, CLI
+# tools, worker boot) shouldn't need SQLAlchemy's async stack or a DB driver.
+_engine: "AsyncEngine | None" = None
+_sessionmaker: "async_sessionmaker[AsyncSession] | None" = None
+
+metrics = DbMetrics()
+
+
+def _pool_kwargs(url: str) -> Dict[str, Any]:
+    settings = get_settings()
+    kwargs: Dict[str, Any] = {"pool_pre_ping": settings.db_pool_pre_ping, "pool_recycle": settings.db_pool_recycle}
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":")):
+        # In-memory SQLite uses a single shared connection; sizing doesn't apply
+        return kwargs
+    kwargs.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
+    return kwargs
+
+
+def _instrument(engine: "AsyncEngine") -> None:
+    from sqlalchemy import event
+
+    sync_engine = engine.sync_engine
+
+    # The start time lives on the per-statement execution context, so a
+    # statement that raises (and never reaches after_cursor_execute) leaves
+    # nothing behind on the connection
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+        context._rtc_query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):  # type: ignore[no-untyped-def]
+        metrics.query_latency.observe(time.perf_counter() - context._rtc_query_start)
+
+    for name in ("checkout", "checkin", "connect", "invalidate"):
+        event.listen(sync_engine.pool, name, lambda *args, _name=name: metrics.record_pool_event(_name))
+
+
+def get_engine() -> "AsyncEngine":
+    global _engine
+    if _engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        url = get_settings().database_url
+        _engine = create_async_engine(url, future=True, echo=False, **_pool_kwargs(url))
+        _instrument(_engine)
+    return _engine
 
 
-settings = get_settings()
+def get_sessionmaker() -> "async_sessionmaker[AsyncSession]":
+    global _sessionmaker
+    if _sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
 
-engine: AsyncEngine = create_async_engine(settings.database_url, future=True, echo=False)
-SessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
-    bind=engine, expire_on_commit=False, autoflush=False, autocommit=False
-)
+        _sessionmaker = async_sessionmaker(
+            bind=get_engine(), expire_on_commit=False, autoflush=False, autocommit=False
+        )
+    return _sessionmaker
+
+
+async def dispose_engine() -> None:
+    """Close pooled connections if the engine was ever created (lifespan shutdown)."""
+    global _engine, _sessionmaker
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _sessionmaker = None
+
+
+def __getattr__(name: str) -> Any:
+    # Back-compat for `from rt_collab.db.database import engine, SessionLocal`
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        return get_sessionmaker()
+    raise AttributeError(name)
+
+
+async def _acquire(session: "AsyncSession") -> None:
+    # Check the connection out up front so pool wait shows up in metrics
+    start = time.perf_counter()
+    await session.connection()
+    metrics.pool_wait.observe(time.perf_counter() - start)
 
 
 @asynccontextmanager
-async def get_session() -> AsyncSession:  # type: ignore[override]
-    session: AsyncSession = SessionLocal()
+async def get_session() -> "AsyncSession":  # type: ignore[override]
+    session: AsyncSession = get_sessionmaker()()
     try:
+        await _acquire(session)
         yield session
         await session.commit()
     except Exception:
@@ -27,3 +114,39 @@ async def get_session() -> AsyncSession:  # type: ignore[override]
     finally:
         await session.close()
 
+
+@asynccontextmanager
+async def bulk_session() -> AsyncIterator["AsyncSession"]:
+    """One connection, one transaction, for write bursts.
+
+    Pair with `bulk_insert`; ORM unit-of-work tracking is bypassed entirely.
+    """
+    async with get_session() as session:
+        yield session
+
+
+async def bulk_insert(
+    session: "AsyncSession", table: "Table", rows: Iterable[Mapping[str, Any]], batch_size: int | None = None
+) -> int:
+    """Insert plain dict rows as executemany batches; returns the row count."""
+    from sqlalchemy import insert
+
+    size = batch_size or get_settings().db_bulk_batch_size
+    stmt = insert(table)
+    written = 0
+    batch: list = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            written += await _execute_many(session, stmt, batch)
+            batch = []
+    if batch:
+        written += await _execute_many(session, stmt, batch)
+    return written
+
+
+async def _execute_many(session: "AsyncSession", stmt: Any, batch: Sequence[Mapping[str, Any]]) -> int:
+    # A list of parameter dicts makes SQLAlchemy use executemany (batched
+    # "insertmanyvalues" where the driver supports it) instead of per-row INSERTs
+    await session.execute(stmt, list(batch))
+    return len(batch)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+from dataclasses import replace
+from pathlib import Path
+
+from rt_collab.loadtest.config import Scenario, load_scenario
+from rt_collab.loadtest.runner import run_scenario
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m rt_collab.loadtest", description="WebSocket load generator")
+    parser.add_argument("scenario", nargs="?", help="scenario file (.json or .toml)")
+    parser.add_argument("--target", help="override target: 'inprocess' or http://host:port")
+    parser.add_argument("--editors", type=int, help="override number of simulated editors")
+    parser.add_argument("--docs", type=int, help="override number of documents")
+    parser.add_argument("--duration", type=float, help="override steady-state duration in seconds")
+    parser.add_argument("--report", help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario) if args.scenario else Scenario()
+    overrides = {
+        "target": args.target,
+        "editors": args.editors,
+        "docs": args.docs,
+        "duration_s": args.duration,
+        "report_path": args.report,
+    }
+    scenario = replace(scenario, **{k: v for k, v in overrides.items() if v is not None})
+
+    report = asyncio.run(run_scenario(scenario))
+    rendered = json.dumps(report, indent=2)
+    if scenario.report_path:
+        Path(scenario.report_path).write_text(rendered + "\n")
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import json
+import tomllib
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any, Dict
+
+
+@dataclass
+class TypingProfile:
+    # Inter-key delays are log-normal: most keystrokes land near the median,
+    # with a long tail of hesitations.
+    key_delay_ms_median: float = 180.0
+    key_delay_sigma: float = 0.5
+    # Probability of a longer "thinking" pause after finishing a word
+    pause_prob: float = 0.08
+    pause_ms_median: float = 1500.0
+    # Share of keystrokes that are backspaces instead of new characters
+    delete_ratio: float = 0.08
+    # Probability of pasting a whole sentence instead of typing a word
+    paste_prob: float = 0.01
+    # Probability of jumping the caret somewhere else after a word
+    jump_prob: float = 0.05
+    # Send a cursor.update every N keystrokes (0 disables periodic cursors)
+    cursor_every_keys: int = 5
+
+
+@dataclass
+class Scenario:
+    name: str = "default"
+    # "inprocess" boots rt_collab.main:app inside the harness; otherwise an
+    # http(s) base URL of a running uvicorn, e.g. "http://127.0.0.1:8000".
+    target: str = "inprocess"
+    docs: int = 10
+    editors: int = 100
+    # Fraction of editors piled onto doc 0 to model a hot, widely shared doc
+    hot_doc_share: float = 0.0
+    duration_s: float = 30.0
+    ramp_up_s: float = 5.0
+    sample_interval_s: float = 1.0
+    connect_timeout_s: float = 10.0
+    seed: int | None = None
+    # Wire format: "json" text frames or the binary "msgpack" subprotocol
+    protocol: str = "json"
+    report_path: str | None = None
+    typing: TypingProfile = field(default_factory=TypingProfile)
+
+
+def scenario_from_dict(data: Dict[str, Any]) -> Scenario:
+    known = {f.name for f in fields(Scenario)}
+    unknown = set(data) - known
+    if unknown:
+        raise ValueError(f"unknown scenario keys: {sorted(unknown)}")
+    values = dict(data)
+    typing_raw = values.pop("typing", {}) or {}
+    typing_known = {f.name for f in fields(TypingProfile)}
+    unknown_typing = set(typing_raw) - typing_known
+    if unknown_typing:
+        raise ValueError(f"unknown typing keys: {sorted(unknown_typing)}")
+    scenario = Scenario(**values, typing=TypingProfile(**typing_raw))
+    if scenario.docs <= 0 or scenario.editors <= 0:
+        raise ValueError("docs and editors must be positive")
+    if scenario.protocol not in ("json", "msgpack"):
+        raise ValueError(f"unknown protocol: {scenario.protocol!r}")
+    return scenario
+
+
+def load_scenario(path: str | Path) -> Scenario:
+    """Load a scenario from a .json or .toml file."""
+    p = Path(path)
+    if p.suffix == ".toml":
+        data = tomllib.loads(p.read_text())
+    else:
+        data = json.loads(p.read_text())
+    return scenario_from_dict(data)
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+import urllib.request
+import uuid
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple
+
+import websockets
+
+from rt_collab.core.metrics import process_rss_bytes
+from rt_collab.loadtest.config import Scenario
+from rt_collab.ws.codec import JSON_CODEC, MSGPACK_CODEC, decode_frame
+
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog realtime document editing shared "
+    "cursor review draft meeting notes release plan latency budget owner update "
+    "merge conflict paragraph summary action item follow up deadline"
+).split()
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[int(q * (len(ordered) - 1))], 3)
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+@dataclass
+class LoadStats:
+    sent: Counter = field(default_factory=Counter)
+    nacks: Counter = field(default_factory=Counter)
+    acks: int = 0
+    errors: int = 0
+    connect_failures: int = 0
+    connected: int = 0
+    ack_latency_ms: List[float] = field(default_factory=list)
+    # (doc_id, version) -> perf_counter() when the op producing it was sent
+    version_sent_at: Dict[Tuple[str, int], float] = field(default_factory=dict)
+    # (doc_id, version, perf_counter() on receipt) for every doc.update seen
+    updates_seen: List[Tuple[str, int, float]] = field(default_factory=list)
+    timeline: List[Dict[str, float]] = field(default_factory=list)
+
+    def broadcast_lag_ms(self) -> List[float]:
+        lags = []
+        for doc_id, version, received_at in self.updates_seen:
+            sent_at = self.version_sent_at.get((doc_id, version))
+            if sent_at is not None:
+                lags.append((received_at - sent_at) * 1000)
+        return lags
+
+
+class SimulatedEditor:
+    """One WebSocket client typing into a single document."""
+
+    def __init__(self, doc_id: str, ws_url: str, scenario: Scenario, stats: LoadStats, rng: random.Random) -> None:
+        self.doc_id = doc_id
+        self.ws_url = ws_url
+        self.scenario = scenario
+        self.profile = scenario.typing
+        self.stats = stats
+        self.rng = rng
+        self.length = 0
+        self.caret = 0
+        self._keys = 0
+        self.codec = MSGPACK_CODEC if scenario.protocol == "msgpack" else JSON_CODEC
+        # Edits are acked in order per socket, so a FIFO of send times is enough
+        self._inflight: Deque[float] = deque()
+
+    async def run(self, start_delay: float, deadline: float) -> None:
+        await asyncio.sleep(start_delay)
+        try:
+            ws = await asyncio.wait_for(
+                websockets.connect(self.ws_url, max_size=None, subprotocols=[self.codec.name]),
+                timeout=self.scenario.connect_timeout_s,
+            )
+        except Exception:
+            self.stats.connect_failures += 1
+            return
+        self.stats.connected += 1
+        reader = asyncio.create_task(self._read(ws))
+        try:
+            await self._type(ws, deadline)
+        except websockets.ConnectionClosed:
+            self.stats.errors += 1
+        finally:
+            # Give in-flight acks a moment to land before hanging up
+            settle_until = time.perf_counter() + 2.0
+            while self._inflight and time.perf_counter() < settle_until and not reader.done():
+                await asyncio.sleep(0.05)
+            reader.cancel()
+            await ws.close()
+            self.stats.connected -= 1
+
+    async def _read(self, ws: Any) -> None:
+        try:
+            async for raw in ws:
+                now = time.perf_counter()
+                data = decode_frame({"bytes": raw} if isinstance(raw, bytes) else {"text": raw})
+                t = data.get("type")
+                if t == "ack":
+                    if self._inflight:
+                        sent_at = self._inflight.popleft()
+                        self.stats.ack_latency_ms.append((now - sent_at) * 1000)
+                        self.stats.version_sent_at[(self.doc_id, int(data["version"]))] = sent_at
+                    self.stats.acks += 1
+                    self._sync_length(data.get("text"))
+                elif t == "nack":
+                    if self._inflight:
+                        self._inflight.popleft()
+                    self.stats.nacks[str(data.get("reason"))] += 1
+                elif t == "doc.update":
+                    self.stats.updates_seen.append((self.doc_id, int(data["version"]), now))
+                    self._sync_length(data.get("text"))
+                elif t == "snapshot":
+                    self._sync_length(data.get("text"))
+                    self.caret = self.length
+        except websockets.ConnectionClosed:
+            pass
+        except Exception:
+            self.stats.errors += 1
+
+    def _sync_length(self, text: Any) -> None:
+        if isinstance(text, str):
+            self.length = len(text)
+            self.caret = min(self.caret, self.length)
+
+    async def _send(self, ws: Any, message: Dict[str, Any], expects_reply: bool = True) -> None:
+        if expects_reply:
+            self._inflight.append(time.perf_counter())
+        await ws.send(self.codec.encode(message))
+        self.stats.sent[message["type"]] += 1
+
+    def _key_delay(self) -> float:
+        return self.rng.lognormvariate(0.0, self.profile.key_delay_sigma) * self.profile.key_delay_ms_median / 1000
+
+    async def _type(self, ws: Any, deadline: float) -> None:
+        profile = self.profile
+        while time.perf_counter() < deadline:
+            if self.rng.random() < profile.jump_prob:
+                self.caret = self.rng.randint(0, self.length)
+                await self._send(ws, {"type": "cursor.update", "data": {"index": self.caret}}, expects_reply=False)
+            if self.rng.random() < profile.paste_prob:
+                sentence = " ".join(self.rng.choices(WORDS, k=self.rng.randint(5, 15))) + ". "
+                await self._send(ws, {"type": "edit.insert", "index": self.caret, "text": sentence})
+                self.caret += len(sentence)
+                self.length += len(sentence)
+                continue
+            for ch in self.rng.choice(WORDS) + " ":
+                await asyncio.sleep(self._key_delay())
+                if time.perf_counter() >= deadline:
+                    return
+                if self.caret > 0 and self.rng.random() < profile.delete_ratio:
+                    await self._send(ws, {"type": "edit.delete", "index": self.caret - 1, "length": 1})
+                    self.caret -= 1
+                    self.length -= 1
+                else:
+                    await self._send(ws, {"type": "edit.insert", "index": self.caret, "text": ch})
+                    self.caret += 1
+                    self.length += 1
+                self._keys += 1
+                if profile.cursor_every_keys and self._keys % profile.cursor_every_keys == 0:
+                    await self._send(ws, {"type": "cursor.update", "data": {"index": self.caret}}, expects_reply=False)
+            if self.rng.random() < profile.pause_prob:
+                pause = self.rng.lognormvariate(0.0, 0.5) * profile.pause_ms_median / 1000
+                await asyncio.sleep(min(pause, max(0.0, deadline - time.perf_counter())))
+
+
+@asynccontextmanager
+async def serve_inprocess() -> AsyncIterator[str]:
+    """Run rt_collab.main:app on an ephemeral port inside this event loop."""
+    import uvicorn
+
+    from rt_collab.main import app
+
+    config = uvicorn.Config(
+        app,
+        host="127.0.0.1",
+        port=0,
+        log_level="warning",
+        lifespan="on",
+        ws="rt_collab.ws.transport:DeflateWebSocketProtocol",
+    )
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+            raise RuntimeError("in-process server exited during startup")
+        await asyncio.sleep(0.02)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+def _scrape_rss(base_url: str) -> int | None:
+    try:
+        with urllib.request.urlopen(f"{base_url}/metrics", timeout=2) as resp:
+            body = resp.read().decode()
+    except Exception:
+        return None
+    for line in body.splitlines():
+        if line.startswith("process_resident_memory_bytes "):
+            return int(float(line.split()[1]))
+    return None
+
+
+def _assign_docs(scenario: Scenario, doc_ids: List[str], rng: random.Random) -> List[str]:
+    hot = int(scenario.editors * scenario.hot_doc_share)
+    assigned = [doc_ids[0]] * hot
+    assigned += [doc_ids[i % len(doc_ids)] for i in range(scenario.editors - hot)]
+    rng.shuffle(assigned)
+    return assigned
+
+
+async def _sample(stats: LoadStats, scenario: Scenario, base_url: str, inprocess: bool, started: float) -> None:
+    last_acks = 0
+    while True:
+        await asyncio.sleep(scenario.sample_interval_s)
+        if inprocess:
+            # Harness and server share a process here, so RSS includes the clients
+            rss = process_rss_bytes()
+        else:
+            rss = await asyncio.to_thread(_scrape_rss, base_url)
+        acks = stats.acks
+        stats.timeline.append(
+            {
+                "t_s": round(time.perf_counter() - started, 3),
+                "ops_per_s": round((acks - last_acks) / scenario.sample_interval_s, 1),
+                "connected": stats.connected,
+                "rss_mb": round(rss / 2**20, 1) if rss is not None else None,
+            }
+        )
+        last_acks = acks
+
+
+async def run_against(scenario: Scenario, base_url: str, inprocess: bool = False) -> Dict[str, Any]:
+    rng = random.Random(scenario.seed)
+    stats = LoadStats()
+    ws_base = base_url.replace("http", "ws", 1).rstrip("/")
+    doc_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(scenario.docs)]
+    assigned = _assign_docs(scenario, doc_ids, rng)
+
+    started = time.perf_counter()
+    deadline = started + scenario.ramp_up_s + scenario.duration_s
+    editors = [
+        SimulatedEditor(doc_id, f"{ws_base}/v1/ws/docs/{doc_id}", scenario, stats, random.Random(rng.random()))
+        for doc_id in assigned
+    ]
+    sampler = asyncio.create_task(_sample(stats, scenario, base_url.rstrip("/"), inprocess, started))
+    try:
+        await asyncio.gather(
+            *(
+                editor.run(scenario.ramp_up_s * i / max(1, len(editors)), deadline)
+                for i, editor in enumerate(editors)
+            )
+        )
+    finally:
+        sampler.cancel()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": scenario.name,
+        "target": "inprocess" if inprocess else base_url,
+        "docs": scenario.docs,
+        "editors": scenario.editors,
+        "protocol": scenario.protocol,
+        "elapsed_s": round(elapsed, 3),
+        "sent": dict(stats.sent),
+        "acks": stats.acks,
+        "nacks": dict(stats.nacks),
+        "errors": stats.errors,
+        "connect_failures": stats.connect_failures,
+        "throughput_ops_s": round(stats.acks / elapsed, 1),
+        "ack_latency_ms": _percentiles(stats.ack_latency_ms),
+        "broadcast_lag_ms": _percentiles(stats.broadcast_lag_ms()),
+        "timeline": stats.timeline,
+    }
+
+
+async def run_scenario(scenario: Scenario) -> Dict[str, Any]:
+    if scenario.target == "inprocess":
+        async with serve_inprocess() as base_url:
+            return await run_against(scenario, base_url, inprocess=True)
+    return await run_against(scenario, scenario.target)
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import uuid
-from typing import Any, Dict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.responses import RedirectResponse
@@ -13,16 +15,56 @@ from starlette.requests import Request
 from starlette.responses import Response
 
 from rt_collab.api.routes import router as api_router
+from rt_collab.api.artifacts import router as artifacts_router
 from rt_collab.api.jobs import router as jobs_router
 from rt_collab.core.config import get_settings
+from rt_collab.core.loop_monitor import loop_monitor
+from rt_collab.core.metrics import process_rss_bytes
+from rt_collab.core.redis import close_redis
+from rt_collab.db.database import dispose_engine, metrics as db_metrics
 from rt_collab.services.docs import store
-from rt_collab.services.job_handlers import register_default_handlers
+from rt_collab.services.history import history
+from rt_collab.services.offload import crdt_executor
+from rt_collab.services.result_cache import result_cache
+from rt_collab.services.search import search_index
+from rt_collab.services.snapshot_cache import snapshot_cache
+from rt_collab.services.snapshot_scheduler import snapshot_scheduler
 from rt_collab.services.task_queue import task_queue
+from rt_collab.ws.codec import decode_frame, negotiate, splice_snapshot
+from rt_collab.ws.limits import EDIT_TYPES, limiter
 from rt_collab.ws.manager import manager
+from rt_collab.ws.presence import presence
 
 settings = get_settings()
 
-app = FastAPI(title=settings.app_name, version=settings.app_version)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Deferred so importing the app stays cheap; handlers pull in exporters etc.
+    from rt_collab.services.job_handlers import register_default_handlers, register_default_schedules
+
+    register_default_handlers(task_queue)
+    register_default_schedules(task_queue)
+    await loop_monitor.start()
+    await task_queue.start()
+    await presence.start()
+    await snapshot_scheduler.start()
+    await search_index.start(await store.list_doc_ids())
+    try:
+        yield
+    finally:
+        await search_index.stop()
+        await snapshot_scheduler.stop()
+        await presence.stop()
+        await task_queue.stop()
+        crdt_executor.shutdown()
+        await loop_monitor.stop()
+        # No-ops unless something actually opened a DB engine or Redis client
+        await close_redis()
+        await dispose_engine()
+
+
+app = FastAPI(title=settings.app_name, version=settings.app_version, lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins,
@@ -51,15 +93,6 @@ async def healthz() -> Dict[str, Any]:
 async def readyz() -> Dict[str, Any]:
     return {"status": "ready"}
 
-@app.on_event("startup")
-async def startup_events() -> None:
-    register_default_handlers(task_queue)
-    await task_queue.start()
-
-@app.on_event("shutdown")
-async def shutdown_events() -> None:
-    await task_queue.stop()
-
 @app.get("/metrics")
 async def metrics() -> Response:
     summary = task_queue.metrics.summary()
@@ -77,69 +110,217 @@ async def metrics() -> Response:
     lines.append("# HELP queue_retries_total Retry attempts recorded")
     lines.append("# TYPE queue_retries_total counter")
     lines.append(f'queue_retries_total {summary.get("retries", 0)}')
+    lines += task_queue.tenant_metrics.render(task_queue.queue_depths(), task_queue.running_counts())
+    lines.append("# HELP queue_batches_total Batch handler calls, and the jobs they carried")
+    lines.append("# TYPE queue_batches_total counter")
+    lines.append(f"queue_batches_total {task_queue.metrics.batches}")
+    lines.append("# TYPE queue_batched_jobs_total counter")
+    lines.append(f"queue_batched_jobs_total {task_queue.metrics.batched_jobs}")
+    lines.append("# HELP ws_throttled_total Inbound WebSocket edit ops rejected by limit scope")
+    lines.append("# TYPE ws_throttled_total counter")
+    for scope, count in limiter.metrics.throttled.items():
+        lines.append(f'ws_throttled_total{{scope="{scope}"}} {count}')
+    lines.append("# HELP snapshot_cache_requests_total Encoded snapshot lookups by outcome")
+    lines.append("# TYPE snapshot_cache_requests_total counter")
+    for outcome in ("hits", "misses", "coalesced"):
+        lines.append(f'snapshot_cache_requests_total{{outcome="{outcome}"}} {snapshot_cache.stats[outcome]}')
+    lines.append("# HELP snapshot_cache_evictions_total Entries evicted to stay within the byte budget")
+    lines.append("# TYPE snapshot_cache_evictions_total counter")
+    lines.append(f'snapshot_cache_evictions_total {snapshot_cache.stats["evictions"]}')
+    lines.append("# HELP snapshot_cache_bytes Bytes held by cached encoded snapshots")
+    lines.append("# TYPE snapshot_cache_bytes gauge")
+    lines.append(f"snapshot_cache_bytes {snapshot_cache.bytes}")
+    lines.append("# HELP result_cache_requests_total Export/digest requests by outcome (hits reuse a finished job)")
+    lines.append("# TYPE result_cache_requests_total counter")
+    for outcome in ("hits", "misses", "coalesced"):
+        lines.append(f'result_cache_requests_total{{outcome="{outcome}"}} {result_cache.stats[outcome]}')
+    lines.append("# HELP result_cache_evictions_total Job results evicted to stay within the byte budget")
+    lines.append("# TYPE result_cache_evictions_total counter")
+    lines.append(f'result_cache_evictions_total {result_cache.stats["evictions"]}')
+    lines.append("# HELP result_cache_bytes Bytes held by cached job results")
+    lines.append("# TYPE result_cache_bytes gauge")
+    lines.append(f"result_cache_bytes {result_cache.bytes}")
+    lines.append("# HELP history_reads_total Historical doc reads by outcome (misses replay deltas from a checkpoint)")
+    lines.append("# TYPE history_reads_total counter")
+    for outcome in ("hits", "misses"):
+        lines.append(f'history_reads_total{{outcome="{outcome}"}} {history.stats[outcome]}')
+    lines.append("# HELP history_replayed_deltas_total Deltas replayed to rebuild past versions")
+    lines.append("# TYPE history_replayed_deltas_total counter")
+    lines.append(f'history_replayed_deltas_total {history.stats["replayed"]}')
+    lines.append("# HELP history_cache_bytes Bytes held by rebuilt past versions")
+    lines.append("# TYPE history_cache_bytes gauge")
+    lines.append(f"history_cache_bytes {history.cache_bytes}")
+    lines.append("# HELP search_index_docs Docs in the full-text index")
+    lines.append("# TYPE search_index_docs gauge")
+    lines.append(f"search_index_docs {search_index.doc_count}")
+    lines.append("# HELP search_index_terms Distinct terms in the full-text index")
+    lines.append("# TYPE search_index_terms gauge")
+    lines.append(f"search_index_terms {search_index.term_count}")
+    lines += search_index.update_seconds.render("search_index_update_seconds", "Time to apply one change to the index")
+    lines += search_index.lag_seconds.render(
+        "search_index_lag_seconds", "Time from a doc's first unpersisted index change to its flush"
+    )
+    lines += search_index.query_seconds.render("search_query_seconds", "Search query latency")
+    lines.append("# HELP snapshot_scheduler_triggers_total Snapshot triggers: jobs enqueued vs absorbed by a pending job")
+    lines.append("# TYPE snapshot_scheduler_triggers_total counter")
+    for outcome in ("scheduled", "coalesced"):
+        lines.append(f'snapshot_scheduler_triggers_total{{outcome="{outcome}"}} {snapshot_scheduler.stats[outcome]}')
+    lines.append("# HELP snapshot_scheduler_dirty_bytes Characters changed across docs since their last scheduled snapshot")
+    lines.append("# TYPE snapshot_scheduler_dirty_bytes gauge")
+    lines.append(f"snapshot_scheduler_dirty_bytes {snapshot_scheduler.dirty_bytes}")
+    lines.append("# HELP crdt_ops_total CRDT operations by where they ran (offloaded = executor thread)")
+    lines.append("# TYPE crdt_ops_total counter")
+    for where in ("inline", "offloaded"):
+        lines.append(f'crdt_ops_total{{path="{where}"}} {crdt_executor.stats[where]}')
+    lines += crdt_executor.seconds.render("crdt_offload_seconds", "Wall time of CRDT calls run on the executor")
+    lines += loop_monitor.render()
+    lines += db_metrics.render()
+    lines.append("# HELP process_resident_memory_bytes Resident memory size in bytes")
+    lines.append("# TYPE process_resident_memory_bytes gauge")
+    lines.append(f"process_resident_memory_bytes {process_rss_bytes()}")
     body = "\n".join(lines) + "\n"
     return Response(content=body, media_type="text/plain")
 
 
 app.include_router(api_router)
 app.include_router(jobs_router)
+app.include_router(artifacts_router)
+
+
+async def _handle_message(doc_id: uuid.UUID, websocket: WebSocket, client_id: str, data: Dict[str, Any]) -> None:
+    t = data.get("type")
+    if t == "op.submit":
+        op = data.get("op")
+        if not isinstance(op, dict):
+            await manager.send(websocket, {"type": "nack", "reason": "invalid_op"})
+            return
+        new_version = await store.apply_ops(doc_id, op)
+        # Also broadcast updated text for simple clients
+        text_now, _ = await store.snapshot_text(doc_id)
+        # Ack the sender and broadcast update to others
+        await manager.send(websocket, {"type": "ack", "version": new_version, "text": text_now})
+        await manager.broadcast(doc_id, {"type": "doc.update", "version": new_version, "text": text_now}, exclude=websocket)
+    elif t == "edit.insert":
+        try:
+            index = int(data.get("index"))
+            text_ins = str(data.get("text", ""))
+        except Exception:
+            await manager.send(websocket, {"type": "nack", "reason": "bad_insert_args"})
+            return
+        _, version2, text_now = await store.local_insert(doc_id, index, text_ins)
+        await manager.send(websocket, {"type": "ack", "version": version2, "text": text_now})
+        await manager.broadcast(doc_id, {"type": "doc.update", "version": version2, "text": text_now}, exclude=websocket)
+    elif t == "edit.delete":
+        try:
+            index = int(data.get("index"))
+            length = int(data.get("length"))
+        except Exception:
+            await manager.send(websocket, {"type": "nack", "reason": "bad_delete_args"})
+            return
+        _, version3, text_now = await store.local_delete(doc_id, index, length)
+        await manager.send(websocket, {"type": "ack", "version": version3, "text": text_now})
+        await manager.broadcast(doc_id, {"type": "doc.update", "version": version3, "text": text_now}, exclude=websocket)
+    elif t == "cursor.update":
+        cursor = data.get("data", {})
+        if not isinstance(cursor, dict):
+            await manager.send(websocket, {"type": "nack", "reason": "bad_cursor_args"})
+            return
+        # Latest-wins; the presence flusher fans it out in the next batched frame
+        presence.update(doc_id, client_id, cursor, data.get("ts"))
+    else:
+        await manager.send(websocket, {"type": "nack", "reason": "unknown_type"})
+
+
+@dataclass(frozen=True)
+class _Reject:
+    """A reply the reader already decided on (rate limit, bad frame).
+
+    Queued like a message so it goes out in order with the other replies;
+    a distinct type, so nothing a client sends can pass for one.
+    """
+
+    reply: Dict[str, Any]
+
+
+async def _pump_inbound(doc_id: uuid.UUID, websocket: WebSocket, inbound: asyncio.Queue) -> None:
+    """Read frames into the bounded inbound queue, applying edit rate limits on arrival."""
+    conn_bucket = limiter.connection_bucket()
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        try:
+            # Frame type, not the negotiated codec, decides: text is JSON, binary is msgpack
+            data = decode_frame(message)
+        except (ValueError, RecursionError):
+            data = None
+        if inbound.full():
+            # The processor is behind: shed load instead of buffering without bound.
+            # This nack is sent out of band, ahead of replies still queued.
+            limiter.metrics.record_throttle("inbound_queue")
+            await manager.send(websocket, {"type": "nack", "reason": "backpressure", "scope": "inbound_queue"})
+            continue
+        if not isinstance(data, dict):
+            inbound.put_nowait(_Reject({"type": "nack", "reason": "invalid_frame"}))
+            continue
+        nack = limiter.check(doc_id, conn_bucket) if data.get("type") in EDIT_TYPES else None
+        inbound.put_nowait(data if nack is None else _Reject(nack))
 
 
 @app.websocket("/v1/ws/docs/{doc_id}")
 async def ws_docs(doc_id: uuid.UUID, websocket: WebSocket) -> None:
-    await manager.connect(doc_id, websocket)
-    # On join, send current snapshot
-    text, version = await store.snapshot_text(doc_id)
-    await websocket.send_text(json.dumps({"type": "snapshot", "text": text, "version": version}))
+    client_id = websocket.query_params.get("client_id") or uuid.uuid4().hex
+    subprotocol, codec = negotiate(websocket.scope.get("subprotocols", []))
+    await manager.connect(doc_id, websocket, subprotocol, codec)
+    # On join, send current snapshot plus who else is here. The text comes
+    # pre-encoded from the shared per-version cache; only per-client fields
+    # are encoded here.
+    entry = await snapshot_cache.get(doc_id, codec.text_encoding)
+    fields: Dict[str, Any] = {"client_id": client_id, "presence": presence.snapshot(doc_id)}
+    if websocket.query_params.get("compress") == "deflate" and len(entry.payload) >= get_settings().ws_compress_min_bytes:
+        # Text follows as one pre-compressed binary frame, deflated once per doc version
+        entry = await snapshot_cache.get(doc_id, "deflate")
+        await manager.send(
+            websocket, {"type": "snapshot", "text": None, "text_encoding": "deflate", "version": entry.version, **fields}
+        )
+        await websocket.send_bytes(entry.payload)
+    else:
+        await manager.send_raw(websocket, splice_snapshot(codec, entry.payload, {"version": entry.version, **fields}))
+    doc = store.peek(doc_id)
+    if doc is not None and doc.version > entry.version:
+        # Edits landed while the snapshot was encoding and their broadcasts may
+        # have overtaken it; resync so the client doesn't sit on stale text
+        text, version = await store.snapshot_text(doc_id)
+        await manager.send(websocket, {"type": "doc.update", "version": version, "text": text})
+    inbound: asyncio.Queue = asyncio.Queue(maxsize=max(1, get_settings().ws_inbound_queue))
+    reader = asyncio.create_task(_pump_inbound(doc_id, websocket, inbound))
     try:
         while True:
-            msg = await websocket.receive_text()
-            try:
-                data = json.loads(msg)
-            except json.JSONDecodeError:
-                await websocket.send_text(json.dumps({"type": "nack", "reason": "invalid_json"}))
-                continue
-
-            t = data.get("type")
-            if t == "op.submit":
-                op = data.get("op")
-                if not isinstance(op, dict):
-                    await websocket.send_text(json.dumps({"type": "nack", "reason": "invalid_op"}))
-                    continue
-                new_version = await store.apply_ops(doc_id, op)
-                # Also broadcast updated text for simple clients
-                text_now, _ = await store.snapshot_text(doc_id)
-                # Ack the sender and broadcast update to others
-                await websocket.send_text(json.dumps({"type": "ack", "version": new_version, "text": text_now}))
-                await manager.broadcast(doc_id, {"type": "doc.update", "version": new_version, "text": text_now}, exclude=websocket)
-            elif t == "edit.insert":
-                try:
-                    index = int(data.get("index"))
-                    text_ins = str(data.get("text", ""))
-                except Exception:
-                    await websocket.send_text(json.dumps({"type": "nack", "reason": "bad_insert_args"}))
-                    continue
-                _, version2, text_now = await store.local_insert(doc_id, index, text_ins)
-                await websocket.send_text(json.dumps({"type": "ack", "version": version2, "text": text_now}))
-                await manager.broadcast(doc_id, {"type": "doc.update", "version": version2, "text": text_now}, exclude=websocket)
-            elif t == "edit.delete":
-                try:
-                    index = int(data.get("index"))
-                    length = int(data.get("length"))
-                except Exception:
-                    await websocket.send_text(json.dumps({"type": "nack", "reason": "bad_delete_args"}))
-                    continue
-                _, version3, text_now = await store.local_delete(doc_id, index, length)
-                await websocket.send_text(json.dumps({"type": "ack", "version": version3, "text": text_now}))
-                await manager.broadcast(doc_id, {"type": "doc.update", "version": version3, "text": text_now}, exclude=websocket)
-            elif t == "cursor.update":
-                # Broadcast presence/cursor updates to others (no persistence)
-                payload = {"type": "presence.cursor", "data": data.get("data", {}), "ts": data.get("ts")}
-                await manager.broadcast(doc_id, payload, exclude=websocket)
+            getter = asyncio.ensure_future(inbound.get())
+            done, _ = await asyncio.wait({getter, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                # Reader ended (disconnect); anything still queued has no one to answer
+                getter.cancel()
+                break
+            item = getter.result()
+            if isinstance(item, _Reject):
+                await manager.send(websocket, item.reply)
             else:
-                await websocket.send_text(json.dumps({"type": "nack", "reason": "unknown_type"}))
+                await _handle_message(doc_id, websocket, client_id, item)
     except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
         await manager.disconnect(doc_id, websocket)
+        presence.remove(doc_id, client_id)
+        if manager.peer_count(doc_id) == 0:
+            limiter.forget(doc_id)
+        # Collect the reader's outcome: a disconnect is routine, anything else
+        # surfaces here instead of vanishing with the task
+        try:
+            await reader
+        except (asyncio.CancelledError, WebSocketDisconnect):
+            pass
 
 
 # Serve a tiny demo UI (resolve path relative to this file)
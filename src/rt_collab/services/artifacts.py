@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+from rt_collab.core.config import get_settings
+
+
+_ARTIFACT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class Artifact:
+    id: str
+    filename: str
+    content_type: str
+    size: int
+    created_at: datetime
+
+
+class LocalArtifactStore:
+    """Rendered job output kept as files, so job results only carry a reference.
+
+    Each artifact is `<id>.bin` plus a `<id>.json` metadata sidecar under
+    ARTIFACT_DIR, which lets another worker (or a restarted one) serve it.
+    """
+
+    def __init__(self, root: str | Path | None = None) -> None:
+        self._root = Path(root) if root else None
+        self._index: Dict[str, Artifact] = {}
+
+    @property
+    def root(self) -> Path:
+        if self._root is None:
+            self._root = Path(get_settings().artifact_dir)
+        self._root.mkdir(parents=True, exist_ok=True)
+        return self._root
+
+    def _data_path(self, artifact_id: str) -> Path:
+        return self.root / f"{artifact_id}.bin"
+
+    def _meta_path(self, artifact_id: str) -> Path:
+        return self.root / f"{artifact_id}.json"
+
+    def write(self, chunks: Iterable[bytes], *, filename: str, content_type: str) -> Artifact:
+        artifact_id = uuid.uuid4().hex
+        tmp = self.root / f"{artifact_id}.part"
+        size = 0
+        with open(tmp, "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+                size += len(chunk)
+        os.replace(tmp, self._data_path(artifact_id))
+        artifact = Artifact(
+            id=artifact_id,
+            filename=filename,
+            content_type=content_type,
+            size=size,
+            created_at=datetime.utcnow(),
+        )
+        meta = {**asdict(artifact), "created_at": artifact.created_at.isoformat()}
+        self._meta_path(artifact_id).write_text(json.dumps(meta))
+        self._index[artifact_id] = artifact
+        return artifact
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        if not _ARTIFACT_ID.match(artifact_id):
+            return None
+        artifact = self._index.get(artifact_id)
+        if artifact is None:
+            try:
+                meta = json.loads(self._meta_path(artifact_id).read_text())
+            except (OSError, ValueError):
+                return None
+            meta["created_at"] = datetime.fromisoformat(meta["created_at"])
+            artifact = Artifact(**meta)
+            self._index[artifact_id] = artifact
+        if not self._data_path(artifact_id).exists():
+            self._index.pop(artifact_id, None)
+            return None
+        return artifact
+
+    def iter_bytes(self, artifact: Artifact, start: int = 0, end: int | None = None, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield bytes [start, end] (inclusive) of the artifact in chunks."""
+        last = artifact.size - 1 if end is None else end
+        with open(self._data_path(artifact.id), "rb") as fh:
+            fh.seek(start)
+            remaining = last - start + 1
+            while remaining > 0:
+                chunk = fh.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, artifact_id: str) -> None:
+        if not _ARTIFACT_ID.match(artifact_id):
+            return
+        self._index.pop(artifact_id, None)
+        for path in (self._data_path(artifact_id), self._meta_path(artifact_id)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+artifacts = LocalArtifactStore()
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+from rt_collab.core.config import get_settings
+from rt_collab.services.docs import InMemoryDocStore, store
+from rt_collab.services.snapshots import InMemorySnapshotStore, snapshots
+from rt_collab.services.task_queue import report_progress
+
+# snapshots - record into the snapshot store; archive - append to <id>.jsonl under BACKUP_DIR
+BACKUP_TARGETS = ("snapshots", "archive")
+
+
+@dataclass
+class BackupEntry:
+    version: int
+    size: int  # UTF-8 bytes of the text
+    sha256: str
+    offset: int | None = None  # byte offset of the doc's line in the archive
+
+
+@dataclass
+class BackupManifest:
+    id: str
+    target: str
+    started_at: str
+    completed_at: str | None = None
+    planned: List[str] = field(default_factory=list)  # dirty doc ids when the run started
+    docs: Dict[str, BackupEntry] = field(default_factory=dict)  # doc id -> what was written
+    archive_bytes: int = 0  # archive length covered by `docs` at the last checkpoint
+    resumed: int = 0  # times this run was picked up again after an interruption
+
+    @classmethod
+    def load(cls, path: Path) -> "BackupManifest":
+        raw = json.loads(path.read_text())
+        raw["docs"] = {doc_id: BackupEntry(**entry) for doc_id, entry in raw["docs"].items()}
+        return cls(**raw)
+
+
+class BackupService:
+    """Incremental backups of resident docs.
+
+    Only docs whose version moved since their last backup (per target) are
+    written. Each run has a manifest under BACKUP_DIR that is checkpointed
+    every BACKUP_CHECKPOINT_EVERY docs; a run that dies part way is resumed by
+    the next one from its last checkpoint (the archive is truncated back to
+    the checkpointed length, so no half-written lines survive). Restores
+    should read archive lines by the offsets in `docs`.
+    """
+
+    def __init__(
+        self,
+        doc_store: InMemoryDocStore = store,
+        snapshot_store: InMemorySnapshotStore = snapshots,
+        root: str | Path | None = None,
+    ) -> None:
+        self._store = doc_store
+        self._snapshots = snapshot_store
+        self._root = Path(root) if root else None
+        # target -> doc id -> last backed-up version; loaded from manifests on first use
+        self._versions: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def root(self) -> Path:
+        if self._root is None:
+            self._root = Path(get_settings().backup_dir)
+        self._root.mkdir(parents=True, exist_ok=True)
+        return self._root
+
+    def manifest_path(self, backup_id: str) -> Path:
+        return self.root / f"{backup_id}.manifest.json"
+
+    def archive_path(self, backup_id: str) -> Path:
+        return self.root / f"{backup_id}.jsonl"
+
+    def _manifests(self, target: str) -> List[BackupManifest]:
+        found = []
+        for path in sorted(self.root.glob("*.manifest.json")):  # ids sort by start time
+            try:
+                manifest = BackupManifest.load(path)
+            except (OSError, ValueError, TypeError):
+                continue
+            if manifest.target == target:
+                found.append(manifest)
+        return found
+
+    def _backed_up(self, target: str) -> Dict[str, int]:
+        versions = self._versions.get(target)
+        if versions is None:
+            versions = {}
+            for manifest in self._manifests(target):
+                for doc_id, entry in manifest.docs.items():
+                    versions[doc_id] = max(entry.version, versions.get(doc_id, -1))
+            self._versions[target] = versions
+        return versions
+
+    async def dirty(self, target: str) -> List[str]:
+        """Resident docs changed since their last backup to `target`."""
+        versions = self._backed_up(target)
+        dirty = []
+        for doc_id in await self._store.list_doc_ids():
+            doc = self._store.peek(doc_id)
+            if doc is not None and doc.version > versions.get(str(doc_id), -1):
+                dirty.append(str(doc_id))
+        return dirty
+
+    def _checkpoint(self, manifest: BackupManifest, archive: Optional[BinaryIO]) -> None:
+        if archive is not None:
+            archive.flush()
+            os.fsync(archive.fileno())
+            manifest.archive_bytes = archive.tell()
+        path = self.manifest_path(manifest.id)
+        tmp = path.with_suffix(".part")
+        tmp.write_text(json.dumps(asdict(manifest)))
+        os.replace(tmp, path)
+
+    async def run(
+        self,
+        target: str = "snapshots",
+        *,
+        concurrency: int | None = None,
+        checkpoint_every: int | None = None,
+        resume: bool = True,
+    ) -> BackupManifest:
+        if target not in BACKUP_TARGETS:
+            raise ValueError(f"unsupported_target: {target}")
+        settings = get_settings()
+        concurrency = max(1, concurrency or settings.backup_concurrency)
+        checkpoint_every = max(1, checkpoint_every or settings.backup_checkpoint_every)
+
+        unfinished = [m for m in self._manifests(target) if m.completed_at is None] if resume else []
+        if unfinished:
+            manifest = unfinished[-1]
+            manifest.resumed += 1
+        else:
+            backup_id = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+            manifest = BackupManifest(id=backup_id, target=target, started_at=datetime.utcnow().isoformat())
+            manifest.planned = await self.dirty(target)
+        todo = iter([doc_id for doc_id in manifest.planned if doc_id not in manifest.docs])
+        total = len(manifest.planned)
+        report_progress(backup_id=manifest.id, total=total, done=len(manifest.docs))
+
+        archive: Optional[BinaryIO] = None
+        if target == "archive":
+            archive = open(self.archive_path(manifest.id), "ab")
+            archive.truncate(manifest.archive_bytes)
+            archive.seek(manifest.archive_bytes)
+        self._checkpoint(manifest, archive)
+        versions = self._backed_up(target)
+        write_lock = asyncio.Lock()
+        since_checkpoint = 0
+
+        async def backup_one(doc_id: str) -> None:
+            nonlocal since_checkpoint
+            # Render on the loop (the CRDT isn't thread-safe), hash/encode/write off it
+            text, version = await self._store.snapshot_text(uuid.UUID(doc_id))
+            data = text.encode("utf-8")
+            digest = await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+            entry = BackupEntry(version=version, size=len(data), sha256=digest)
+            if archive is None:
+                await self._snapshots.record(uuid.UUID(doc_id), version, text)
+            else:
+                line = json.dumps({"doc_id": doc_id, "version": version, "text": text}).encode("utf-8") + b"\n"
+            async with write_lock:
+                if archive is not None:
+                    entry.offset = archive.tell()
+                    await asyncio.to_thread(archive.write, line)
+                manifest.docs[doc_id] = entry
+                versions[doc_id] = max(version, versions.get(doc_id, -1))
+                since_checkpoint += 1
+                if since_checkpoint >= checkpoint_every:
+                    since_checkpoint = 0
+                    await asyncio.to_thread(self._checkpoint, manifest, archive)
+                report_progress(done=len(manifest.docs))
+
+        async def worker() -> None:
+            # Workers share one iterator, so each doc is taken exactly once
+            for doc_id in todo:
+                await backup_one(doc_id)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+            manifest.completed_at = datetime.utcnow().isoformat()
+        finally:
+            # On failure stop the other workers before the final checkpoint
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._checkpoint(manifest, archive)
+            if archive is not None:
+                archive.close()
+        return manifest
+
+    def reset(self) -> None:
+        self._versions = {}
+
+
+backups = BackupService()
@@ -1,52 +1,196 @@
 from __future__ import annotations
 
+import gc
 import itertools
+import random
 import string
+from bisect import bisect_left, insort
 from dataclasses import dataclass, field
-from typing import Iterable, List, Optional, Tuple
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 
 # A compact sequence CRDT using Logoot/LSEQ-like positional identifiers.
 # Each atom has a position (list[int]) and a tiebreaker (site_id, counter) to ensure total order.
 
 
-BASE = 2**16
+BASE = 2**16  # digit range at depth 0; LSEQ doubles it at every deeper level
+BOUNDARY = 10  # minimum allocation window next to the chosen neighbour
+SPREAD = 256  # wide open-ended gaps get a window of gap // SPREAD instead of BOUNDARY
+INTERIOR_SPREAD = 2  # gaps with text on both sides use gap // INTERIOR_SPREAD
 
+_rng = random.Random()  # fallback for callers without a per-document generator
 
-def between_pos(left: List[int] | None, right: List[int] | None, base: int = BASE) -> List[int]:
+
+def base_at(depth: int) -> int:
+    return BASE << depth
+
+
+def _boundary_plus(depth: int) -> bool:
+    # boundary+ allocates just after the left neighbour (leaves room for appends),
+    # boundary- just before the right one (leaves room for prepends). Alternating
+    # per depth keeps either editing pattern from exhausting a level.
+    return depth % 2 == 0
+
+
+def between_pos(
+    left: List[int] | None,
+    right: List[int] | None,
+    boundary: int = BOUNDARY,
+    rng: random.Random | None = None,
+) -> List[int]:
     """Generate a position strictly between left and right (lexicographic order).
     left/right are position lists; None represents -inf/+inf.
+
+    LSEQ allocation: descend to the first depth with room between the
+    neighbours, then pick a digit within a small window next to one side
+    instead of the midpoint, so sequential typing consumes the gap slowly and
+    identifiers stay short. The window widens with the gap so a fresh level is
+    not packed into its first few digits. Gaps closed on both sides (edits
+    inside existing text) get a window of half the gap: there the next insert
+    is as likely to land on either side, and a narrow window would leave one
+    of them nearly empty.
     """
+    rng = rng or _rng
     l = left or []
     r = right or []
+    prefix: List[int] = []
+    bounded = True  # right still constrains this depth (prefixes are equal so far)
     depth = 0
     while True:
         l_digit = l[depth] if depth < len(l) else 0
-        r_digit = r[depth] if depth < len(r) else base
-        if r_digit - l_digit > 1:
-            return [*(l[:depth]), (l_digit + r_digit) // 2]
+        r_digit = r[depth] if bounded and depth < len(r) else base_at(depth)
+        gap = r_digit - l_digit - 1
+        if gap >= 1:
+            interior = bounded and depth < len(r) and depth < len(l)
+            step = min(gap, max(boundary, gap // (INTERIOR_SPREAD if interior else SPREAD)))
+            if _boundary_plus(depth):
+                return [*prefix, l_digit + rng.randint(1, step)]
+            return [*prefix, r_digit - rng.randint(1, step)]
+        prefix.append(l_digit)
+        if r_digit > l_digit:
+            bounded = False
         depth += 1
 
 
-@dataclass(order=True)
+def spaced_positions(count: int) -> List[List[int]]:
+    """Return `count` increasing positions spread evenly over the shallowest depth that fits.
+
+    Positions are fixed-length mixed-radix numbers (digit d in [0, base_at(d)),
+    last digit never 0), so lexicographic order matches numeric order and the
+    equal gaps (at least BOUNDARY wide) leave room for later inserts anywhere.
+    """
+    if count <= 0:
+        return []
+    radices = [base_at(0) - 1]  # last level reserves digit 0
+    capacity = radices[0]
+    while capacity < (count + 1) * BOUNDARY:
+        radices[-1] += 1  # the previous last level may now use digit 0
+        radices.append(base_at(len(radices)) - 1)
+        capacity = 1
+        for r in radices:
+            capacity *= r
+    step = capacity // (count + 1)
+    values = range(step, step * (count + 1), step)
+    if len(radices) == 1:
+        return [[v] for v in values]
+    last = radices[-1]
+    if len(radices) == 2:
+        return [[v // last, v % last + 1] for v in values]
+    positions = []
+    for v in values:
+        v, low = divmod(v, last)
+        digits = [low + 1]
+        for radix in reversed(radices[:-1]):
+            v, d = divmod(v, radix)
+            digits.append(d)
+        digits.reverse()
+        positions.append(digits)
+    return positions
+
+
+AtomId = Tuple[Tuple[int, ...], str, int]
+# (index, delete count, inserted text) against the visible text; applied in list order
+Splice = Tuple[int, int, str]
+
+
+@dataclass
+class Change:
+    """What one applied op did: text splices, plus the atoms it created and tombstoned."""
+
+    splices: List[Splice] = field(default_factory=list)
+    born: List[AtomId] = field(default_factory=list)
+    died: List[AtomId] = field(default_factory=list)
+
+
+@dataclass(order=True, slots=True)
 class Atom:
-    # Order by pos first, then site and counter for deterministic tie-breaking
-    pos: List[int] = field(compare=True)
-    site_id: str = field(compare=True)
-    counter: int = field(compare=True)
+    # Order by pos first, then site and counter for deterministic tie-breaking.
+    # The tuple is built once so sorts and bisects compare it natively instead
+    # of rebuilding (list, str, int) tuples on every comparison.
+    pos: List[int] = field(compare=False)
+    site_id: str = field(compare=False)
+    counter: int = field(compare=False)
     char: str = field(compare=False, default="")
     deleted: bool = field(compare=False, default=False)
+    key: AtomId = field(init=False, repr=False, compare=True)
+
+    def __post_init__(self) -> None:
+        self.key = (tuple(self.pos), self.site_id, self.counter)
 
     @property
-    def id(self) -> Tuple[Tuple[int, ...], str, int]:
-        return (tuple(self.pos), self.site_id, self.counter)
+    def id(self) -> AtomId:
+        return self.key
+
+
+_atom_key = attrgetter("key")
+
+
+def anchor_to_wire(anchor: AtomId | None) -> dict | None:
+    if anchor is None:
+        return None
+    pos, site, ctr = anchor
+    return {"pos": list(pos), "site": site, "ctr": ctr}
+
+
+def anchor_from_wire(data: dict | None) -> AtomId | None:
+    if data is None:
+        return None
+    return (tuple(int(d) for d in data["pos"]), str(data["site"]), int(data["ctr"]))
 
 
 class TextCRDT:
-    def __init__(self, site_id: str) -> None:
+    def __init__(self, site_id: str, seed: int | str | None = None) -> None:
         self.site_id = site_id
+        # Seeded per replica, so a document allocates the same positions on every run
+        self._rng = random.Random(site_id if seed is None else seed)
         self._counter = 0
-        self._atoms: List[Atom] = []  # always maintained sorted
+        self._atoms: List[Atom] = []  # always maintained sorted by Atom.key
+        self._by_id: Dict[AtomId, Atom] = {}
+        self._rev = 0  # bumped on every mutation; invalidates the visible-rank cache
+        self._rank_rev = -1
+        self._rank: List[int] = []
+
+    @classmethod
+    def from_text(cls, site_id: str, text: str) -> "TextCRDT":
+        """Bulk-load a document in one linear pass (no per-char neighbour lookup or sort)."""
+        crdt = cls(site_id=site_id)
+        # Millions of fresh objects would otherwise trigger repeated full GC passes
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            atoms = [
+                Atom(pos=pos, site_id=site_id, counter=ctr, char=ch)
+                for ctr, (pos, ch) in enumerate(zip(spaced_positions(len(text)), text), start=1)
+            ]
+            crdt._by_id = {a.key: a for a in atoms}
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        crdt._atoms = atoms
+        crdt._counter = len(atoms)
+        crdt._rev += 1
+        return crdt
 
     # Utilities
     def _next_counter(self) -> int:
@@ -54,14 +198,92 @@ class TextCRDT:
         return self._counter
 
     def _sort(self) -> None:
-        self._atoms.sort()
+        self._atoms.sort(key=_atom_key)
+
+    def _visible_rank(self) -> List[int]:
+        # rank[i] = number of visible atoms in _atoms[:i]; rebuilt at most once per
+        # mutation, then every id -> index lookup is a bisect plus a list read
+        if self._rank_rev != self._rev:
+            self._rank = [0, *itertools.accumulate(0 if a.deleted else 1 for a in self._atoms)]
+            self._rank_rev = self._rev
+        return self._rank
+
+    def build_rank(self) -> None:
+        """Precompute the id -> index table for the current state (e.g. while off the event loop)."""
+        self._visible_rank()
+
+    @property
+    def atom_count(self) -> int:
+        """Atoms held, tombstones included: what whole-doc walks like `to_string` cost."""
+        return len(self._atoms)
+
+    def clamp_index(self, index: int) -> int:
+        """Pin a client-supplied text index into [0, len(text)]."""
+        return min(max(index, 0), self._visible_rank()[-1])
+
+    # Cursor anchors: a caret is pinned to the atom on its left, so concurrent
+    # inserts/deletes elsewhere move it with the text instead of by raw index.
+    def anchor_at(self, index: int) -> AtomId | None:
+        """Id of the visible atom just left of `index` (None = start of doc)."""
+        rank = self._visible_rank()
+        index = min(index, rank[-1])
+        if index <= 0:
+            return None
+        return self._atoms[bisect_left(rank, index) - 1].key
+
+    def index_of_anchor(self, anchor: AtomId | None) -> int | None:
+        """Caret index right after `anchor`; a deleted anchor collapses onto its old spot.
+        Returns None for ids this replica has not seen."""
+        if anchor is None:
+            return 0
+        atom = self._by_id.get(anchor)
+        if atom is None:
+            return None
+        raw = bisect_left(self._atoms, anchor, key=_atom_key)
+        return self._visible_rank()[raw] + (0 if atom.deleted else 1)
 
     def to_string(self) -> str:
         return "".join(a.char for a in self._atoms if not a.deleted)
 
+    def iter_chunks(self, chunk_size: int = 64 * 1024) -> Iterator[str]:
+        """Yield the visible text in pieces of about `chunk_size` chars."""
+        buf: List[str] = []
+        for a in self._atoms:
+            if a.deleted:
+                continue
+            buf.append(a.char)
+            if len(buf) >= chunk_size:
+                yield "".join(buf)
+                buf = []
+        if buf:
+            yield "".join(buf)
+
     def atoms(self) -> List[Atom]:
         return list(self._atoms)
 
+    def slot_of(self, key: AtomId) -> int:
+        """Index of a known atom in the full atom list (tombstones included)."""
+        return bisect_left(self._atoms, key, key=_atom_key)
+
+    def visible_atoms(self, start: int, stop: int) -> List[Atom]:
+        """Visible atoms for text indices [start, stop), without materialising the text."""
+        rank = self._visible_rank()
+        start, stop = max(0, start), min(stop, rank[-1])
+        if start >= stop:
+            return []
+        out: List[Atom] = []
+        raw = bisect_left(rank, start + 1) - 1
+        while len(out) < stop - start:
+            atom = self._atoms[raw]
+            if not atom.deleted:
+                out.append(atom)
+            raw += 1
+        return out
+
+    def atoms_in(self, start: int, stop: int) -> List[Atom]:
+        """Slice of the full atom list by slot, tombstones included."""
+        return self._atoms[start:stop]
+
     # Position helpers
     def _pos_of_index(self, index: int) -> List[int] | None:
         # position of atom currently at index (visible only)
@@ -85,13 +307,16 @@ class TextCRDT:
     # Local ops (generate CRDT ops)
     def local_insert(self, index: int, text: str) -> dict:
         ops: List[dict] = []
+        # Each typed char lands right after the previous one, so the neighbours
+        # only need resolving once; bisect keeps the list sorted without a full sort.
+        left, right = self._neighbor_positions(self.clamp_index(index))
+        self._rev += 1
         for ch in text:
-            left, right = self._neighbor_positions(index)
-            pos = between_pos(left, right)
+            pos = between_pos(left, right, rng=self._rng)
             atom = Atom(pos=pos, site_id=self.site_id, counter=self._next_counter(), char=ch)
-            self._atoms.append(atom)
-            self._sort()
-            index += 1
+            insort(self._atoms, atom, key=_atom_key)
+            self._by_id[atom.key] = atom
+            left = pos
             ops.append({
                 "type": "ins",
                 "pos": atom.pos,
@@ -103,9 +328,11 @@ class TextCRDT:
 
     def local_delete(self, index: int, length: int) -> dict:
         visible = [a for a in self._atoms if not a.deleted]
-        to_delete = visible[index : index + length]
+        index = self.clamp_index(index)
+        to_delete = visible[index : index + max(length, 0)]
         for a in to_delete:
             a.deleted = True
+        self._rev += 1
         return {
             "type": "del_batch",
             "targets": [
@@ -116,35 +343,88 @@ class TextCRDT:
     # Remote op application (idempotent)
     def apply(self, op: dict) -> None:
         t = op.get("type")
+        self._rev += 1
         if t == "ins_batch":
-            for atom in op.get("atoms", []):
-                self._apply_ins(atom)
-            self._sort()
+            self._insert_sorted([new for new in map(self._apply_ins, op.get("atoms", [])) if new is not None])
         elif t == "del_batch":
             for tgt in op.get("targets", []):
                 self._apply_del(tgt)
         elif t == "ins":
-            self._apply_ins(op)
-            self._sort()
+            new = self._apply_ins(op)
+            if new is not None:
+                self._insert_sorted([new])
         elif t == "del":
             self._apply_del(op)
 
-    def _apply_ins(self, atom: dict) -> None:
+    def apply_tracked(self, op: dict) -> Change:
+        """`apply`, also reporting the visible-text splices and atom ids it changed (for history)."""
+        t = op.get("type")
+        if t in ("del", "del_batch"):
+            targets = op.get("targets", []) if t == "del_batch" else [op]
+            doomed: Dict[AtomId, int] = {}
+            for tgt in targets:
+                key = (tuple(tgt["pos"]), str(tgt["site"]), int(tgt["ctr"]))
+                atom = self._by_id.get(key)
+                if atom is not None and not atom.deleted:
+                    doomed[key] = self.index_of_anchor(key) - 1
+            self.apply(op)
+            # Highest index first, so earlier deletions don't shift later ones
+            splices = _runs(sorted(set(doomed.values()), reverse=True), lambda i: (i, 1, ""), descending=True)
+            return Change(splices=splices, died=list(doomed))
+        if t in ("ins", "ins_batch"):
+            atoms = op.get("atoms", []) if t == "ins_batch" else [op]
+            fresh = [(tuple(a["pos"]), str(a["site"]), int(a["ctr"])) for a in atoms]
+            fresh = list(dict.fromkeys(key for key in fresh if key not in self._by_id))
+            self.apply(op)
+            # Lowest final index first: each char lands where it ends up
+            placed = sorted((self.index_of_anchor(key) - 1, self._by_id[key].char) for key in fresh)
+            return Change(splices=_runs(placed, lambda item: (item[0], 0, item[1]), descending=False), born=fresh)
+        self.apply(op)
+        return Change()
+
+    def _apply_ins(self, atom: dict) -> Atom | None:
         pos = list(atom["pos"])  # ensure list
-        site = str(atom["site"]) 
-        ctr = int(atom["ctr"]) 
-        ch = str(atom["ch"]) 
+        site = str(atom["site"])
+        ctr = int(atom["ctr"])
+        ch = str(atom["ch"])
         # idempotency: if same id exists, ignore
-        if any(a.pos == pos and a.site_id == site and a.counter == ctr for a in self._atoms):
+        if (tuple(pos), site, ctr) in self._by_id:
+            return None
+        new = Atom(pos=pos, site_id=site, counter=ctr, char=ch)
+        self._by_id[new.key] = new
+        return new
+
+    def _insert_sorted(self, fresh: List[Atom]) -> None:
+        if not fresh:
             return
-        self._atoms.append(Atom(pos=pos, site_id=site, counter=ctr, char=ch))
+        fresh.sort(key=_atom_key)
+        lo = bisect_left(self._atoms, fresh[0].key, key=_atom_key)
+        if lo == bisect_left(self._atoms, fresh[-1].key, lo=lo, key=_atom_key):
+            # The whole batch falls between two existing atoms (a typed run or a
+            # paste): splice it in instead of re-sorting the entire doc
+            self._atoms[lo:lo] = fresh
+        else:
+            self._atoms.extend(fresh)
+            self._sort()
 
     def _apply_del(self, tgt: dict) -> None:
-        pos = list(tgt["pos"]) 
-        site = str(tgt["site"]) 
-        ctr = int(tgt["ctr"]) 
-        for a in self._atoms:
-            if a.pos == pos and a.site_id == site and a.counter == ctr:
-                a.deleted = True
-                break
+        target = self._by_id.get((tuple(tgt["pos"]), str(tgt["site"]), int(tgt["ctr"])))
+        if target is not None:
+            target.deleted = True
+
 
+def _runs(items: list, to_splice, descending: bool) -> List[Splice]:
+    """Merge single-char splices at consecutive indices into one splice per run."""
+    runs: List[Splice] = []
+    for item in items:
+        index, deleted, text = to_splice(item)
+        if runs:
+            last_index, last_deleted, last_text = runs[-1]
+            if descending and deleted and index == last_index - 1:
+                runs[-1] = (index, last_deleted + 1, "")
+                continue
+            if not descending and not deleted and index == last_index + len(last_text):
+                runs[-1] = (last_index, 0, last_text + text)
+                continue
+        runs.append((index, deleted, text))
+    return runs
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import FrozenSet
+
+# minute hour day-of-month month day-of-week (0 or 7 = Sunday)
+_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+
+def _parse_field(text: str, lo: int, hi: int) -> FrozenSet[int]:
+    values = set()
+    for part in text.split(","):
+        rng, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if step < 1:
+            raise ValueError(f"bad cron step: {part}")
+        if rng == "*":
+            start, end = lo, hi
+        elif "-" in rng:
+            a, b = rng.split("-", 1)
+            start, end = int(a), int(b)
+        else:
+            start = int(rng)
+            end = hi if step_text else start
+        if not (lo <= start <= end <= hi):
+            raise ValueError(f"cron value out of range: {part}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronExpr:
+    """Five-field cron expression (UTC), with `*`, lists, ranges, steps and @hourly-style aliases.
+
+    When both day-of-month and day-of-week are restricted a day matching
+    either one fires, as in Vixie cron.
+    """
+
+    def __init__(self, expr: str) -> None:
+        self.expr = expr
+        parts = _ALIASES.get(expr.strip(), expr).split()
+        if len(parts) != 5:
+            raise ValueError(f"cron needs 5 fields: {expr!r}")
+        try:
+            fields = [_parse_field(p, lo, hi) for p, (lo, hi) in zip(parts, _FIELDS)]
+        except ValueError as exc:
+            raise ValueError(f"bad cron expression {expr!r}: {exc}") from None
+        self.minutes, self.hours, self.days, self.months, weekdays = fields
+        self.weekdays = frozenset(d % 7 for d in weekdays)
+        self._any_day = parts[2] == "*"
+        self._any_weekday = parts[4] == "*"
+
+    def _day_matches(self, t: datetime) -> bool:
+        dom = t.day in self.days
+        dow = t.isoweekday() % 7 in self.weekdays
+        if self._any_day and self._any_weekday:
+            return True
+        if self._any_day:
+            return dow
+        if self._any_weekday:
+            return dom
+        return dom or dow
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after `after`."""
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t.year + 5  # e.g. "0 0 30 2 *" never matches
+        while t.year <= limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"cron expression never fires: {self.expr!r}")
@@ -2,13 +2,54 @@ from __future__ import annotations
 
 import asyncio
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, TypeVar
 
 from rt_collab.core.config import get_settings
-from rt_collab.services.task_queue import task_queue
-from rt_collab.services.crdt import TextCRDT
+from rt_collab.services.crdt import Change, TextCRDT, anchor_from_wire
+from rt_collab.services.history import VersionDiff, history
+from rt_collab.services.offload import crdt_executor
+from rt_collab.services.search import IndexPatch, SearchIndex, search_index
+from rt_collab.services.snapshot_scheduler import snapshot_scheduler
+
+
+def _op_size(op_batch: dict) -> int:
+    # Characters touched by a remote op batch, for the snapshot scheduler
+    if op_batch.get("type") == "ins_batch":
+        return len(op_batch.get("atoms", ()))
+    if op_batch.get("type") == "del_batch":
+        return len(op_batch.get("targets", ()))
+    return 1
+
+
+T = TypeVar("T")
+
+
+def _apply(crdt: TextCRDT, op_batch: dict) -> Change:
+    change = crdt.apply_tracked(op_batch)
+    crdt.build_rank()  # history/search/presence lookups that follow stay cheap
+    return change
+
+
+def _load(site_id: str, text: str) -> Tuple[TextCRDT, IndexPatch]:
+    crdt = TextCRDT.from_text(site_id=site_id, text=text)
+    return crdt, SearchIndex.prepare(crdt, Change(), full=True)
+
+
+def _insert(crdt: TextCRDT, index: int, text: str) -> Tuple[dict, int, str]:
+    # Client indices are untrusted; the clamped one is what the edit actually used
+    index = crdt.clamp_index(index)
+    op = crdt.local_insert(index, text)
+    crdt.build_rank()
+    return op, index, crdt.to_string()
+
+
+def _delete(crdt: TextCRDT, index: int, length: int) -> Tuple[dict, int, str]:
+    index = crdt.clamp_index(index)
+    op = crdt.local_delete(index, length)
+    crdt.build_rank()
+    return op, index, crdt.to_string()
 
 
 @dataclass
@@ -17,6 +58,11 @@ class DocState:
     version: int = 0  # monotonically increasing with each op batch applied
     ops_applied: int = 0
     last_activity: datetime | None = None
+    # Serializes CRDT work per doc, so ops apply in arrival order even when
+    # some of them run on the executor; `busy` is set while a worker thread
+    # holds the CRDT, and sync readers (presence) must leave it alone
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+    busy: bool = False
 
 
 class InMemoryDocStore:
@@ -34,68 +80,160 @@ class InMemoryDocStore:
                 self._docs[doc_id] = DocState(TextCRDT(site_id=str(doc_id)))
             return self._docs[doc_id]
 
+    def peek(self, doc_id: uuid.UUID) -> DocState | None:
+        """Resident doc state without creating it (sync, for presence/cursor lookups)."""
+        return self._docs.get(doc_id)
+
+    async def create_from_text(self, doc_id: uuid.UUID, text: str) -> DocState:
+        """Create a doc pre-filled with `text` via the CRDT bulk loader."""
+        # Nothing else can see the new CRDT yet, so no doc lock is needed here
+        if crdt_executor.should_offload(len(text)):
+            crdt, patch = await crdt_executor.run(_load, str(doc_id), text)
+        else:
+            crdt, patch = _load(str(doc_id), text)
+        async with self._lock:
+            if doc_id in self._docs:
+                raise ValueError("doc_exists")
+            doc = DocState(crdt)
+            if text:
+                doc.version = 1
+                doc.ops_applied = 1
+                doc.last_activity = datetime.utcnow()
+            self._docs[doc_id] = doc
+        history.start(doc_id, doc.version, text)
+        search_index.apply(doc_id, patch)
+        if text:
+            await snapshot_scheduler.note_edit(doc_id, len(text))
+        return doc
+
+    async def _run(
+        self, doc: DocState, size: int, fn: Callable[..., T], *args: Any, threshold: int | None = None
+    ) -> T:
+        # Caller holds doc.lock; big jobs go to the executor, the rest run inline
+        if not crdt_executor.should_offload(size, threshold):
+            return fn(*args)
+        doc.busy = True
+        try:
+            return await crdt_executor.run(fn, *args)
+        finally:
+            doc.busy = False
+
     async def apply_ops(self, doc_id: uuid.UUID, op_batch: dict) -> int:
         doc = await self.get_or_create(doc_id)
-        doc.crdt.apply(op_batch)
-        doc.version += 1
-        doc.ops_applied += 1
-        doc.last_activity = datetime.utcnow()
-        await self._maybe_enqueue_snapshot(doc_id, doc.version)
-        return doc.version
+        async with doc.lock:
+            change = await self._run(doc, _op_size(op_batch), _apply, doc.crdt, op_batch)
+            doc.version += 1
+            doc.ops_applied += 1
+            doc.last_activity = datetime.utcnow()
+            await self._journal(doc_id, doc, change, doc.crdt.to_string)
+            version = doc.version
+        await snapshot_scheduler.note_edit(doc_id, _op_size(op_batch))
+        return version
+
+    async def _journal(self, doc_id: uuid.UUID, doc: DocState, change: Change, text: Callable[[], str]) -> None:
+        # Derived views that follow every applied change: version history and
+        # search. Caller holds doc.lock; the index patch reads the CRDT, so it
+        # goes off the loop along with big changes.
+        history.record(doc_id, doc.version, change, text)
+        full = search_index.needs_full(doc_id)
+        if full:
+            # A full re-tokenization walks the whole doc, like a render
+            size, threshold = doc.crdt.atom_count, get_settings().crdt_offload_doc_chars
+        else:
+            size, threshold = len(change.born) + len(change.died), None
+        patch: IndexPatch = await self._run(
+            doc, size, SearchIndex.prepare, doc.crdt, change, full, threshold=threshold
+        )
+        search_index.apply(doc_id, patch)
 
     async def snapshot_text(self, doc_id: uuid.UUID) -> tuple[str, int]:
         doc = await self.get_or_create(doc_id)
-        return doc.crdt.to_string(), doc.version
+        async with doc.lock:
+            size = doc.crdt.atom_count
+            if crdt_executor.should_offload(size, get_settings().crdt_offload_doc_chars):
+                doc.busy = True
+                try:
+                    return await crdt_executor.run(doc.crdt.to_string), doc.version
+                finally:
+                    doc.busy = False
+            return doc.crdt.to_string(), doc.version
+
+    async def read_chunks(
+        self, doc_id: uuid.UUID, fn: Callable[[Iterator[str], int], T], chunk_size: int = 64 * 1024
+    ) -> T:
+        """Run `fn(chunks, version)` on a worker thread over a lazy chunked view of the visible text.
+
+        The doc lock is held until `fn` returns, so edits to this doc wait
+        instead of tearing the view, while the event loop stays free.
+        """
+        doc = await self.get_or_create(doc_id)
+        async with doc.lock:
+            doc.busy = True
+            try:
+                return await asyncio.to_thread(fn, doc.crdt.iter_chunks(chunk_size), doc.version)
+            finally:
+                doc.busy = False
+
+    async def diff(self, doc_id: uuid.UUID, from_version: int, to_version: int) -> VersionDiff:
+        """`history.diff` under the doc lock; long ranges run on the executor."""
+        doc = await self.get_or_create(doc_id)
+        async with doc.lock:
+            size = history.diff_size(doc_id, from_version, to_version)
+            return await self._run(doc, size, history.diff, doc_id, doc.crdt, from_version, to_version)
 
     async def local_insert(self, doc_id: uuid.UUID, index: int, text: str) -> tuple[dict, int, str]:
         doc = await self.get_or_create(doc_id)
-        op = doc.crdt.local_insert(index, text)
-        doc.version += 1
-        doc.ops_applied += 1
-        doc.last_activity = datetime.utcnow()
-        new_text = doc.crdt.to_string()
-        await self._maybe_enqueue_snapshot(doc_id, doc.version)
-        return op, doc.version, new_text
+        async with doc.lock:
+            op, index, new_text = await self._run(doc, len(text), _insert, doc.crdt, index, text)
+            doc.version += 1
+            doc.ops_applied += 1
+            doc.last_activity = datetime.utcnow()
+            born = [anchor_from_wire(atom) for atom in op["atoms"]]
+            await self._journal(doc_id, doc, Change([(index, 0, text)], born=born), lambda: new_text)
+            version = doc.version
+        await snapshot_scheduler.note_edit(doc_id, len(text))
+        return op, version, new_text
 
     async def local_delete(self, doc_id: uuid.UUID, index: int, length: int) -> tuple[dict, int, str]:
         doc = await self.get_or_create(doc_id)
-        op = doc.crdt.local_delete(index, length)
-        doc.version += 1
-        doc.ops_applied += 1
-        doc.last_activity = datetime.utcnow()
-        new_text = doc.crdt.to_string()
-        await self._maybe_enqueue_snapshot(doc_id, doc.version)
-        return op, doc.version, new_text
+        async with doc.lock:
+            op, index, new_text = await self._run(doc, length, _delete, doc.crdt, index, length)
+            doc.version += 1
+            doc.ops_applied += 1
+            doc.last_activity = datetime.utcnow()
+            died = [anchor_from_wire(target) for target in op["targets"]]
+            await self._journal(doc_id, doc, Change([(index, len(died), "")], died=died), lambda: new_text)
+            version = doc.version
+        await snapshot_scheduler.note_edit(doc_id, length)
+        return op, version, new_text
 
     async def stats(self, doc_id: uuid.UUID) -> dict:
+        text, version = await self.snapshot_text(doc_id)
         doc = await self.get_or_create(doc_id)
         return {
-            "version": doc.version,
+            "version": version,
             "ops_applied": doc.ops_applied,
-            "length": len(doc.crdt.to_string()),
+            "length": len(text),
             "last_activity": doc.last_activity,
         }
 
     async def reset(self) -> None:
         async with self._lock:
             self._docs = {}
+        history.reset()
+        search_index.reset()
+
+    async def drop(self, doc_id: uuid.UUID) -> bool:
+        """Unload a doc along with its version history and search postings."""
+        async with self._lock:
+            doc = self._docs.pop(doc_id, None)
+        history.forget(doc_id)
+        search_index.forget(doc_id)
+        return doc is not None
 
     async def list_doc_ids(self) -> list[uuid.UUID]:
         async with self._lock:
             return list(self._docs.keys())
 
-    async def _maybe_enqueue_snapshot(self, doc_id: uuid.UUID, version: int) -> None:
-        settings = get_settings()
-        if settings.snapshot_interval <= 0:
-            return
-        if version % settings.snapshot_interval != 0:
-            return
-        idem = f"snapshot-{doc_id}-{version}"
-        await task_queue.enqueue(
-            "snapshot.create",
-            {"doc_id": str(doc_id), "version": version},
-            idempotency_key=idem,
-        )
-
 
 store = InMemoryDocStore()
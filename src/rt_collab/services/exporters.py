@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import html
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator
+
+
+# Renderers are generator stages: text chunks in, rendered chunks out, so an
+# export never holds more than one chunk of the document in memory at a time.
+Renderer = Callable[[str, Iterable[str]], Iterator[str]]
+
+
+def render_plain(doc_id: str, chunks: Iterable[str]) -> Iterator[str]:
+    yield from chunks
+
+
+def render_markdown(doc_id: str, chunks: Iterable[str]) -> Iterator[str]:
+    yield f"# Doc {doc_id}\n\n"
+    yield from chunks
+
+
+def render_html(doc_id: str, chunks: Iterable[str]) -> Iterator[str]:
+    title = html.escape(f"Doc {doc_id}")
+    yield f'<!DOCTYPE html>\n<html>\n<head><meta charset="utf-8"><title>{title}</title></head>\n<body>\n'
+    yield f"<h1>{title}</h1>\n<pre>"
+    for chunk in chunks:
+        yield html.escape(chunk, quote=False)
+    yield "</pre>\n</body>\n</html>\n"
+
+
+def encode_utf8(chunks: Iterable[str]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield chunk.encode("utf-8")
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    name: str
+    content_type: str
+    extension: str
+    render: Renderer
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "plain": ExportFormat("plain", "text/plain; charset=utf-8", "txt", render_plain),
+    "markdown": ExportFormat("markdown", "text/markdown; charset=utf-8", "md", render_markdown),
+    "html": ExportFormat("html", "text/html; charset=utf-8", "html", render_html),
+}
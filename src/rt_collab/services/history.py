@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import json
+import uuid
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from operator import attrgetter
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from rt_collab.core.config import get_settings
+from rt_collab.services.crdt import Atom, AtomId, Change, Splice, TextCRDT, anchor_to_wire
+from rt_collab.services.snapshots import InMemorySnapshotStore, snapshots
+
+
+# Diff hunks stop merging across a gap of more than this many untouched atoms,
+# so a diff never scans far beyond the atoms that actually changed
+DIFF_GAP_SCAN = 64
+
+
+@dataclass
+class Delta:
+    version: int  # the version this delta produced
+    splices: List[Splice]
+    at: datetime
+    born: List[AtomId] = field(default_factory=list)
+    died: List[AtomId] = field(default_factory=list)
+
+    @property
+    def inserted(self) -> int:
+        return sum(len(text) for _, _, text in self.splices)
+
+    @property
+    def deleted(self) -> int:
+        return sum(count for _, count, _ in self.splices)
+
+
+@dataclass
+class DocHistory:
+    # deltas[i].version == base + i + 1; versions at or below `base` can't be replayed
+    base: int = 0
+    deltas: List[Delta] = field(default_factory=list)
+    # (version, text) every HISTORY_CHECKPOINT_EVERY versions, sorted by version
+    checkpoints: List[Tuple[int, str]] = field(default_factory=lambda: [(0, "")])
+    # Version each atom was inserted / tombstoned at (atoms older than `base` are absent)
+    born_at: Dict[AtomId, int] = field(default_factory=dict)
+    died_at: Dict[AtomId, int] = field(default_factory=dict)
+
+    def visible_at(self, atom: Atom, version: int) -> bool:
+        if self.born_at.get(atom.key, self.base) > version:
+            return False
+        died = self.died_at.get(atom.key)
+        # No journaled death: still alive, or already tombstoned at `base`
+        return not atom.deleted if died is None else version < died
+
+
+@dataclass
+class Hunk:
+    kind: str  # "insert" | "delete"
+    start: AtomId
+    text: str
+
+    def to_wire(self) -> dict:
+        return {"op": self.kind, "start": anchor_to_wire(self.start), "text": self.text}
+
+
+@dataclass
+class VersionDiff:
+    from_version: int
+    to_version: int
+    inserted: int = 0
+    deleted: int = 0
+    hunks: List[Hunk] = field(default_factory=list)
+
+    def iter_ndjson(self, doc_id: uuid.UUID) -> Iterator[bytes]:
+        """A header line with the totals, then one line per hunk in document order."""
+        header = {
+            "doc_id": str(doc_id),
+            "from": self.from_version,
+            "to": self.to_version,
+            "inserted": self.inserted,
+            "deleted": self.deleted,
+            "hunks": len(self.hunks),
+        }
+        yield json.dumps(header).encode() + b"\n"
+        for hunk in self.hunks:
+            yield json.dumps(hunk.to_wire(), ensure_ascii=False).encode() + b"\n"
+
+
+class HistoryStore:
+    """Per-version text deltas plus a sorted checkpoint index, for time-travel reads.
+
+    `text_at(doc, V)` bisects for the nearest checkpoint at or below V (its own
+    every-N-versions checkpoints or a snapshot from the snapshot store) and
+    replays at most N deltas from there, so any version costs the same to
+    rebuild. Rebuilt texts are cached LRU within HISTORY_CACHE_BYTES.
+    Retention (HISTORY_MAX_VERSIONS / HISTORY_MAX_AGE_S) moves `base` up to
+    a checkpoint, a whole checkpoint interval at a time.
+    """
+
+    def __init__(self, snapshot_store: InMemorySnapshotStore = snapshots, max_bytes: int | None = None) -> None:
+        self._snapshots = snapshot_store
+        self._max_bytes = max_bytes
+        self._docs: Dict[uuid.UUID, DocHistory] = {}
+        self._cache: "OrderedDict[Tuple[uuid.UUID, int], str]" = OrderedDict()
+        self.cache_bytes = 0
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "replayed": 0}
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes if self._max_bytes is not None else get_settings().history_cache_bytes
+
+    def start(self, doc_id: uuid.UUID, version: int, text: str) -> None:
+        """Begin (or restart) a doc's history at a known version, e.g. a bulk-loaded create."""
+        self._docs[doc_id] = DocHistory(base=version, checkpoints=[(version, text)])
+
+    def record(self, doc_id: uuid.UUID, version: int, change: Change, text: Callable[[], str]) -> None:
+        """Journal the change that produced `version`; `text()` is only rendered for checkpoints."""
+        hist = self._docs.setdefault(doc_id, DocHistory())
+        if version != hist.base + len(hist.deltas) + 1:
+            # A gap (history started late, or reset): restart from here
+            self.start(doc_id, version, text())
+            return
+        hist.deltas.append(Delta(version, change.splices, datetime.utcnow(), change.born, change.died))
+        for key in change.born:
+            hist.born_at[key] = version
+        for key in change.died:
+            hist.died_at[key] = version
+        if version % max(1, get_settings().history_checkpoint_every) == 0:
+            hist.checkpoints.append((version, text()))
+            self._trim(hist)
+
+    @staticmethod
+    def _trim(hist: DocHistory) -> None:
+        settings = get_settings()
+        current = hist.base + len(hist.deltas)
+        cutoff = hist.base
+        if settings.history_max_versions > 0:
+            cutoff = max(cutoff, current - settings.history_max_versions)
+        if settings.history_max_age_s > 0:
+            oldest = datetime.utcnow() - timedelta(seconds=settings.history_max_age_s)
+            cutoff = max(cutoff, hist.base + bisect_right(hist.deltas, oldest, key=attrgetter("at")))
+        # The new base must be a checkpoint, or versions just above it couldn't be rebuilt
+        i = bisect_right(hist.checkpoints, cutoff, key=lambda cp: cp[0]) - 1
+        base = hist.checkpoints[i][0]
+        if base <= hist.base:
+            return
+        dropped = hist.deltas[: base - hist.base]
+        del hist.deltas[: base - hist.base]
+        del hist.checkpoints[:i]
+        for delta in dropped:
+            for key in delta.born:
+                if hist.born_at.get(key, base + 1) <= base:
+                    del hist.born_at[key]
+            for key in delta.died:
+                if hist.died_at.get(key, base + 1) <= base:
+                    del hist.died_at[key]
+        hist.base = base
+
+    def current_version(self, doc_id: uuid.UUID) -> int | None:
+        hist = self._docs.get(doc_id)
+        return hist.base + len(hist.deltas) if hist else None
+
+    def listing(self, doc_id: uuid.UUID, before: int | None = None, limit: int = 50) -> List[dict]:
+        """Newest-first history entries below `before`."""
+        hist = self._docs.get(doc_id)
+        if hist is None:
+            return []
+        checkpointed = {v for v, _ in hist.checkpoints}
+        end = len(hist.deltas) if before is None else max(0, min(len(hist.deltas), before - hist.base - 1))
+        entries = []
+        for delta in reversed(hist.deltas[max(0, end - limit) : end]):
+            entries.append(
+                {
+                    "version": delta.version,
+                    "at": delta.at,
+                    "inserted": delta.inserted,
+                    "deleted": delta.deleted,
+                    "checkpoint": delta.version in checkpointed,
+                }
+            )
+        return entries
+
+    async def text_at(self, doc_id: uuid.UUID, version: int) -> str:
+        """The doc's text as of `version`; LookupError if that version isn't retained."""
+        hist = self._docs.get(doc_id)
+        if hist is None or not hist.base <= version <= hist.base + len(hist.deltas):
+            raise LookupError("version_unavailable")
+        key = (doc_id, version)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return cached
+        self.stats["misses"] += 1
+
+        i = bisect_right(hist.checkpoints, version, key=lambda cp: cp[0])
+        base_version, text = hist.checkpoints[i - 1]
+        snap = await self._snapshots.at_or_before(doc_id, version)
+        if snap is not None and base_version < snap.version and snap.version >= hist.base:
+            base_version, text = snap.version, snap.text
+        for delta in hist.deltas[base_version - hist.base : version - hist.base]:
+            for index, count, inserted in delta.splices:
+                text = text[:index] + inserted + text[index + count :]
+            self.stats["replayed"] += 1
+        self._put(key, text)
+        return text
+
+    def diff_size(self, doc_id: uuid.UUID, from_version: int, to_version: int) -> int:
+        """Atom births and deaths journaled in (from, to]: what `diff` over that range costs."""
+        hist = self._docs.get(doc_id)
+        if hist is None:
+            return 0
+        start, stop = max(0, from_version - hist.base), max(0, to_version - hist.base)
+        return sum(len(delta.born) + len(delta.died) for delta in hist.deltas[start:stop])
+
+    def diff(self, doc_id: uuid.UUID, crdt: TextCRDT, from_version: int, to_version: int) -> VersionDiff:
+        """Atoms inserted and tombstoned between two versions, as hunks in document order.
+
+        Works from the journaled atom ids rather than the two texts: the net
+        change set comes from the deltas in (from, to], is ordered by atom id
+        (which is document order), and each atom's slot is found by bisecting
+        the CRDT's atom list, so cost follows the number of changes, not the
+        document length. Atoms are never purged, so tombstoned ones still
+        carry their characters. LookupError if either version isn't retained.
+        """
+        hist = self._docs.get(doc_id)
+        current = hist.base + len(hist.deltas) if hist else -1
+        if hist is None or not hist.base <= from_version <= to_version <= current:
+            raise LookupError("version_unavailable")
+        inserted: Dict[AtomId, None] = {}
+        deleted: Dict[AtomId, None] = {}
+        for delta in hist.deltas[from_version - hist.base : to_version - hist.base]:
+            for key in delta.born:
+                inserted[key] = None
+            for key in delta.died:
+                if key in inserted:
+                    # Typed and removed again within the range: not part of the diff
+                    del inserted[key]
+                else:
+                    deleted[key] = None
+        result = VersionDiff(from_version, to_version, len(inserted), len(deleted))
+
+        prev_slot = -1
+        for key in sorted(inserted.keys() | deleted.keys()):
+            kind = "insert" if key in inserted else "delete"
+            slot = crdt.slot_of(key)
+            char = crdt.atoms_in(slot, slot + 1)[0].char
+            last = result.hunks[-1] if result.hunks else None
+            if last is not None and last.kind == kind and self._adjacent(hist, crdt, prev_slot, slot, from_version, to_version):
+                last.text += char
+            else:
+                result.hunks.append(Hunk(kind, key, char))
+            prev_slot = slot
+        return result
+
+    @staticmethod
+    def _adjacent(hist: DocHistory, crdt: TextCRDT, left: int, right: int, from_version: int, to_version: int) -> bool:
+        # Nothing visible at either end of the range sits between the two slots
+        if right - left - 1 > DIFF_GAP_SCAN:
+            return False
+        for atom in crdt.atoms_in(left + 1, right):
+            if hist.visible_at(atom, from_version) or hist.visible_at(atom, to_version):
+                return False
+        return True
+
+    def _put(self, key: Tuple[uuid.UUID, int], text: str) -> None:
+        size = len(text)
+        if size > self.max_bytes:
+            return
+        self._cache[key] = text
+        self.cache_bytes += size
+        while self.cache_bytes > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self.cache_bytes -= len(evicted)
+
+    def forget(self, doc_id: uuid.UUID) -> None:
+        self._docs.pop(doc_id, None)
+        for key in [key for key in self._cache if key[0] == doc_id]:
+            self.cache_bytes -= len(self._cache.pop(key))
+
+    def reset(self) -> None:
+        self._docs = {}
+        self._cache.clear()
+        self.cache_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "replayed": 0}
+
+
+history = HistoryStore()
@@ -2,12 +2,16 @@ from __future__ import annotations
 
 import uuid
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Iterator, List
 
+from rt_collab.core.config import get_settings
+from rt_collab.services.artifacts import Artifact, artifacts
+from rt_collab.services.backups import backups
 from rt_collab.services.docs import store
+from rt_collab.services.exporters import EXPORT_FORMATS, encode_utf8
 from rt_collab.services.notifications import notification_log
 from rt_collab.services.snapshots import snapshots
-from rt_collab.services.task_queue import RetryableError, TaskQueue
+from rt_collab.services.task_queue import Job, RetryableError, Schedule, TaskQueue
 
 
 async def handle_snapshot_create(payload: Dict[str, object]) -> Dict[str, object]:
@@ -17,21 +21,63 @@ async def handle_snapshot_create(payload: Dict[str, object]) -> Dict[str, object
     return {"doc_id": str(doc_id), "version": version, "created_at": snap.created_at.isoformat()}
 
 
+async def handle_snapshot_create_batch(payloads: List[Dict[str, object]]) -> List[object]:
+    # One render per doc however many of its jobs share the batch, one store write for all
+    targets: List[uuid.UUID | ValueError] = []
+    rendered: Dict[uuid.UUID, tuple[str, int]] = {}
+    for payload in payloads:
+        try:
+            doc_id = uuid.UUID(str(payload.get("doc_id")))
+        except ValueError as exc:
+            targets.append(exc)
+            continue
+        if doc_id not in rendered:
+            rendered[doc_id] = await store.snapshot_text(doc_id)
+        targets.append(doc_id)
+    recorded = await snapshots.record_many((doc_id, version, text) for doc_id, (text, version) in rendered.items())
+    by_doc = {snap.doc_id: snap for snap in recorded}
+    return [
+        t if isinstance(t, ValueError) else {
+            "doc_id": str(t), "version": by_doc[t].version, "created_at": by_doc[t].created_at.isoformat()
+        }
+        for t in targets
+    ]
+
+
 async def handle_doc_export(payload: Dict[str, object]) -> Dict[str, object]:
     doc_id = uuid.UUID(str(payload.get("doc_id")))
     export_format = str(payload.get("format") or "markdown")
-    text, version = await store.snapshot_text(doc_id)
-    meta = {
+    fmt = EXPORT_FORMATS.get(export_format)
+    if fmt is None:
+        raise ValueError(f"unsupported_format: {export_format}")
+
+    def write(chunks: Iterator[str], version: int) -> tuple[Artifact, int]:
+        # Rendered straight to disk, chunk by chunk, off the event loop; the
+        # job result only keeps a reference
+        artifact = artifacts.write(
+            encode_utf8(fmt.render(str(doc_id), chunks)),
+            filename=f"{doc_id}-v{version}.{fmt.extension}",
+            content_type=fmt.content_type,
+        )
+        return artifact, version
+
+    artifact, version = await store.read_chunks(doc_id, write)
+    return {
         "doc_id": str(doc_id),
         "version": version,
         "exported_at": datetime.utcnow().isoformat(),
         "format": export_format,
+        "artifact_id": artifact.id,
+        "content_type": artifact.content_type,
+        "size": artifact.size,
+        "download_url": f"/v1/artifacts/{artifact.id}",
     }
-    if export_format == "markdown":
-        meta["content"] = f"# Doc {doc_id}\\n\\n{str(text)}"
-    else:
-        meta["content"] = str(text)
-    return meta
+
+
+def release_export(job: Job) -> None:
+    artifact_id = (job.result or {}).get("artifact_id")
+    if isinstance(artifact_id, str):
+        artifacts.delete(artifact_id)
 
 
 async def handle_activity_digest(payload: Dict[str, object]) -> Dict[str, object]:
@@ -59,20 +105,82 @@ async def handle_email_notify(payload: Dict[str, object]) -> Dict[str, object]:
     return {"count": len(recipients), "doc_id": doc_id}
 
 
+async def handle_email_notify_batch(payloads: List[Dict[str, object]]) -> List[object]:
+    outcomes: List[object] = []
+    events = []
+    for payload in payloads:
+        recipients = payload.get("recipients") or []
+        if not isinstance(recipients, list) or not recipients:
+            outcomes.append(RetryableError("no_recipients"))
+            continue
+        doc_id = str(payload.get("doc_id"))
+        message = str(payload.get("message") or "")
+        events += [(str(r), doc_id, message) for r in recipients]
+        outcomes.append({"count": len(recipients), "doc_id": doc_id})
+    await notification_log.record_many(events)
+    return outcomes
+
+
 async def handle_backup_run(payload: Dict[str, object]) -> Dict[str, object]:
-    # Pretend to back up all known docs by copying their latest state
-    doc_ids = await store.list_doc_ids()
-    backed_up = []
-    for doc_id in doc_ids:
-        text, version = await store.snapshot_text(doc_id)
-        await snapshots.record(doc_id, version, text)
-        backed_up.append({"doc_id": str(doc_id), "version": version})
-    return {"backed_up": backed_up, "count": len(backed_up)}
+    # Incremental: only docs changed since their last backup; resumes an interrupted run first
+    concurrency = payload.get("concurrency")
+    resume = payload.get("resume", True)
+    if not isinstance(resume, bool):
+        # bool("false") is True: a string here would silently resume a requested full run
+        raise ValueError(f"invalid_resume: {resume!r}")
+    manifest = await backups.run(
+        str(payload.get("target") or "snapshots"),
+        concurrency=int(concurrency) if concurrency else None,
+        resume=resume,
+    )
+    return {
+        "backup_id": manifest.id,
+        "target": manifest.target,
+        "count": len(manifest.docs),
+        "bytes": sum(entry.size for entry in manifest.docs.values()),
+        "resumed": manifest.resumed,
+        "manifest": str(backups.manifest_path(manifest.id)),
+    }
+
+
+async def handle_ops_compact(payload: Dict[str, object]) -> Dict[str, object]:
+    # Imported here so registering handlers at startup doesn't pull in SQLAlchemy
+    from rt_collab.services.oplog import oplog
+
+    doc_id = uuid.UUID(str(payload.get("doc_id")))
+    snap = await snapshots.latest(doc_id)
+    if snap is None:
+        return {"doc_id": str(doc_id), "snapshot_version": None, "deleted": 0, "chunks": 0}
+    chunk = payload.get("chunk_size")
+    result = await oplog.compact(str(doc_id), snap.version, snap.text, int(chunk) if chunk else None)
+    return {
+        "doc_id": str(doc_id),
+        "snapshot_version": result.snapshot_version,
+        "deleted": result.deleted,
+        "chunks": result.chunks,
+    }
 
 
 def register_default_handlers(queue: TaskQueue) -> None:
+    settings = get_settings()
     queue.register_handler("snapshot.create", handle_snapshot_create)
     queue.register_handler("doc.export", handle_doc_export)
+    queue.register_cleanup("doc.export", release_export)
     queue.register_handler("activity.digest", handle_activity_digest)
     queue.register_handler("email.notify", handle_email_notify)
     queue.register_handler("backup.run", handle_backup_run)
+    queue.register_handler("ops.compact", handle_ops_compact)
+    # Bursty types go through batch handlers; the single-job ones above stay for direct use
+    batching = {"max_batch": settings.queue_batch_max, "max_wait_ms": settings.queue_batch_wait_ms}
+    if settings.queue_batch_max > 1:
+        queue.register_batch_handler("snapshot.create", handle_snapshot_create_batch, **batching)
+        queue.register_batch_handler("email.notify", handle_email_notify_batch, **batching)
+
+
+def register_default_schedules(queue: TaskQueue) -> None:
+    settings = get_settings()
+    spec = settings.backup_schedule.strip()
+    if spec:
+        # A bare number is an interval in seconds, anything else a cron expression
+        timing = {"every_s": float(spec)} if spec.replace(".", "", 1).isdigit() else {"cron": spec}
+        queue.add_schedule(Schedule("backup", "backup.run", {}, jitter_s=settings.schedule_jitter_s, **timing))
@@ -3,7 +3,7 @@ from __future__ import annotations
 import asyncio
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterable, List, Tuple
 
 
 @dataclass
@@ -30,6 +30,14 @@ class NotificationLog:
             self._events.append(event)
         return event
 
+    async def record_many(self, events: Iterable[Tuple[str, str, str]]) -> List[Notification]:
+        """Record (recipient, doc_id, message) triples under one lock acquisition."""
+        now = datetime.utcnow()
+        batch = [Notification(recipient=r, doc_id=d, message=m, created_at=now) for r, d, m in events]
+        async with self._lock:
+            self._events.extend(batch)
+        return batch
+
     async def all(self) -> List[Notification]:
         async with self._lock:
             return list(self._events)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+from rt_collab.core.config import get_settings
+from rt_collab.core.metrics import LATENCY_BUCKETS_S, Histogram
+
+T = TypeVar("T")
+
+
+class CrdtExecutor:
+    """Worker threads for CPU-heavy `TextCRDT` calls (big pastes, bulk loads, full renders).
+
+    A thread rather than a process pool: the CRDT lives in this process and is
+    mutated in place, so shipping it to another process (and back) would cost
+    more than the work itself. The GIL still serializes the Python code, but
+    the interpreter switches threads every few ms, so the event loop keeps
+    serving other sockets while a large op runs instead of stalling for all
+    of it. Callers must hold the doc's lock; see `InMemoryDocStore`.
+    """
+
+    def __init__(self, workers: int | None = None) -> None:
+        self._workers = workers
+        self._pool: ThreadPoolExecutor | None = None
+        self.seconds = Histogram(LATENCY_BUCKETS_S)
+        self.stats: Dict[str, int] = {"offloaded": 0, "inline": 0}
+
+    @property
+    def workers(self) -> int:
+        return self._workers if self._workers is not None else get_settings().crdt_offload_workers
+
+    def should_offload(self, size: int, threshold: int | None = None) -> bool:
+        threshold = get_settings().crdt_offload_min_chars if threshold is None else threshold
+        offload = self.workers > 0 and size >= threshold > 0
+        self.stats["offloaded" if offload else "inline"] += 1
+        return offload
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crdt")
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self.seconds.observe(time.perf_counter() - start)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+crdt_executor = CrdtExecutor()
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterable, List, Tuple
+
+from rt_collab.core.config import get_settings
+from rt_collab.db.database import bulk_insert, get_session
+from rt_collab.db.models import Document, Operation
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> str:
+    """Time-ordered UUID (RFC 9562 v7): 48-bit unix ms, then a 12-bit counter and random bits.
+
+    Consecutive ids from this process sort in creation order, so op rows land
+    at the right edge of the primary-key index instead of at random pages.
+    """
+    global _last_ms, _counter
+    ms = time.time_ns() // 1_000_000
+    if ms <= _last_ms:
+        _counter += 1
+        if _counter > 0xFFF:  # counter exhausted within one ms: borrow the next one
+            _last_ms += 1
+            _counter = 0
+        ms = _last_ms
+    else:
+        _last_ms = ms
+        _counter = 0
+    rand = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (ms & ((1 << 48) - 1)) << 80 | 0x7 << 76 | _counter << 64 | 0b10 << 62 | rand
+    return str(uuid.UUID(int=value))
+
+
+ID_SCHEMES: Dict[str, Callable[[], str]] = {
+    "uuid4": lambda: str(uuid.uuid4()),
+    "uuid7": uuid7,
+}
+
+
+@dataclass
+class OpRecord:
+    document_id: str
+    client_id: str
+    payload: Dict[str, Any]
+    applied_to_version: int
+
+
+@dataclass
+class StoredOp:
+    id: str
+    document_id: str
+    client_id: str
+    logical_ts: int
+    payload: Dict[str, Any]
+    applied_to_version: int
+
+
+@dataclass
+class OpPage:
+    ops: List[StoredOp]
+    # Pass back as `after_ts` for the next page; None once the range is exhausted
+    next_after: int | None
+
+
+@dataclass
+class CompactResult:
+    snapshot_version: int = 0
+    deleted: int = 0
+    chunks: int = 0
+
+
+@dataclass
+class AppendResult:
+    rows: int = 0
+    # document_id -> (first, last) sequence number allocated in this call
+    sequences: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+
+class OpLog:
+    """Append-only writer for `ops` rows.
+
+    `logical_ts` is a per-document sequence allocated in memory: the first
+    append for a doc seeds it from MAX(logical_ts), later ones just count up,
+    so a batch needs no round trips beyond its INSERTs. Sequences are
+    monotonic but may have gaps if a transaction rolls back; this assumes one
+    writer process per document, as the in-memory doc store already does.
+    """
+
+    def __init__(self, id_scheme: str | None = None) -> None:
+        self._id_scheme = id_scheme
+        self._last_seq: Dict[str, int] = {}
+        self._seed_lock = asyncio.Lock()
+
+    @property
+    def new_id(self) -> Callable[[], str]:
+        return ID_SCHEMES[self._id_scheme or get_settings().op_id_scheme]
+
+    async def _seed(self, session: "AsyncSession", doc_ids: Iterable[str]) -> None:
+        missing = [d for d in doc_ids if d not in self._last_seq]
+        if not missing:
+            return
+        from sqlalchemy import func, select
+
+        async with self._seed_lock:
+            missing = [d for d in missing if d not in self._last_seq]
+            if not missing:
+                return
+            result = await session.execute(
+                select(Operation.document_id, func.max(Operation.logical_ts))
+                .where(Operation.document_id.in_(missing))
+                .group_by(Operation.document_id)
+            )
+            found = {doc_id: int(seq) for doc_id, seq in result.all()}
+            for doc_id in missing:
+                self._last_seq.setdefault(doc_id, found.get(doc_id, 0))
+
+    def allocate(self, doc_id: str, count: int) -> int:
+        """Reserve `count` sequence numbers for a seeded doc; returns the first."""
+        first = self._last_seq[doc_id] + 1
+        self._last_seq[doc_id] += count
+        return first
+
+    async def append_many(self, session: "AsyncSession", records: Iterable[OpRecord], batch_size: int | None = None) -> AppendResult:
+        """Insert op rows in executemany batches.
+
+        SQLAlchemy 2 turns each batch into multi-row `INSERT ... VALUES` statements
+        ("insertmanyvalues") from one cached compile; spelling the batch out with
+        `insert().values([...])` recompiles a huge statement per batch and
+        benchmarks several times slower (see benchmarks/bench_oplog_insert.py).
+        """
+        records = list(records)
+        result = AppendResult()
+        if not records:
+            return result
+        await self._seed(session, {r.document_id for r in records})
+
+        per_doc: Dict[str, int] = {}
+        for r in records:
+            per_doc[r.document_id] = per_doc.get(r.document_id, 0) + 1
+        next_seq = {doc_id: self.allocate(doc_id, n) for doc_id, n in per_doc.items()}
+        result.sequences = {doc_id: (first, first + per_doc[doc_id] - 1) for doc_id, first in next_seq.items()}
+
+        new_id = self.new_id
+        rows: List[Dict[str, Any]] = []
+        for r in records:
+            seq = next_seq[r.document_id]
+            next_seq[r.document_id] = seq + 1
+            rows.append(
+                {
+                    "id": new_id(),
+                    "document_id": r.document_id,
+                    "client_id": r.client_id,
+                    "logical_ts": seq,
+                    "payload_json": r.payload,
+                    "applied_to_version": r.applied_to_version,
+                }
+            )
+
+        result.rows = await bulk_insert(session, Operation.__table__, rows, batch_size)
+        return result
+
+    async def read_page(
+        self,
+        session: "AsyncSession",
+        doc_id: str,
+        after_ts: int = 0,
+        until_ts: int | None = None,
+        limit: int | None = None,
+    ) -> OpPage:
+        """Ops with `after_ts < logical_ts [<= until_ts]`, oldest first.
+
+        Keyset pagination on `ix_ops_doc_ts`: every page is an index range seek,
+        so reading page N costs the same as page 1 (no OFFSET scan).
+        """
+        from sqlalchemy import select
+
+        limit = limit or get_settings().ops_page_size
+        stmt = (
+            select(
+                Operation.id,
+                Operation.document_id,
+                Operation.client_id,
+                Operation.logical_ts,
+                Operation.payload_json,
+                Operation.applied_to_version,
+            )
+            .where(Operation.document_id == doc_id, Operation.logical_ts > after_ts)
+            .order_by(Operation.logical_ts)
+            .limit(limit)
+        )
+        if until_ts is not None:
+            stmt = stmt.where(Operation.logical_ts <= until_ts)
+        ops = [StoredOp(*row) for row in (await session.execute(stmt)).all()]
+        return OpPage(ops=ops, next_after=ops[-1].logical_ts if len(ops) == limit else None)
+
+    async def stream(
+        self, doc_id: str, after_ts: int = 0, until_ts: int | None = None, page_size: int | None = None
+    ) -> AsyncIterator[StoredOp]:
+        """Yield a doc's ops after `after_ts` page by page.
+
+        Each page runs in its own short session, so a slow consumer (a
+        reconnecting client, a history scan) never pins a connection or a
+        read transaction while it works through the range.
+        """
+        cursor: int | None = after_ts
+        while cursor is not None:
+            async with get_session() as session:
+                page = await self.read_page(session, doc_id, cursor, until_ts, page_size)
+            for op in page.ops:
+                yield op
+            cursor = page.next_after
+
+    async def compact(
+        self, doc_id: str, snapshot_version: int, snapshot_text: str, chunk_size: int | None = None
+    ) -> CompactResult:
+        """Fold ops covered by a durable snapshot into the document row and delete them.
+
+        The snapshot is stored on `documents` first, then ops applied before
+        `snapshot_version` are deleted `chunk_size` rows per transaction, oldest
+        first, yielding to the loop between chunks. The doc's newest op row is
+        always kept so `MAX(logical_ts)` still seeds sequences after a restart.
+        """
+        from sqlalchemy import delete, func, select, update
+
+        chunk_size = chunk_size or get_settings().ops_compact_chunk
+        result = CompactResult(snapshot_version=snapshot_version)
+        async with get_session() as session:
+            folded = await session.execute(
+                update(Document)
+                .where(Document.id == doc_id, Document.snapshot_version <= snapshot_version)
+                .values(snapshot_version=snapshot_version, snapshot_blob={"text": snapshot_text})
+            )
+            if not folded.rowcount:
+                # Unknown doc, or the stored snapshot is already newer: nothing of ours to fold
+                return result
+            max_ts = (
+                await session.execute(select(func.max(Operation.logical_ts)).where(Operation.document_id == doc_id))
+            ).scalar()
+        if max_ts is None:
+            return result
+
+        covered = (
+            Operation.document_id == doc_id,
+            Operation.applied_to_version < snapshot_version,
+            Operation.logical_ts < max_ts,
+        )
+        while True:
+            async with get_session() as session:
+                ids = (
+                    await session.execute(
+                        select(Operation.id).where(*covered).order_by(Operation.logical_ts).limit(chunk_size)
+                    )
+                ).scalars().all()
+                if ids:
+                    await session.execute(delete(Operation).where(Operation.id.in_(ids)))
+            if not ids:
+                break
+            result.deleted += len(ids)
+            result.chunks += 1
+            if len(ids) < chunk_size:
+                break
+            await asyncio.sleep(0)
+        return result
+
+    def forget(self, doc_id: str) -> None:
+        """Drop the cached sequence (e.g. after rows were deleted elsewhere)."""
+        self._last_seq.pop(doc_id, None)
+
+
+oplog = OpLog()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+from rt_collab.core.config import get_settings
+from rt_collab.services.docs import InMemoryDocStore, store
+from rt_collab.services.task_queue import Job, JobStatus, TaskQueue, task_queue
+
+# (job type, doc id, doc version, variant such as the export format)
+ResultKey = Tuple[str, uuid.UUID, int, str]
+
+
+@dataclass
+class CachedResult:
+    job_id: uuid.UUID
+    size: int
+
+
+class JobResultCache:
+    """Finished doc-derived jobs (exports, digests) keyed by the doc version they saw.
+
+    A request at a version that already has a result gets the finished job
+    straight back; concurrent requests for a version still being rendered all
+    get the one in-flight job; a new version misses and enqueues exactly one
+    render. Results are held LRU within a byte budget, sized by their JSON
+    encoding plus the artifact they reference. A result superseded by a newer
+    version is no longer a hit but stays fetchable by job id (and download
+    URL) until the queue's retention expires it; it is first in line for
+    eviction. An evicted result is released for good: the queue discards its
+    job, and the job type's cleanup deletes the artifact.
+    """
+
+    def __init__(
+        self,
+        queue: TaskQueue = task_queue,
+        doc_store: InMemoryDocStore = store,
+        max_bytes: int | None = None,
+    ) -> None:
+        self._queue = queue
+        self._store = doc_store
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[ResultKey, CachedResult]" = OrderedDict()
+        self._inflight: Dict[ResultKey, uuid.UUID] = {}
+        self._inflight_keys: Dict[uuid.UUID, ResultKey] = {}
+        self._latest: Dict[Tuple[str, uuid.UUID, str], int] = {}
+        self._lock = asyncio.Lock()
+        self.bytes = 0
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+        queue.add_listener(self._on_finished)
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes if self._max_bytes is not None else get_settings().result_cache_bytes
+
+    async def submit(
+        self,
+        job_type: str,
+        doc_id: uuid.UUID,
+        payload: Dict[str, Any],
+        *,
+        variant: str = "",
+        request_id: str | None = None,
+        tenant: str | None = None,
+    ) -> Job:
+        doc = self._store.peek(doc_id)
+        key = (job_type, doc_id, doc.version if doc else 0, variant)
+        async with self._lock:
+            entry = self._entries.get(key)
+            job = self._queue.get_job(entry.job_id) if entry else None
+            if job is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return job
+            if entry is not None:
+                self._drop(key)  # the queue forgot the job (reset); render again
+
+            job_id = self._inflight.get(key)
+            job = self._queue.get_job(job_id) if job_id else None
+            if job is not None and job.status in (JobStatus.queued, JobStatus.running):
+                self.stats["coalesced"] += 1
+                return job
+
+            self.stats["misses"] += 1
+            job = await self._queue.enqueue(job_type, payload, request_id=request_id, tenant=tenant)
+            self._inflight[key] = job.id
+            self._inflight_keys[job.id] = key
+            return job
+
+    def _on_finished(self, job: Job) -> None:
+        key = self._inflight_keys.pop(job.id, None)
+        if key is None:
+            return
+        self._inflight.pop(key, None)
+        if job.status != JobStatus.succeeded or not job.result:
+            return
+        # Cache under the version actually rendered; edits may have landed after the request
+        job_type, doc_id, version, variant = key
+        rendered = job.result.get("version")
+        if isinstance(rendered, int):
+            version = rendered
+        latest = self._latest.get((job_type, doc_id, variant))
+        if latest is not None and latest > version:
+            return
+        if latest is not None and latest != version:
+            # Versions only move forward, so the older result is never a hit
+            # again; clients may still be polling it, so it isn't released yet
+            superseded = (job_type, doc_id, latest, variant)
+            if superseded in self._entries:
+                self._entries.move_to_end(superseded, last=False)
+        size = len(json.dumps(job.result, default=str))
+        if isinstance(job.result.get("artifact_id"), str):
+            size += int(job.result.get("size") or 0)
+        if size > self.max_bytes:
+            return
+        key = (job_type, doc_id, version, variant)
+        replaced = self._entries.pop(key, None)
+        if replaced is not None:
+            # A second render of the same version: keep the newer job, leave the other to retention
+            self.bytes -= replaced.size
+        self._entries[key] = CachedResult(job.id, size)
+        self._latest[(job_type, doc_id, variant)] = version
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: ResultKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= entry.size
+        job_type, doc_id, version, variant = key
+        if self._latest.get((job_type, doc_id, variant)) == version:
+            del self._latest[(job_type, doc_id, variant)]
+        self._queue.discard(entry.job_id)
+
+    def reset(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+        self._inflight_keys.clear()
+        self._latest.clear()
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+
+result_cache = JobResultCache()
@@ -0,0 +1,386 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Set, Tuple
+
+from rt_collab.core.config import get_settings
+from rt_collab.core.metrics import LATENCY_BUCKETS_S, QUEUE_WAIT_BUCKETS_S, Histogram
+from rt_collab.services.crdt import Atom, AtomId, Change, TextCRDT
+
+if TYPE_CHECKING:
+    import sqlite3
+
+
+MAX_TERM_CHARS = 64
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _words(chars: Iterable[Tuple[AtomId | None, str]]) -> Iterator[Tuple[AtomId | None, str]]:
+    """Group (id, char) pairs into (id of first char, casefolded term)."""
+    start: AtomId | None = None
+    buf: List[str] = []
+    for key, ch in chars:
+        if _is_word_char(ch):
+            if not buf:
+                start = key
+            buf.append(ch)
+        elif buf:
+            if len(buf) <= MAX_TERM_CHARS:
+                yield start, "".join(buf).casefold()
+            buf = []
+    if buf and len(buf) <= MAX_TERM_CHARS:
+        yield start, "".join(buf).casefold()
+
+
+def query_terms(q: str) -> List[str]:
+    return list(dict.fromkeys(term for _, term in _words((None, ch) for ch in q)))
+
+
+@dataclass
+class DocIndex:
+    # Start atom of each indexed word -> term. None after loading from disk:
+    # the doc is fully re-tokenized on its next edit.
+    words: Dict[AtomId, str] | None = field(default_factory=dict)
+    tf: Dict[str, int] = field(default_factory=dict)
+    length: int = 0
+
+
+@dataclass
+class IndexPatch:
+    full: bool = False  # replace the doc's entry outright
+    stale: List[AtomId] = field(default_factory=list)  # word starts to drop
+    words: List[Tuple[AtomId, str]] = field(default_factory=list)  # (re)tokenized words
+    seconds: float = 0.0  # time spent preparing
+
+
+@dataclass
+class SearchHit:
+    doc_id: uuid.UUID
+    score: float
+    matches: Dict[str, int]  # query term -> occurrences in the doc
+
+
+@dataclass
+class SearchPage:
+    total: int
+    hits: List[SearchHit]
+
+
+class SearchIndex:
+    """Inverted index (term -> doc -> term frequency) over resident docs, BM25-ranked.
+
+    Updates are incremental: for each applied change only the words around
+    the atoms it inserted or tombstoned are re-tokenized. Words are keyed by
+    the atom id of their first character, so offsets shifting elsewhere in
+    the doc never touch the index. With SEARCH_INDEX_PATH set, changed
+    postings are written to that SQLite file every SEARCH_FLUSH_MS and
+    reloaded on start for the docs the doc store still has.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        self._path = path
+        self._docs: Dict[uuid.UUID, DocIndex] = {}
+        self._postings: Dict[str, Dict[uuid.UUID, int]] = {}
+        self._total_length = 0
+        self._dirty: Dict[uuid.UUID, Set[str]] = {}
+        self._dirty_since: Dict[uuid.UUID, float] = {}
+        self._conn: "sqlite3.Connection | None" = None
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.update_seconds = Histogram(LATENCY_BUCKETS_S)
+        self.lag_seconds = Histogram(QUEUE_WAIT_BUCKETS_S)
+        self.query_seconds = Histogram(LATENCY_BUCKETS_S)
+
+    @property
+    def path(self) -> str:
+        return self._path if self._path is not None else get_settings().search_index_path
+
+    @property
+    def doc_count(self) -> int:
+        return len(self._docs)
+
+    @property
+    def term_count(self) -> int:
+        return len(self._postings)
+
+    # Index maintenance
+
+    def _set_tf(self, doc_id: uuid.UUID, idx: DocIndex, term: str, delta: int) -> None:
+        count = idx.tf.get(term, 0) + delta
+        if count > 0:
+            idx.tf[term] = count
+            self._postings.setdefault(term, {})[doc_id] = count
+        else:
+            idx.tf.pop(term, None)
+            docs = self._postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self._postings[term]
+        idx.length += delta
+        self._total_length += delta
+        self._dirty.setdefault(doc_id, set()).add(term)
+        self._dirty_since.setdefault(doc_id, time.monotonic())
+
+    def index_doc(self, doc_id: uuid.UUID, crdt: TextCRDT) -> None:
+        """(Re)build a doc's entry from its full visible text."""
+        self.apply(doc_id, self.prepare(crdt, Change(), full=True))
+
+    def needs_full(self, doc_id: uuid.UUID) -> bool:
+        idx = self._docs.get(doc_id)
+        return idx is None or idx.words is None
+
+    @classmethod
+    def prepare(cls, crdt: TextCRDT, change: Change, full: bool = False) -> IndexPatch:
+        """Read what `change` did to the doc's words; only reads the CRDT, so it can run off the loop."""
+        start = time.perf_counter()
+        patch = IndexPatch(full=full)
+        if full:
+            patch.words = list(_words((a.key, a.char) for a in crdt.atoms() if not a.deleted))
+        elif change.born or change.died:
+            patch.stale = list(change.died)
+            for lo, hi in cls._windows(crdt, change):
+                window = crdt.visible_atoms(lo, hi)
+                patch.stale += [a.key for a in window]
+                patch.words += _words((a.key, a.char) for a in window)
+        patch.seconds = time.perf_counter() - start
+        return patch
+
+    def apply(self, doc_id: uuid.UUID, patch: IndexPatch) -> None:
+        """Fold a prepared patch into the index (on the loop, where queries read it)."""
+        start = time.perf_counter()
+        idx = self._docs.get(doc_id)
+        if patch.full:
+            if idx is not None:
+                for term, count in list(idx.tf.items()):
+                    self._set_tf(doc_id, idx, term, -count)
+            idx = self._docs[doc_id] = DocIndex()
+        elif idx is None or idx.words is None:
+            return  # dropped (reset) since the patch was prepared; the next edit rebuilds it
+        words = idx.words
+        for key in patch.stale:
+            term = words.pop(key, None)
+            if term is not None:
+                self._set_tf(doc_id, idx, term, -1)
+        for key, term in patch.words:
+            words[key] = term
+            self._set_tf(doc_id, idx, term, 1)
+        if patch.full or patch.stale or patch.words:
+            self.update_seconds.observe(patch.seconds + time.perf_counter() - start)
+
+    def update(self, doc_id: uuid.UUID, crdt: TextCRDT, change: Change) -> None:
+        """Re-tokenize just the words touching `change`; call right after it was applied."""
+        self.apply(doc_id, self.prepare(crdt, change, full=self.needs_full(doc_id)))
+
+    @staticmethod
+    def _windows(crdt: TextCRDT, change: Change) -> List[Tuple[int, int]]:
+        # Caret positions of every touched atom (a tombstone collapses onto its
+        # old spot), widened by a char each side, then out to word boundaries
+        carets = sorted({crdt.index_of_anchor(key) for key in (*change.born, *change.died)})
+        # Merge neighbouring carets before expanding, so a long pasted run is
+        # widened once rather than once per character
+        runs: List[Tuple[int, int]] = []
+        for caret in carets:
+            if runs and caret - 1 <= runs[-1][1]:
+                runs[-1] = (runs[-1][0], caret + 1)
+            else:
+                runs.append((caret - 1, caret + 1))
+        spans: List[Tuple[int, int]] = []
+        for lo, hi in runs:
+            lo, hi = _expand(crdt, lo, hi)
+            if spans and lo <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], max(hi, spans[-1][1]))
+            else:
+                spans.append((lo, hi))
+        return spans
+
+    def forget(self, doc_id: uuid.UUID) -> None:
+        idx = self._docs.pop(doc_id, None)
+        if idx is not None:
+            for term, count in list(idx.tf.items()):
+                self._set_tf(doc_id, idx, term, -count)
+
+    # Queries
+
+    def search(self, q: str, limit: int = 20, offset: int = 0) -> SearchPage:
+        start = time.perf_counter()
+        terms = [t for t in query_terms(q) if t in self._postings]
+        scores: Dict[uuid.UUID, float] = {}
+        matches: Dict[uuid.UUID, Dict[str, int]] = {}
+        n = len(self._docs)
+        avgdl = self._total_length / n if n else 0.0
+        for term in terms:
+            docs = self._postings[term]
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                dl = self._docs[doc_id].length
+                norm = K1 * (1 - B + B * dl / avgdl) if avgdl else K1
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+                matches.setdefault(doc_id, {})[term] = tf
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], str(item[0])))
+        hits = [SearchHit(doc_id, round(score, 6), matches[doc_id]) for doc_id, score in ranked[offset : offset + limit]]
+        self.query_seconds.observe(time.perf_counter() - start)
+        return SearchPage(total=len(ranked), hits=hits)
+
+    # Persistence
+
+    def _connect(self) -> "sqlite3.Connection":
+        import sqlite3
+
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, doc_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS ix_postings_doc ON postings (doc_id);
+                """
+            )
+        return self._conn
+
+    def _load_rows(self, keep: Set[str] | None) -> List[Tuple[str, str, int]]:
+        conn = self._connect()
+        rows = conn.execute("SELECT term, doc_id, tf FROM postings").fetchall()
+        if keep is None:
+            return rows
+        gone = {(raw_id,) for _, raw_id, _ in rows if raw_id not in keep}
+        if gone:
+            with conn:
+                conn.executemany("DELETE FROM postings WHERE doc_id = ?", gone)
+        return [row for row in rows if row[1] in keep]
+
+    async def load(self, doc_ids: Iterable[uuid.UUID] | None = None) -> int:
+        """Read the persisted postings; docs loaded this way are re-tokenized on their next edit.
+
+        With `doc_ids`, postings of any other doc are stale (the doc is gone)
+        and are deleted from the file instead.
+        """
+        if not self.path:
+            return 0
+        keep = None if doc_ids is None else {str(doc_id) for doc_id in doc_ids}
+        rows = await asyncio.to_thread(self._load_rows, keep)
+        for term, raw_id, tf in rows:
+            doc_id = uuid.UUID(raw_id)
+            idx = self._docs.setdefault(doc_id, DocIndex(words=None))
+            if idx.words is not None:
+                continue  # already indexed live since startup
+            idx.tf[term] = tf
+            idx.length += tf
+            self._total_length += tf
+            self._postings.setdefault(term, {})[doc_id] = tf
+        return len(rows)
+
+    def _write(self, rows: List[Tuple[str, str, int]]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.executemany("DELETE FROM postings WHERE term = ? AND doc_id = ?", [(t, d) for t, d, tf in rows if not tf])
+            conn.executemany(
+                "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)"
+                " ON CONFLICT (term, doc_id) DO UPDATE SET tf = excluded.tf",
+                [row for row in rows if row[2]],
+            )
+
+    async def flush(self) -> int:
+        """Write postings changed since the last flush; returns the rows written."""
+        async with self._flush_lock:
+            dirty, since = self._dirty, self._dirty_since
+            self._dirty, self._dirty_since = {}, {}
+            if not self.path:
+                return 0
+            rows = []
+            for doc_id, terms in dirty.items():
+                tf = self._docs[doc_id].tf if doc_id in self._docs else {}
+                rows += [(term, str(doc_id), tf.get(term, 0)) for term in terms]
+            if rows:
+                await asyncio.to_thread(self._write, rows)
+            now = time.monotonic()
+            for first in since.values():
+                self.lag_seconds.observe(now - first)
+            return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(max(0.01, get_settings().search_flush_ms / 1000))
+            try:
+                await self.flush()
+            except Exception:
+                # Keep serving queries from memory; the next flush retries the file
+                pass
+
+    async def start(self, doc_ids: Iterable[uuid.UUID] = ()) -> None:
+        """Reload the postings of `doc_ids` (the docs that survived a restart) and start flushing."""
+        if self._task and not self._task.done():
+            return
+        await self.load(doc_ids)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def reset(self) -> None:
+        self._docs = {}
+        self._postings = {}
+        self._total_length = 0
+        self._dirty = {}
+        self._dirty_since = {}
+        if self.path:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM postings")
+
+
+def _expand(crdt: TextCRDT, lo: int, hi: int) -> Tuple[int, int]:
+    """Widen text indices [lo, hi) until neither edge is inside a word."""
+    step = 32
+    lo, hi = max(0, lo), max(lo, hi)
+    while lo > 0:
+        chunk = crdt.visible_atoms(lo - step, lo)
+        n = _leading_word_run(reversed(chunk))
+        lo -= n
+        if n < len(chunk):
+            break
+    while True:
+        chunk = crdt.visible_atoms(hi, hi + step)
+        n = _leading_word_run(chunk)
+        hi += n
+        if n < step:
+            break
+    return lo, hi
+
+
+def _leading_word_run(atoms: Iterable[Atom]) -> int:
+    n = 0
+    for atom in atoms:
+        if not _is_word_char(atom.char):
+            break
+        n += 1
+    return n
+
+
+search_index = SearchIndex()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Tuple
+
+from rt_collab.core.config import get_settings
+from rt_collab.services.docs import InMemoryDocStore, store
+from rt_collab.ws.codec import packb
+from rt_collab.ws.compression import PRECOMPRESSED_MARKER, deflate_raw
+
+
+# How the doc text is pre-encoded for splicing into outgoing payloads:
+#   json     - the JSON string literal (REST body and JSON snapshot frames)
+#   msgpack  - the MessagePack str (binary snapshot frames)
+#   deflate  - a complete 0xC1-marked raw-deflate frame of the UTF-8 text
+ENCODERS: Dict[str, Callable[[str], bytes]] = {
+    "json": lambda text: json.dumps(text).encode("utf-8"),
+    "msgpack": packb,
+    "deflate": lambda text: PRECOMPRESSED_MARKER + deflate_raw(text.encode("utf-8")),
+}
+
+CacheKey = Tuple[uuid.UUID, int, str]
+
+
+@dataclass
+class SnapshotEntry:
+    version: int
+    payload: bytes
+    etag: str
+
+
+class SnapshotFrameCache:
+    """Encoded doc snapshots keyed by (doc_id, version, encoding).
+
+    Shared by WebSocket joins and REST reads, so a join storm on a hot doc
+    renders and encodes the text once per version. Concurrent misses for the
+    same key wait on one in-flight encode; entries are evicted LRU once the
+    byte budget is exceeded, and older versions of a doc are dropped as soon
+    as a newer one is cached.
+    """
+
+    # Encode texts at least this long off the event loop
+    offload_min_chars = 64 * 1024
+
+    def __init__(self, doc_store: InMemoryDocStore = store, max_bytes: int | None = None) -> None:
+        self._store = doc_store
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, SnapshotEntry]" = OrderedDict()
+        self._latest: Dict[Tuple[uuid.UUID, str], int] = {}
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self.bytes = 0
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes if self._max_bytes is not None else get_settings().snapshot_cache_bytes
+
+    async def get(self, doc_id: uuid.UUID, encoding: str) -> SnapshotEntry:
+        encode = ENCODERS[encoding]
+        doc = await self._store.get_or_create(doc_id)
+        key = (doc_id, doc.version, encoding)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        self.stats["misses"] += 1
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            # The store renders under the doc's lock (off the loop for big docs); encode possibly off it too
+            text, version = await self._store.snapshot_text(doc_id)
+            if len(text) >= self.offload_min_chars:
+                payload = await asyncio.to_thread(encode, text)
+            else:
+                payload = encode(text)
+            entry = SnapshotEntry(version, payload, f'"{version}-{zlib.crc32(payload):08x}"')
+            # An edit may have landed while waiting for the doc's lock: file it under what was rendered
+            self._put((doc_id, version, encoding), entry)
+            future.set_result(entry)
+            return entry
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # waiters re-raise it; don't warn if there were none
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _put(self, key: CacheKey, entry: SnapshotEntry) -> None:
+        doc_id, version, encoding = key
+        latest = self._latest.get((doc_id, encoding))
+        if latest is not None and latest > version:
+            return  # a newer version landed while we were encoding
+        if latest is not None and latest != version:
+            self._drop((doc_id, latest, encoding))
+        if len(entry.payload) > self.max_bytes:
+            return
+        self._latest[(doc_id, encoding)] = version
+        self._entries[key] = entry
+        self.bytes += len(entry.payload)
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= len(entry.payload)
+        doc_id, version, encoding = key
+        if self._latest.get((doc_id, encoding)) == version:
+            del self._latest[(doc_id, encoding)]
+
+    def reset(self) -> None:
+        self._entries.clear()
+        self._latest.clear()
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+
+snapshot_cache = SnapshotFrameCache()
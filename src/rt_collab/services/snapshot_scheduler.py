@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List
+
+from rt_collab.core.config import get_settings
+from rt_collab.services.task_queue import Job, JobStatus, TaskQueue, task_queue
+
+
+@dataclass
+class DocActivity:
+    ops: int = 0  # edits since the last snapshot was scheduled
+    bytes: int = 0  # approximate characters inserted/deleted over those edits
+    first_edit: float = 0.0  # monotonic time the doc became dirty
+    last_edit: float = 0.0
+    pending: uuid.UUID | None = None  # the one snapshot.create job in flight, if any
+    taken_ops: int = 0  # counters handed to the pending job, restored if it fails
+    taken_bytes: int = 0
+    absorbed: bool = False  # a later trigger was folded into the pending job
+
+
+class SnapshotScheduler:
+    """Decides per document when a `snapshot.create` job is worth running.
+
+    A dirty doc is snapshotted once any of these holds:
+      - `SNAPSHOT_INTERVAL` edits since the last snapshot (counted, not
+        `version % N`, so bursty batches can't skip the boundary)
+      - `SNAPSHOT_BYTES` characters changed
+      - no edits for `SNAPSHOT_IDLE_S` (captures the tail of a session)
+      - dirty for `SNAPSHOT_MAX_DELAY_S` even if edits never pause
+      - un-snapshotted changes across all docs exceed `SNAPSHOT_PRESSURE_BYTES`
+        (dirtiest docs first, until back under budget)
+
+    At most one job per doc is outstanding; triggers while it's pending are
+    absorbed. The handler reads the doc when it runs, so the job captures the
+    latest version rather than the one that tripped the trigger.
+    """
+
+    tick_s = 0.5
+
+    def __init__(self, queue: TaskQueue = task_queue) -> None:
+        self._queue = queue
+        self._docs: Dict[uuid.UUID, DocActivity] = {}
+        self._jobs: Dict[uuid.UUID, uuid.UUID] = {}  # pending job id -> doc id
+        self._dirty_bytes = 0
+        self._task: asyncio.Task | None = None
+        self.stats: Dict[str, int] = {"scheduled": 0, "coalesced": 0}
+        queue.add_listener(self._on_finished)
+
+    @property
+    def dirty_bytes(self) -> int:
+        return self._dirty_bytes
+
+    async def note_edit(self, doc_id: uuid.UUID, size: int = 1) -> None:
+        settings = get_settings()
+        if settings.snapshot_interval <= 0:
+            return
+        now = time.monotonic()
+        act = self._docs.setdefault(doc_id, DocActivity())
+        if not act.ops:
+            act.first_edit = now
+        act.ops += 1
+        act.bytes += size
+        act.last_edit = now
+        self._dirty_bytes += size
+        if act.ops >= settings.snapshot_interval or act.bytes >= settings.snapshot_bytes:
+            await self._schedule(doc_id, act)
+        if self._dirty_bytes >= settings.snapshot_pressure_bytes:
+            await self._relieve_pressure()
+
+    def due(self, now: float | None = None) -> List[uuid.UUID]:
+        """Dirty docs whose idle or max-delay timer has run out."""
+        settings = get_settings()
+        now = time.monotonic() if now is None else now
+        return [
+            doc_id
+            for doc_id, act in self._docs.items()
+            if act.ops
+            and (now - act.last_edit >= settings.snapshot_idle_s or now - act.first_edit >= settings.snapshot_max_delay_s)
+        ]
+
+    async def tick(self, now: float | None = None) -> None:
+        for doc_id in self.due(now):
+            await self._schedule(doc_id, self._docs[doc_id])
+
+    async def _relieve_pressure(self) -> None:
+        budget = get_settings().snapshot_pressure_bytes
+        for doc_id, act in sorted(self._docs.items(), key=lambda item: item[1].bytes, reverse=True):
+            if self._dirty_bytes < budget or not act.bytes:
+                break
+            await self._schedule(doc_id, act)
+
+    def _is_pending(self, act: DocActivity) -> bool:
+        if act.pending is None:
+            return False
+        job = self._queue.get_job(act.pending)
+        if job is None:  # the queue was reset under us
+            self._jobs.pop(act.pending, None)
+            act.pending = None
+            return False
+        return True
+
+    async def _schedule(self, doc_id: uuid.UUID, act: DocActivity) -> None:
+        if self._is_pending(act):
+            if not act.absorbed:
+                act.absorbed = True
+                self.stats["coalesced"] += 1
+            return
+        act.taken_ops, act.taken_bytes = act.ops, act.bytes
+        self._dirty_bytes -= act.bytes
+        act.ops = act.bytes = 0
+        job = await self._queue.enqueue("snapshot.create", {"doc_id": str(doc_id)})
+        act.pending = job.id
+        self._jobs[job.id] = doc_id
+        self.stats["scheduled"] += 1
+
+    def _on_finished(self, job: Job) -> None:
+        doc_id = self._jobs.pop(job.id, None)
+        act = self._docs.get(doc_id) if doc_id else None
+        if act is None or act.pending != job.id:
+            return
+        act.pending = None
+        act.absorbed = False
+        if job.status != JobStatus.succeeded:
+            # Put the work back so the next trigger (or the idle timer) retries it
+            if not act.ops:
+                act.first_edit = act.last_edit = time.monotonic()
+            act.ops += act.taken_ops
+            act.bytes += act.taken_bytes
+            self._dirty_bytes += act.taken_bytes
+        act.taken_ops = act.taken_bytes = 0
+        if not act.ops:
+            del self._docs[doc_id]
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_s)
+            try:
+                await self.tick()
+            except Exception:  # pragma: no cover - keep the scheduler alive
+                pass
+
+    async def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def reset(self) -> None:
+        self._docs = {}
+        self._jobs = {}
+        self._dirty_bytes = 0
+        self.stats = {"scheduled": 0, "coalesced": 0}
+
+
+snapshot_scheduler = SnapshotScheduler()
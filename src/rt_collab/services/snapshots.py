@@ -2,9 +2,11 @@ from __future__ import annotations
 
 import asyncio
 import uuid
+from bisect import bisect_right, insort
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Optional
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
 @dataclass
@@ -15,7 +17,12 @@ class Snapshot:
     created_at: datetime
 
 
+_version = attrgetter("version")
+
+
 class InMemorySnapshotStore:
+    """Snapshots per doc, kept sorted by version so point-in-time lookups bisect."""
+
     def __init__(self) -> None:
         self._snapshots: Dict[uuid.UUID, List[Snapshot]] = {}
         self._lock = asyncio.Lock()
@@ -23,9 +30,17 @@ class InMemorySnapshotStore:
     async def record(self, doc_id: uuid.UUID, version: int, text: str) -> Snapshot:
         snap = Snapshot(doc_id=doc_id, version=version, text=text, created_at=datetime.utcnow())
         async with self._lock:
-            self._snapshots.setdefault(doc_id, []).append(snap)
+            insort(self._snapshots.setdefault(doc_id, []), snap, key=_version)
         return snap
 
+    async def record_many(self, items: Iterable[Tuple[uuid.UUID, int, str]]) -> List[Snapshot]:
+        now = datetime.utcnow()
+        batch = [Snapshot(doc_id=d, version=v, text=t, created_at=now) for d, v, t in items]
+        async with self._lock:
+            for snap in batch:
+                insort(self._snapshots.setdefault(snap.doc_id, []), snap, key=_version)
+        return batch
+
     async def latest(self, doc_id: uuid.UUID) -> Optional[Snapshot]:
         async with self._lock:
             snaps = self._snapshots.get(doc_id, [])
@@ -33,6 +48,13 @@ class InMemorySnapshotStore:
                 return None
             return snaps[-1]
 
+    async def at_or_before(self, doc_id: uuid.UUID, version: int) -> Optional[Snapshot]:
+        """Newest snapshot with `snapshot.version <= version`."""
+        async with self._lock:
+            snaps = self._snapshots.get(doc_id, [])
+            i = bisect_right(snaps, version, key=_version)
+            return snaps[i - 1] if i else None
+
     async def all_for_doc(self, doc_id: uuid.UUID) -> List[Snapshot]:
         async with self._lock:
             return list(self._snapshots.get(doc_id, []))
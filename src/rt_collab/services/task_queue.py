@@ -1,15 +1,19 @@
 from __future__ import annotations
 
 import asyncio
+import contextvars
 import heapq
+import itertools
 import random
 import time
 import uuid
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from typing import Any, Awaitable, Callable, Dict, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 
-from rt_collab.core.metrics import QueueMetrics
+from rt_collab.core.config import get_settings
+from rt_collab.core.metrics import QueueMetrics, TenantQueueMetrics
+from rt_collab.services.cron import CronExpr
 
 
 class RetryableError(Exception):
@@ -25,6 +29,13 @@ class JobStatus(str):
 
 
 Handler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any] | None]]
+# Gets the payloads of several same-type jobs; returns one outcome per payload,
+# in order: a result dict (or None), or an exception instance for that job alone
+BatchHandler = Callable[[List[Dict[str, Any]]], Awaitable[Sequence[Dict[str, Any] | BaseException | None]]]
+# Called synchronously with a job once it succeeds, fails or goes dead
+Listener = Callable[["Job"], None]
+# Called synchronously with a finished job as it's forgotten, to release what its result references
+Cleanup = Callable[["Job"], None]
 
 
 @dataclass
@@ -33,6 +44,7 @@ class Job:
     type: str
     payload: Dict[str, Any]
     request_id: str | None = None
+    tenant: str = "default"
     status: str = JobStatus.queued
     attempts: int = 0
     max_attempts: int = 3
@@ -42,6 +54,7 @@ class Job:
     updated_at: datetime = field(default_factory=datetime.utcnow)
     result: Dict[str, Any] | None = None
     error: str | None = None
+    progress: Dict[str, Any] | None = None
 
     def mark_running(self) -> None:
         self.status = JobStatus.running
@@ -63,21 +76,231 @@ class Job:
         self.updated_at = datetime.utcnow()
 
 
-class TaskQueue:
+def _utc_ts(at: datetime) -> float:
+    """Epoch seconds of a naive UTC datetime (naive `.timestamp()` would read it as local time)."""
+    return at.replace(tzinfo=timezone.utc).timestamp()
+
+
+# The job whose handler is running in the current task, for `report_progress`
+current_job: contextvars.ContextVar[Job | None] = contextvars.ContextVar("current_job", default=None)
+
+
+def report_progress(**fields: Any) -> None:
+    """Merge `fields` into the running job's `progress` (no-op outside a job)."""
+    job = current_job.get()
+    if job is not None:
+        job.progress = {**(job.progress or {}), **fields}
+        job.updated_at = datetime.utcnow()
+
+
+@dataclass
+class BatchSpec:
+    handler: BatchHandler
+    max_batch: int
+    max_wait_ms: float
+
+
+@dataclass
+class Schedule:
+    """A recurring job: every `every_s` seconds (aligned to the epoch) or on a cron expression."""
+
+    name: str
+    job_type: str
+    payload: Dict[str, Any]
+    every_s: float | None = None
+    cron: str | None = None
+    jitter_s: float = 0.0
+    tenant: str | None = None
+    paused: bool = False
+    slot: datetime | None = None  # the occurrence due next
+    next_run_at: datetime | None = None  # slot plus this occurrence's jitter
+    last_run_at: datetime | None = None
+    last_job_id: uuid.UUID | None = None
+    runs: int = 0
+    skipped: int = 0  # previous run still going, or another process took the slot
+
+    def __post_init__(self) -> None:
+        if (self.every_s is None) == (self.cron is None):
+            raise ValueError("schedule needs exactly one of every_s or cron")
+        if self.every_s is not None and self.every_s <= 0:
+            raise ValueError("every_s must be positive")
+        self._cron = CronExpr(self.cron) if self.cron else None
+
+    def next_slot(self, after: datetime) -> datetime:
+        if self._cron is not None:
+            return self._cron.next_after(after)
+        # Epoch-aligned, so every process computes the same slots for the lock key
+        ts = _utc_ts(after)
+        slot = datetime.fromtimestamp((ts // self.every_s + 1) * self.every_s, timezone.utc)
+        return slot.replace(tzinfo=None)
+
+    def plan(self, after: datetime) -> None:
+        self.slot = self.next_slot(after)
+        self.next_run_at = self.slot + timedelta(seconds=random.uniform(0, self.jitter_s))
+
+
+class LocalScheduleLock:
+    """In-process slot claims; enough for a single node."""
+
     def __init__(self) -> None:
+        self._held: Dict[str, Tuple[float, str]] = {}  # key -> (expiry, holder token)
+
+    async def acquire(self, key: str, ttl_s: float, token: str = "1") -> bool:
+        now = time.monotonic()
+        self._held = {k: held for k, held in self._held.items() if held[0] > now}
+        if key in self._held:
+            return False
+        self._held[key] = (now + ttl_s, token)
+        return True
+
+    async def release(self, key: str, token: str) -> None:
+        held = self._held.get(key)
+        if held is not None and held[1] == token:
+            del self._held[key]
+
+
+# Delete the key only while it still holds our token: after a TTL expiry it may be someone else's
+_RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+class RedisScheduleLock:
+    """`SET NX PX` on the shared Redis, so exactly one process runs each schedule slot."""
+
+    async def acquire(self, key: str, ttl_s: float, token: str = "1") -> bool:
+        from rt_collab.core.redis import get_redis
+
+        return bool(await get_redis().set(f"rtc:schedule:{key}", token, nx=True, px=max(1, int(ttl_s * 1000))))
+
+    async def release(self, key: str, token: str) -> None:
+        from rt_collab.core.redis import get_redis
+
+        await get_redis().eval(_RELEASE_SCRIPT, 1, f"rtc:schedule:{key}", token)
+
+
+@dataclass
+class TenantState:
+    weight: float = 1.0
+    max_concurrent: int = 0  # handler calls in flight; 0 = no cap
+    # job type -> heap of (run at, seq, job id), so a batch pops only its own type
+    pending: Dict[str, list[tuple[float, int, uuid.UUID]]] = field(default_factory=dict)
+    running: int = 0
+    vtime: float = 0.0  # weighted service time received; lowest goes next
+    pinned: bool = False  # overridden via set_tenant: kept even while idle
+    idle_since: float | None = None  # monotonic time the tenant last ran dry
+
+    def depth(self) -> int:
+        return sum(len(heap) for heap in self.pending.values())
+
+    def head(self) -> tuple[float, int, str] | None:
+        """(run at, seq, job type) of the tenant's earliest queued job across types."""
+        return min(((heap[0][0], heap[0][1], job_type) for job_type, heap in self.pending.items()), default=None)
+
+    def pop(self, job_type: str) -> tuple[float, int, uuid.UUID]:
+        heap = self.pending[job_type]
+        entry = heapq.heappop(heap)
+        if not heap:
+            del self.pending[job_type]
+        return entry
+
+
+def parse_tenant_weights(spec: str) -> Dict[str, float]:
+    """`"acme=3,globex=0.5"` -> {"acme": 3.0, "globex": 0.5}."""
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() and weight.strip():
+            weights[name.strip()] = max(0.01, float(weight))
+    return weights
+
+
+def _schedule_lock() -> LocalScheduleLock | RedisScheduleLock:
+    return RedisScheduleLock() if get_settings().schedule_lock_backend == "redis" else LocalScheduleLock()
+
+
+class TaskQueue:
+    def __init__(self, schedule_lock: LocalScheduleLock | RedisScheduleLock | None = None) -> None:
         self._handlers: Dict[str, Handler] = {}
+        self._batch_handlers: Dict[str, BatchSpec] = {}
+        self._cleanups: Dict[str, Cleanup] = {}
+        self._listeners: list[Listener] = []
         self._jobs: Dict[uuid.UUID, Job] = {}
         self._idempotency: Dict[str, uuid.UUID] = {}
-        self._pending: list[tuple[float, uuid.UUID]] = []
+        self._tenants: Dict[str, TenantState] = {}
+        self._seq = itertools.count()
         self._wake = asyncio.Event()
-        self._worker: asyncio.Task | None = None
+        self._workers: list[asyncio.Task] = []
         self._lock = asyncio.Lock()
         self._stopped = False
+        self._schedules: Dict[str, Schedule] = {}
+        self._schedule_lock = schedule_lock
+        self._run_locks: Dict[uuid.UUID, Tuple[str, str]] = {}  # scheduled job -> (lock key, token)
+        self._expire_at = 0.0
         self.metrics = QueueMetrics()
+        self.tenant_metrics = TenantQueueMetrics()
 
     def register_handler(self, job_type: str, handler: Handler) -> None:
         self._handlers[job_type] = handler
 
+    def register_batch_handler(
+        self, job_type: str, handler: BatchHandler, *, max_batch: int = 100, max_wait_ms: float = 0.0
+    ) -> None:
+        """Run ready `job_type` jobs up to `max_batch` at a time through one handler call.
+
+        Once the first job is ready the worker lingers up to `max_wait_ms` for
+        more to arrive before dispatching. Takes precedence over a plain
+        handler registered for the same type.
+        """
+        self._batch_handlers[job_type] = BatchSpec(handler, max(1, max_batch), max_wait_ms)
+
+    def register_cleanup(self, job_type: str, cleanup: Cleanup) -> None:
+        """Run `cleanup(job)` when a finished `job_type` job is discarded or expires."""
+        self._cleanups[job_type] = cleanup
+
+    def set_tenant(self, tenant: str, *, weight: float | None = None, max_concurrent: int | None = None) -> TenantState:
+        """Override a tenant's share (relative to weight 1.0) and concurrent-job cap."""
+        state = self._tenant(tenant)
+        state.pinned = True
+        if weight is not None:
+            state.weight = max(0.01, weight)
+        if max_concurrent is not None:
+            state.max_concurrent = max(0, max_concurrent)
+        return state
+
+    def _tenant(self, tenant: str) -> TenantState:
+        state = self._tenants.get(tenant)
+        if state is None:
+            settings = get_settings()
+            state = TenantState(
+                weight=parse_tenant_weights(settings.queue_tenant_weights).get(tenant, 1.0),
+                max_concurrent=settings.queue_tenant_max_concurrent,
+            )
+            self._tenants[tenant] = state
+        return state
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {tenant: state.depth() for tenant, state in self._tenants.items()}
+
+    def running_counts(self) -> Dict[str, int]:
+        return {tenant: state.running for tenant, state in self._tenants.items()}
+
+    def _push(self, job: Job) -> None:
+        state = self._tenant(job.tenant)
+        if not state.pending and not state.running:
+            # A tenant coming back from idle starts level with the busiest ones;
+            # it doesn't get to spend credit banked while it had nothing queued
+            active = [t.vtime for t in self._tenants.values() if t.pending or t.running]
+            if active:
+                state.vtime = max(state.vtime, min(active))
+        state.idle_since = None
+        heapq.heappush(state.pending.setdefault(job.type, []), (_utc_ts(job.next_run_at), next(self._seq), job.id))
+
+    def add_listener(self, listener: Listener) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, job: Job) -> None:
+        for listener in self._listeners:
+            listener(job)
+
     async def enqueue(
         self,
         job_type: str,
@@ -86,6 +309,7 @@ class TaskQueue:
         idempotency_key: str | None = None,
         max_attempts: int = 3,
         request_id: str | None = None,
+        tenant: str | None = None,
     ) -> Job:
         async with self._lock:
             if idempotency_key and idempotency_key in self._idempotency:
@@ -99,34 +323,107 @@ class TaskQueue:
                 max_attempts=max_attempts,
                 idempotency_key=idempotency_key,
                 request_id=request_id,
+                tenant=tenant or "default",
             )
             self._jobs[job_id] = job
             if idempotency_key:
                 self._idempotency[idempotency_key] = job_id
-            heapq.heappush(self._pending, (job.next_run_at.timestamp(), job.id))
+            self._push(job)
             self.metrics.record_status(JobStatus.queued)
             self._wake.set()
             return job
 
-    async def start(self) -> None:
-        if self._worker and not self._worker.done():
+    def add_schedule(self, schedule: Schedule) -> Schedule:
+        """Add or replace a recurring job (by name); its first slot is the next one from now."""
+        schedule.plan(datetime.utcnow())
+        self._schedules[schedule.name] = schedule
+        self._wake.set()
+        return schedule
+
+    def remove_schedule(self, name: str) -> bool:
+        return self._schedules.pop(name, None) is not None
+
+    def get_schedule(self, name: str) -> Optional[Schedule]:
+        return self._schedules.get(name)
+
+    def schedules(self) -> List[Schedule]:
+        return list(self._schedules.values())
+
+    def pause_schedule(self, name: str, paused: bool = True) -> Optional[Schedule]:
+        schedule = self._schedules.get(name)
+        if schedule is not None and schedule.paused != paused:
+            schedule.paused = paused
+            if not paused:
+                schedule.plan(datetime.utcnow())  # no catch-up for slots missed while paused
+        return schedule
+
+    async def fire_schedules(self, now: datetime | None = None) -> List[Job]:
+        """Enqueue one job for each schedule whose slot is due; returns the jobs enqueued."""
+        now = now or datetime.utcnow()
+        fired: List[Job] = []
+        for schedule in list(self._schedules.values()):
+            if schedule.paused or schedule.next_run_at is None or schedule.next_run_at > now:
+                continue
+            slot = schedule.slot
+            # Missed slots (process asleep, long job) are skipped, not backfilled
+            schedule.plan(now)
+            previous = self._jobs.get(schedule.last_job_id) if schedule.last_job_id else None
+            if previous is not None and previous.status in (JobStatus.queued, JobStatus.running):
+                schedule.skipped += 1
+                continue
+            if self._schedule_lock is None:
+                self._schedule_lock = _schedule_lock()
+            # Held until the following slot, so a slower node can't take the same one late
+            ttl_s = max(1.0, (schedule.slot - slot).total_seconds())
+            if not await self._schedule_lock.acquire(f"{schedule.name}:{_utc_ts(slot):.0f}", ttl_s):
+                schedule.skipped += 1
+                continue
+            # Held until the run finishes, so no node starts the next one while it's still going
+            run_key, token = f"{schedule.name}:running", uuid.uuid4().hex
+            if not await self._schedule_lock.acquire(run_key, get_settings().schedule_run_lock_s, token):
+                schedule.skipped += 1
+                continue
+            job = await self.enqueue(schedule.job_type, dict(schedule.payload), tenant=schedule.tenant)
+            self._run_locks[job.id] = (run_key, token)
+            schedule.last_job_id = job.id
+            schedule.last_run_at = now
+            schedule.runs += 1
+            fired.append(job)
+        return fired
+
+    async def start(self, workers: int | None = None) -> None:
+        if any(not w.done() for w in self._workers):
             return
         self._stopped = False
-        self._worker = asyncio.create_task(self._run())
+        # Bind the wake event to the loop the workers run on (app restarts, test clients)
+        self._wake = asyncio.Event()
+        count = max(1, workers or get_settings().queue_workers)
+        self._workers = [asyncio.create_task(self._run()) for _ in range(count)]
 
     async def stop(self) -> None:
         self._stopped = True
-        if self._worker:
-            self._worker.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
             try:
-                await self._worker
+                await worker
             except asyncio.CancelledError:
                 pass
- 
+        self._workers = []
+
     async def _run(self) -> None:
         while not self._stopped:
-            job_id = await self._next_ready_job()
-            if job_id is None:
+            if time.monotonic() >= self._expire_at:
+                self._expire_at = time.monotonic() + 1.0
+                self.expire_jobs()
+                self.evict_idle_tenants()
+            if self._schedules:
+                try:
+                    await self.fire_schedules()
+                except Exception:  # pragma: no cover - e.g. Redis down; keep draining jobs
+                    pass
+            job = await self._dispatch()
+            if job is None:
                 # Sleep briefly to avoid busy loop if no jobs exist
                 try:
                     await asyncio.wait_for(self._wake.wait(), timeout=0.25)
@@ -134,18 +431,108 @@ class TaskQueue:
                     pass
                 self._wake.clear()
                 continue
-            await self._execute(job_id)
+            spec = self._batch_handlers.get(job.type)
+            start = time.perf_counter()
+            count = 1
+            try:
+                if spec is not None:
+                    count = await self._execute_batch(job, spec)
+                else:
+                    await self._execute(job.id)
+            finally:
+                self._release(job.tenant, time.perf_counter() - start, count)
 
-    async def _next_ready_job(self) -> uuid.UUID | None:
+    async def _dispatch(self) -> Job | None:
+        """Weighted fair pick: the tenant with a ready job, room under its cap and the least service so far."""
         async with self._lock:
-            if not self._pending:
-                return None
-            ts, job_id = self._pending[0]
-            now_ts = datetime.utcnow().timestamp()
-            if ts > now_ts:
+            now_ts = _utc_ts(datetime.utcnow())
+            best: tuple[float, float, str] | None = None
+            for tenant, state in self._tenants.items():
+                head = state.head()
+                if head is None or head[0] > now_ts:
+                    continue
+                if state.max_concurrent and state.running >= state.max_concurrent:
+                    continue
+                candidate = (state.vtime, head[0], tenant)
+                if best is None or candidate < best:
+                    best = candidate
+            if best is None:
                 return None
-            heapq.heappop(self._pending)
-            return job_id
+            state = self._tenants[best[2]]
+            while state.pending:
+                _, _, job_id = state.pop(state.head()[2])
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    state.running += 1
+                    self.tenant_metrics.record_wait(job.tenant, max(0.0, now_ts - _utc_ts(job.next_run_at)))
+                    return job
+            return None
+
+    def evict_idle_tenants(self, now: float | None = None) -> List[str]:
+        """Drop the state and metric series of tenants idle for QUEUE_TENANT_IDLE_S."""
+        idle_s = get_settings().queue_tenant_idle_s
+        now = time.monotonic() if now is None else now
+        evicted = [
+            tenant
+            for tenant, state in self._tenants.items()
+            if not state.pinned and state.idle_since is not None and now - state.idle_since >= idle_s
+        ]
+        for tenant in evicted:
+            del self._tenants[tenant]
+            self.tenant_metrics.forget(tenant)
+        return evicted
+
+    def _release(self, tenant: str, busy_s: float, jobs: int) -> None:
+        state = self._tenant(tenant)
+        state.running = max(0, state.running - 1)
+        state.vtime += busy_s / state.weight
+        if not state.pending and not state.running:
+            state.idle_since = time.monotonic()
+        self.tenant_metrics.record_done(tenant, jobs, busy_s)
+        self._wake.set()  # a capped tenant may have room again
+
+    async def _take_ready(self, tenant: str, job_type: str, limit: int) -> List[Job]:
+        """Pop up to `limit` ready jobs of `job_type` for `tenant`, leaving other types queued."""
+        taken: List[Job] = []
+        state = self._tenant(tenant)
+        async with self._lock:
+            now_ts = _utc_ts(datetime.utcnow())
+            heap = state.pending.get(job_type)
+            # pop() drops the heap from `pending` once it empties; `heap` is then []
+            while heap and len(taken) < limit and heap[0][0] <= now_ts:
+                _, _, job_id = state.pop(job_type)
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    taken.append(job)
+                    self.tenant_metrics.record_wait(tenant, max(0.0, now_ts - _utc_ts(job.next_run_at)))
+        return taken
+
+    async def _execute_batch(self, first: Job, spec: BatchSpec) -> int:
+        # A batch is one handler call, so it holds one of the tenant's concurrency slots
+        batch = [first]
+        batch += await self._take_ready(first.tenant, first.type, spec.max_batch - 1)
+        if len(batch) < spec.max_batch and spec.max_wait_ms > 0:
+            await asyncio.sleep(spec.max_wait_ms / 1000)
+            batch += await self._take_ready(first.tenant, first.type, spec.max_batch - len(batch))
+        for job in batch:
+            job.mark_running()
+            self.metrics.record_status(JobStatus.running)
+        self.metrics.record_batch(len(batch))
+        start_ms = time.perf_counter() * 1000
+        try:
+            outcomes = list(await spec.handler([job.payload for job in batch]))
+            if len(outcomes) != len(batch):
+                raise RuntimeError(f"batch_handler_returned_{len(outcomes)}_of_{len(batch)}")
+        except Exception as exc:
+            outcomes = [exc] * len(batch)
+        elapsed_ms = time.perf_counter() * 1000 - start_ms
+        for job, outcome in zip(batch, outcomes):
+            if isinstance(outcome, BaseException):
+                await self._fail(job, outcome)
+            else:
+                self._succeed(job, outcome, elapsed_ms)
+            await self._unlock_run(job)
+        return len(batch)
 
     async def _execute(self, job_id: uuid.UUID) -> None:
         job = self._jobs.get(job_id)
@@ -154,32 +541,59 @@ class TaskQueue:
         handler = self._handlers.get(job.type)
         if not handler:
             job.mark_dead("no_handler")
+            self._notify(job)
+            await self._unlock_run(job)
             return
         job.mark_running()
         self.metrics.record_status(JobStatus.running)
         start_ms = time.perf_counter() * 1000
+        token = current_job.set(job)
         try:
             result = await handler(job.payload)
-            job.mark_complete(result)
-            self.metrics.record_status(JobStatus.succeeded)
-            self.metrics.record_latency(time.perf_counter() * 1000 - start_ms)
-        except RetryableError as exc:
-            job.attempts += 1
-            if job.attempts >= job.max_attempts:
-                job.mark_dead(str(exc))
-                self.metrics.record_status(JobStatus.dead)
-                return
-            delay = self._backoff(job.attempts)
-            job.status = JobStatus.queued
-            job.next_run_at = datetime.utcnow() + timedelta(seconds=delay)
-            job.updated_at = datetime.utcnow()
-            self.metrics.record_retry()
-            async with self._lock:
-                heapq.heappush(self._pending, (job.next_run_at.timestamp(), job.id))
-                self._wake.set()
-        except Exception as exc:  # pragma: no cover - debug aid
+        except Exception as exc:
+            await self._fail(job, exc)
+        else:
+            self._succeed(job, result, time.perf_counter() * 1000 - start_ms)
+        finally:
+            current_job.reset(token)
+        await self._unlock_run(job)
+
+    async def _unlock_run(self, job: Job) -> None:
+        if job.status == JobStatus.queued:
+            return  # going round again after a retryable error: the run isn't over
+        held = self._run_locks.pop(job.id, None)
+        if held is not None and self._schedule_lock is not None:
+            try:
+                await self._schedule_lock.release(*held)
+            except Exception:  # pragma: no cover - e.g. Redis down; the lock's TTL frees it
+                pass
+
+    def _succeed(self, job: Job, result: Dict[str, Any] | None, latency_ms: float) -> None:
+        job.mark_complete(result)
+        self.metrics.record_status(JobStatus.succeeded)
+        self.metrics.record_latency(latency_ms)
+        self._notify(job)
+
+    async def _fail(self, job: Job, exc: BaseException) -> None:
+        if not isinstance(exc, RetryableError):
             job.mark_failed(str(exc))
             self.metrics.record_status(JobStatus.failed)
+            self._notify(job)
+            return
+        job.attempts += 1
+        if job.attempts >= job.max_attempts:
+            job.mark_dead(str(exc))
+            self.metrics.record_status(JobStatus.dead)
+            self._notify(job)
+            return
+        delay = self._backoff(job.attempts)
+        job.status = JobStatus.queued
+        job.next_run_at = datetime.utcnow() + timedelta(seconds=delay)
+        job.updated_at = datetime.utcnow()
+        self.metrics.record_retry()
+        async with self._lock:
+            self._push(job)
+            self._wake.set()
 
     def _backoff(self, attempt: int) -> float:
         base = 2 ** (attempt - 1)
@@ -188,6 +602,34 @@ class TaskQueue:
     def get_job(self, job_id: uuid.UUID) -> Optional[Job]:
         return self._jobs.get(job_id)
 
+    def discard(self, job_id: uuid.UUID) -> Optional[Job]:
+        """Forget a finished job and its result; queued or running jobs are kept."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status in (JobStatus.queued, JobStatus.running):
+            return None
+        del self._jobs[job_id]
+        if job.idempotency_key and self._idempotency.get(job.idempotency_key) == job_id:
+            del self._idempotency[job.idempotency_key]
+        cleanup = self._cleanups.get(job.type)
+        if cleanup is not None:
+            cleanup(job)
+        return job
+
+    def expire_jobs(self, now: datetime | None = None) -> int:
+        """Discard jobs that finished more than JOB_RETENTION_S ago; returns how many."""
+        retention_s = get_settings().job_retention_s
+        if retention_s <= 0:
+            return 0
+        cutoff = (now or datetime.utcnow()) - timedelta(seconds=retention_s)
+        expired = [
+            job.id
+            for job in self._jobs.values()
+            if job.status not in (JobStatus.queued, JobStatus.running) and job.updated_at < cutoff
+        ]
+        for job_id in expired:
+            self.discard(job_id)
+        return len(expired)
+
     def all_jobs(self) -> Dict[uuid.UUID, Job]:
         return dict(self._jobs)
 
@@ -195,8 +637,10 @@ class TaskQueue:
         async with self._lock:
             self._jobs = {}
             self._idempotency = {}
-            self._pending = []
+            self._tenants = {}
+            self._run_locks = {}
         self.metrics = QueueMetrics()
+        self.tenant_metrics = TenantQueueMetrics()
         self._wake.clear()
 
 
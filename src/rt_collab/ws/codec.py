@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+import struct
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+import msgpack
+
+# Sec-WebSocket-Protocol values. JSON text frames stay the default when a
+# client offers nothing; "rtc.msgpack.v1" switches the socket to binary frames.
+SUBPROTOCOL_JSON = "rtc.json.v1"
+SUBPROTOCOL_MSGPACK = "rtc.msgpack.v1"
+
+
+# --- MessagePack ---
+
+def packb(obj: Any) -> bytes:
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def unpackb(data: bytes) -> Any:
+    try:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    except Exception as exc:
+        # Normalise the extension's error zoo (OutOfData, ExtraData, FormatError...)
+        raise ValueError(f"invalid msgpack frame: {exc}") from exc
+
+
+def _map_header(n: int) -> bytes:
+    if n <= 15:
+        return bytes([0x80 | n])  # fixmap
+    if n <= 0xFFFF:
+        return b"\xde" + struct.pack(">H", n)  # map16
+    return b"\xdf" + struct.pack(">I", n)  # map32
+
+
+# --- Per-socket codecs ---
+
+@dataclass(frozen=True)
+class Codec:
+    name: str
+    # Binary codecs go out as binary frames (send_bytes), text ones via send_text
+    binary: bool
+    encode: Callable[[Any], Any]
+    decode: Callable[[Any], Any]
+    # Key into services.snapshot_cache.ENCODERS for pre-encoded snapshot text
+    text_encoding: str
+
+
+JSON_CODEC = Codec(SUBPROTOCOL_JSON, False, json.dumps, json.loads, "json")
+MSGPACK_CODEC = Codec(SUBPROTOCOL_MSGPACK, True, packb, unpackb, "msgpack")
+
+CODECS = {codec.name: codec for codec in (JSON_CODEC, MSGPACK_CODEC)}
+
+
+def negotiate(offered: Iterable[str]) -> Tuple[str | None, Codec]:
+    """Pick the first subprotocol the client offered that we speak.
+
+    Returns (subprotocol to echo in the handshake, codec). Clients that offer
+    nothing we know get plain JSON and no subprotocol header.
+    """
+    for name in offered:
+        codec = CODECS.get(name.strip())
+        if codec is not None:
+            return codec.name, codec
+    return None, JSON_CODEC
+
+
+def splice_snapshot(codec: Codec, encoded_text: bytes, fields: Dict[str, Any]) -> Any:
+    """Build a `snapshot` frame around text already encoded for this codec.
+
+    Lets every joiner reuse one cached encoding of the (large) text and only
+    encode the small per-client fields.
+    """
+    if codec.binary:
+        out = bytearray(_map_header(len(fields) + 2))
+        out += packb("type") + packb("snapshot") + packb("text") + encoded_text
+        for key, value in fields.items():
+            out += packb(key) + packb(value)
+        return bytes(out)
+    rest = json.dumps(fields)[1:] if fields else "}"
+    return '{"type": "snapshot", "text": ' + encoded_text.decode("utf-8") + (", " + rest if fields else rest)
+
+
+def decode_frame(message: dict) -> Any:
+    """Decode a raw ASGI websocket.receive message by frame type."""
+    raw = message.get("bytes")
+    if raw is not None:
+        return unpackb(raw)
+    return json.loads(message.get("text") or "")
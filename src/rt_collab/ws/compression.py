@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import zlib
+from typing import Any, List, Sequence, Tuple
+
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.frames import Frame, Opcode
+
+from rt_collab.core.config import get_settings
+
+
+# Leading byte of a binary frame whose body is already raw-deflated by the app.
+# 0xC1 is never valid as the first byte of a MessagePack value, so these frames
+# can't be confused with msgpack ones, and the transport leaves them alone.
+PRECOMPRESSED_MARKER = b"\xc1"
+
+
+def deflate_raw(data: bytes) -> bytes:
+    settings = get_settings()
+    compressor = zlib.compressobj(
+        settings.ws_deflate_level,
+        zlib.DEFLATED,
+        -settings.ws_deflate_window_bits,
+        settings.ws_deflate_mem_level,
+    )
+    return compressor.compress(data) + compressor.flush()
+
+
+class ThresholdPerMessageDeflate(PerMessageDeflate):
+    """permessage-deflate that sends small and pre-compressed messages raw.
+
+    RSV1 is per message (RFC 7692), so skipping one leaves the shared LZ77
+    context untouched for the next compressed message.
+    """
+
+    min_size = 0
+
+    def encode(self, frame: Frame) -> Frame:
+        if frame.fin and frame.opcode in (Opcode.TEXT, Opcode.BINARY):
+            if len(frame.data) < self.min_size or frame.data[:1] == PRECOMPRESSED_MARKER:
+                return frame
+        return super().encode(frame)
+
+
+class ThresholdDeflateFactory(ServerPerMessageDeflateFactory):
+    def __init__(self, min_size: int, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.min_size = min_size
+
+    def process_request_params(
+        self, params: Sequence[Tuple[str, str | None]], accepted_extensions: Sequence[Any]
+    ) -> Tuple[List[Tuple[str, str | None]], PerMessageDeflate]:
+        response, ext = super().process_request_params(params, accepted_extensions)
+        tuned = ThresholdPerMessageDeflate(
+            ext.remote_no_context_takeover,
+            ext.local_no_context_takeover,
+            ext.remote_max_window_bits,
+            ext.local_max_window_bits,
+            ext.compress_settings,
+        )
+        tuned.min_size = self.min_size
+        return response, tuned
+
+
+def deflate_factory() -> ThresholdDeflateFactory:
+    settings = get_settings()
+    bits = settings.ws_deflate_window_bits
+    return ThresholdDeflateFactory(
+        settings.ws_compress_min_bytes,
+        server_max_window_bits=bits,
+        client_max_window_bits=bits,
+        compress_settings={"level": settings.ws_deflate_level, "memLevel": settings.ws_deflate_mem_level},
+    )
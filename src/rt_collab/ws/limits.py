@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import time
+import uuid
+from typing import Dict
+
+from rt_collab.core.config import get_settings
+from rt_collab.core.metrics import WsMetrics
+
+
+# Message types that mutate the doc and are subject to rate limits. Cursor
+# updates are exempt: presence already coalesces them to one frame per tick.
+EDIT_TYPES = frozenset({"op.submit", "edit.insert", "edit.delete"})
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/s refill up to `burst`; rate <= 0 means unlimited."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, n: float = 1.0) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill(time.monotonic())
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def retry_after(self, n: float = 1.0) -> float:
+        """Seconds until `n` tokens are available."""
+        if self.rate <= 0:
+            return 0.0
+        return max(0.0, (n - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Per-connection and per-document token buckets for inbound edit ops."""
+
+    def __init__(self) -> None:
+        self._doc_buckets: Dict[uuid.UUID, TokenBucket] = {}
+        self.metrics = WsMetrics()
+
+    def connection_bucket(self) -> TokenBucket:
+        settings = get_settings()
+        return TokenBucket(settings.ws_conn_rate, settings.ws_conn_burst)
+
+    def doc_bucket(self, doc_id: uuid.UUID) -> TokenBucket:
+        bucket = self._doc_buckets.get(doc_id)
+        if bucket is None:
+            settings = get_settings()
+            bucket = self._doc_buckets[doc_id] = TokenBucket(settings.ws_doc_rate, settings.ws_doc_burst)
+        return bucket
+
+    def check(self, doc_id: uuid.UUID, conn_bucket: TokenBucket) -> Dict[str, object] | None:
+        """Take one token from both buckets; return a nack payload if either is empty."""
+        if not conn_bucket.try_take():
+            self.metrics.record_throttle("connection")
+            return {"type": "nack", "reason": "rate_limited", "scope": "connection",
+                    "retry_after_ms": round(conn_bucket.retry_after() * 1000)}
+        doc_bucket = self.doc_bucket(doc_id)
+        if not doc_bucket.try_take():
+            conn_bucket.tokens = min(conn_bucket.capacity, conn_bucket.tokens + 1)  # refund
+            self.metrics.record_throttle("document")
+            return {"type": "nack", "reason": "rate_limited", "scope": "document",
+                    "retry_after_ms": round(doc_bucket.retry_after() * 1000)}
+        return None
+
+    def forget(self, doc_id: uuid.UUID) -> None:
+        self._doc_buckets.pop(doc_id, None)
+
+    def reset(self) -> None:
+        self._doc_buckets = {}
+        self.metrics = WsMetrics()
+
+
+limiter = RateLimiter()
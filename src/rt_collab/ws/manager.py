@@ -1,20 +1,23 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import uuid
 from typing import Any, Dict, Set
 
 from fastapi import WebSocket
 
+from rt_collab.ws.codec import JSON_CODEC, Codec
+
 
 class ConnectionManager:
     def __init__(self) -> None:
         self._doc_peers: Dict[uuid.UUID, Set[WebSocket]] = {}
+        self._codecs: Dict[WebSocket, Codec] = {}
         self._lock = asyncio.Lock()
 
-    async def connect(self, doc_id: uuid.UUID, ws: WebSocket) -> None:
-        await ws.accept()
+    async def connect(self, doc_id: uuid.UUID, ws: WebSocket, subprotocol: str | None = None, codec: Codec = JSON_CODEC) -> None:
+        await ws.accept(subprotocol=subprotocol)
+        self._codecs[ws] = codec
         async with self._lock:
             self._doc_peers.setdefault(doc_id, set()).add(ws)
 
@@ -23,16 +26,45 @@ class ConnectionManager:
             peers = self._doc_peers.get(doc_id)
             if peers and ws in peers:
                 peers.remove(ws)
+            self._codecs.pop(ws, None)
             if peers and len(peers) == 0:
                 self._doc_peers.pop(doc_id, None)
 
+    def peer_count(self, doc_id: uuid.UUID) -> int:
+        return len(self._doc_peers.get(doc_id, ()))
+
+    @staticmethod
+    async def _send_encoded(ws: WebSocket, codec: Codec, payload: Any) -> None:
+        if codec.binary:
+            await ws.send_bytes(payload)
+        else:
+            await ws.send_text(payload)
+
+    async def send(self, ws: WebSocket, message: Dict[str, Any]) -> None:
+        """Send one message to one socket in the codec it negotiated."""
+        codec = self._codecs.get(ws, JSON_CODEC)
+        await self._send_encoded(ws, codec, codec.encode(message))
+
+    async def send_raw(self, ws: WebSocket, payload: Any) -> None:
+        """Send a payload already encoded with this socket's codec."""
+        await self._send_encoded(ws, self._codecs.get(ws, JSON_CODEC), payload)
+
+    def codec_for(self, ws: WebSocket) -> Codec:
+        return self._codecs.get(ws, JSON_CODEC)
+
     async def broadcast(self, doc_id: uuid.UUID, message: Dict[str, Any], exclude: WebSocket | None = None) -> None:
         peers = self._doc_peers.get(doc_id, set()).copy()
+        # Encode once per codec in use, not once per peer
+        encoded: Dict[str, Any] = {}
         for ws in peers:
             if ws is exclude:
                 continue
+            codec = self._codecs.get(ws, JSON_CODEC)
+            payload = encoded.get(codec.name)
+            if payload is None:
+                payload = encoded[codec.name] = codec.encode(message)
             try:
-                await ws.send_text(json.dumps(message))
+                await self._send_encoded(ws, codec, payload)
             except Exception:
                 # Best-effort, drop broken connections
                 try:
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Set, Tuple
+
+from rt_collab.core.config import get_settings
+from rt_collab.services.crdt import AtomId, anchor_from_wire, anchor_to_wire
+from rt_collab.services.docs import store
+from rt_collab.ws.manager import manager
+
+
+# Caret fields in cursor payloads that get pinned to CRDT atoms
+_CARET_KEYS = ("index", "end")
+
+
+@dataclass
+class PresenceEntry:
+    data: Dict[str, Any]
+    ts: Any
+    seen_at: float  # monotonic time of the last update
+    anchors: Dict[str, AtomId | None] = field(default_factory=dict)
+    resolved: Dict[str, int] = field(default_factory=dict)  # caret indices last sent
+    pending: bool = False  # arrived while the doc was busy: raw indices, not anchored yet
+
+    def payload(self) -> Dict[str, Any]:
+        data = {**self.data, **self.resolved}
+        if "index" in self.anchors:
+            data["anchor"] = anchor_to_wire(self.anchors["index"])
+        return {"data": data, "ts": self.ts}
+
+
+class PresenceHub:
+    """Latest cursor per client per doc, fanned out as periodic batched diffs.
+
+    `cursor.update` only overwrites state here; a flusher task sends one
+    `presence` frame per doc per interval carrying the clients that changed
+    (`updated`) and the ones that left or went stale (`removed`).
+
+    Caret indices are pinned to CRDT atom ids on arrival and re-resolved when
+    the doc version moves, so cursors follow concurrent edits server-side and
+    only those whose index actually shifted are re-sent.
+    """
+
+    def __init__(self) -> None:
+        self._state: Dict[uuid.UUID, Dict[str, PresenceEntry]] = {}
+        self._dirty: Dict[uuid.UUID, Set[str]] = {}
+        self._removed: Dict[uuid.UUID, Set[str]] = {}
+        self._versions: Dict[uuid.UUID, int] = {}  # doc version carets were last resolved at
+        self._task: asyncio.Task | None = None
+
+    def update(self, doc_id: uuid.UUID, client_id: str, data: Dict[str, Any], ts: Any = None) -> None:
+        entry = PresenceEntry(data=dict(data), ts=ts, seen_at=time.monotonic())
+        doc = store.peek(doc_id)
+        if doc is not None and doc.busy:
+            # An executor thread holds the CRDT: send the raw indices for now
+            # and pin them in _rebase once the doc is free
+            entry.pending = True
+            entry.resolved = {key: data[key] for key in _CARET_KEYS if isinstance(data.get(key), int)}
+        elif doc is not None:
+            self._anchor(doc.crdt, entry)
+            self._resolve(doc.crdt, entry)
+        self._state.setdefault(doc_id, {})[client_id] = entry
+        self._dirty.setdefault(doc_id, set()).add(client_id)
+        self._removed.get(doc_id, set()).discard(client_id)
+
+    @staticmethod
+    def _anchor(crdt: Any, entry: PresenceEntry) -> None:
+        entry.pending = False
+        try:
+            if "anchor" in entry.data:
+                entry.anchors["index"] = anchor_from_wire(entry.data.pop("anchor"))
+            for key in _CARET_KEYS:
+                if key not in entry.anchors and isinstance(entry.data.get(key), int):
+                    entry.anchors[key] = crdt.anchor_at(entry.data[key])
+        except (KeyError, TypeError, ValueError):
+            entry.anchors = {}
+
+    @staticmethod
+    def _resolve(crdt: Any, entry: PresenceEntry) -> bool:
+        """Recompute caret indices from anchors; True if any of them moved."""
+        resolved = {}
+        for key, anchor in entry.anchors.items():
+            index = crdt.index_of_anchor(anchor)
+            if index is not None:
+                resolved[key] = index
+        changed = resolved != entry.resolved
+        entry.resolved = resolved
+        return changed
+
+    def _rebase(self) -> None:
+        # Docs edited since the last flush: carets whose index shifted count as
+        # updates. Carets that arrived while the doc was busy get pinned first.
+        for doc_id, clients in self._state.items():
+            doc = store.peek(doc_id)
+            if doc is None or doc.busy:
+                continue
+            moved = self._versions.get(doc_id) != doc.version
+            self._versions[doc_id] = doc.version
+            for client_id, entry in clients.items():
+                if entry.pending:
+                    self._anchor(doc.crdt, entry)
+                elif not moved:
+                    continue
+                if entry.anchors and self._resolve(doc.crdt, entry):
+                    self._dirty.setdefault(doc_id, set()).add(client_id)
+
+    def remove(self, doc_id: uuid.UUID, client_id: str) -> None:
+        clients = self._state.get(doc_id)
+        if clients is None or clients.pop(client_id, None) is None:
+            return
+        if not clients:
+            self._state.pop(doc_id, None)
+            self._versions.pop(doc_id, None)
+        self._dirty.get(doc_id, set()).discard(client_id)
+        self._removed.setdefault(doc_id, set()).add(client_id)
+
+    def snapshot(self, doc_id: uuid.UUID) -> Dict[str, Dict[str, Any]]:
+        return {cid: e.payload() for cid, e in self._state.get(doc_id, {}).items()}
+
+    def _expire(self, now: float, ttl_s: float) -> None:
+        for doc_id, clients in list(self._state.items()):
+            for client_id, entry in list(clients.items()):
+                if now - entry.seen_at > ttl_s:
+                    self.remove(doc_id, client_id)
+
+    def drain(self) -> List[Tuple[uuid.UUID, Dict[str, Any]]]:
+        """Expire stale clients and return one diff frame per doc with pending changes."""
+        self._expire(time.monotonic(), get_settings().presence_ttl_s)
+        self._rebase()
+        frames = []
+        for doc_id in set(self._dirty) | set(self._removed):
+            dirty = self._dirty.pop(doc_id, set())
+            removed = self._removed.pop(doc_id, set())
+            if not dirty and not removed:
+                continue
+            clients = self._state.get(doc_id, {})
+            updated = {cid: clients[cid].payload() for cid in dirty if cid in clients}
+            frames.append((doc_id, {"type": "presence", "updated": updated, "removed": sorted(removed)}))
+        return frames
+
+    async def flush(self) -> None:
+        for doc_id, frame in self.drain():
+            await manager.broadcast(doc_id, frame)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(get_settings().presence_interval_ms / 1000)
+            try:
+                await self.flush()
+            except Exception:  # pragma: no cover - keep the flusher alive
+                pass
+
+    async def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def reset(self) -> None:
+        self._state = {}
+        self._dirty = {}
+        self._removed = {}
+        self._versions = {}
+
+
+presence = PresenceHub()
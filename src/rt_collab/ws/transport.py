@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Any
+
+from uvicorn.protocols.websockets.websockets_sansio_impl import WebSocketsSansIOProtocol
+from websockets.server import ServerProtocol
+
+from rt_collab.ws.compression import deflate_factory
+
+
+# Kept apart from rt_collab.ws.compression so importing the app never pulls
+# in uvicorn; only the server process loads this module (via --ws).
+
+
+class DeflateWebSocketProtocol(WebSocketsSansIOProtocol):
+    """uvicorn WebSocket protocol with permessage-deflate tuned from Settings.
+
+    Stock uvicorn hard-codes the deflate parameters; run with
+    `uvicorn rt_collab.main:app --ws rt_collab.ws.transport:DeflateWebSocketProtocol`.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        if self.config.ws_per_message_deflate:
+            self.conn = ServerProtocol(
+                extensions=[deflate_factory()],
+                max_size=self.config.ws_max_size,
+                logger=self.conn.logger,
+            )
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import uuid
+
+import pytest
+
+from rt_collab.services.backups import BackupManifest, BackupService
+from rt_collab.services.docs import InMemoryDocStore
+from rt_collab.services.job_handlers import handle_backup_run
+from rt_collab.services.snapshots import InMemorySnapshotStore
+from rt_collab.services.task_queue import Job, current_job
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def _docs(count: int) -> tuple[InMemoryDocStore, list[uuid.UUID]]:
+    docs = InMemoryDocStore()
+    ids = [uuid.uuid4() for _ in range(count)]
+    for i, doc_id in enumerate(ids):
+        await docs.create_from_text(doc_id, f"doc {i} " * 10)
+    return docs, ids
+
+
+def _archive_lines(service: BackupService, manifest: BackupManifest) -> dict:
+    data = service.archive_path(manifest.id).read_bytes()
+    lines = {}
+    for doc_id, entry in manifest.docs.items():
+        line = json.loads(data[entry.offset : data.index(b"\n", entry.offset)])
+        assert line["doc_id"] == doc_id
+        lines[doc_id] = line
+    return lines
+
+
+@pytest.mark.anyio
+async def test_only_dirty_docs_are_backed_up_and_progress_is_reported(tmp_path):
+    docs, ids = await _docs(12)
+    snaps = InMemorySnapshotStore()
+    service = BackupService(docs, snaps, root=tmp_path)
+    job = Job(id=uuid.uuid4(), type="backup.run", payload={})
+    token = current_job.set(job)
+    try:
+        first = await service.run("archive", concurrency=4, checkpoint_every=5)
+    finally:
+        current_job.reset(token)
+    assert len(first.docs) == 12 and first.completed_at
+    assert job.progress == {"backup_id": first.id, "total": 12, "done": 12}
+    assert _archive_lines(service, first)[str(ids[3])]["text"] == "doc 3 " * 10
+
+    assert (await service.run("archive")).docs == {}
+    await docs.local_insert(ids[5], 0, "x")
+    third = await service.run("archive")
+    assert list(third.docs) == [str(ids[5])] and third.docs[str(ids[5])].version == 2
+
+    # A fresh service (restart) rebuilds backed-up versions from manifests
+    assert await BackupService(docs, snaps, root=tmp_path).dirty("archive") == []
+    # Targets are tracked separately
+    snap_run = await service.run("snapshots")
+    assert len(snap_run.docs) == 12 and (await snaps.latest(ids[5])).version == 2
+
+
+@pytest.mark.anyio
+async def test_interrupted_run_resumes_from_last_checkpoint(tmp_path):
+    docs, ids = await _docs(10)
+    service = BackupService(docs, InMemorySnapshotStore(), root=tmp_path)
+    real = docs.snapshot_text
+    calls = 0
+
+    async def flaky(doc_id):
+        nonlocal calls
+        calls += 1
+        if calls == 8:
+            raise RuntimeError("disk on fire")
+        return await real(doc_id)
+
+    docs.snapshot_text = flaky
+    with pytest.raises(RuntimeError):
+        await service.run("archive", concurrency=1, checkpoint_every=3)
+    broken = BackupManifest.load(service.manifest_path(next(iter(tmp_path.glob("*.jsonl"))).stem))
+    assert broken.completed_at is None and len(broken.docs) == 7
+
+    resumed = await BackupService(docs, InMemorySnapshotStore(), root=tmp_path).run("archive", concurrency=3)
+    assert resumed.id == broken.id and resumed.resumed == 1 and resumed.completed_at
+    assert set(_archive_lines(service, resumed)) == {str(d) for d in ids}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("resume", ["false", "0", 0, None])
+async def test_backup_job_rejects_non_bool_resume(resume):
+    with pytest.raises(ValueError, match="invalid_resume"):
+        await handle_backup_run({"resume": resume})
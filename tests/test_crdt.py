@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from hypothesis import given, strategies as st
 
-from rt_collab.services.crdt import TextCRDT
+from rt_collab.services.crdt import TextCRDT, between_pos
 
 
 @given(st.lists(st.text(min_size=1, max_size=3), min_size=1, max_size=5))
@@ -20,3 +20,76 @@ def test_commutativity_of_apply(chunks):
         c2.apply(op)
 
     assert c1.to_string() == c2.to_string()
+
+
+@given(st.lists(st.integers(min_value=0, max_value=10_000), min_size=1, max_size=200))
+def test_between_pos_keeps_positions_strictly_ordered(picks):
+    positions: list[list[int]] = []
+    for pick in picks:
+        i = pick % (len(positions) + 1)
+        left = positions[i - 1] if i > 0 else None
+        right = positions[i] if i < len(positions) else None
+        pos = between_pos(left, right)
+        assert (left is None or left < pos) and (right is None or pos < right)
+        positions.insert(i, pos)
+
+
+def test_sequential_typing_keeps_identifiers_short():
+    doc = TextCRDT(site_id="A")
+    for i in range(1000):
+        doc.local_insert(i, "x")
+    assert max(len(a.pos) for a in doc.atoms()) <= 2
+
+
+def test_position_allocation_is_reproducible_per_replica():
+    def positions(doc):
+        for i in range(200):
+            doc.local_insert((i * 7919) % (i + 1), "x")
+        return [a.pos for a in doc.atoms()]
+
+    assert positions(TextCRDT(site_id="A")) == positions(TextCRDT(site_id="A"))
+    assert positions(TextCRDT(site_id="A", seed=1)) == positions(TextCRDT(site_id="B", seed=1))
+    assert positions(TextCRDT(site_id="A")) != positions(TextCRDT(site_id="B"))
+
+
+def test_apply_is_idempotent_and_deletes_by_id():
+    producer = TextCRDT(site_id="src")
+    ins = producer.local_insert(0, "abc")
+    dele = producer.local_delete(1, 1)
+
+    replica = TextCRDT(site_id="B")
+    for op in (ins, ins, dele, dele):
+        replica.apply(op)
+
+    assert replica.to_string() == producer.to_string() == "ac"
+    assert len(replica.atoms()) == 3
+    assert [a.key for a in replica.atoms()] == sorted((tuple(a.pos), a.site_id, a.counter) for a in replica.atoms())
+
+
+def test_from_text_bulk_load_round_trips_and_accepts_edits():
+    text = "hello bulk world\n" * 500
+    doc = TextCRDT.from_text("bulk", text)
+    positions = [a.pos for a in doc.atoms()]
+
+    assert doc.to_string() == text
+    assert "".join(doc.iter_chunks(chunk_size=100)) == text
+    assert all(p < q for p, q in zip(positions, positions[1:]))
+
+    op = doc.local_insert(6, "big ")
+    replica = TextCRDT.from_text("bulk", text)
+    replica.apply(op)
+    assert doc.to_string() == replica.to_string() == "hello big " + text[6:]
+
+
+def test_cursor_anchor_survives_concurrent_edits():
+    other = TextCRDT.from_text("B", "hello world")
+    doc = TextCRDT.from_text("B", "hello world")
+
+    anchor = doc.anchor_at(5)  # caret after "hello"
+    doc.apply(other.local_insert(0, ">> "))
+    assert doc.index_of_anchor(anchor) == 8
+
+    doc.apply(other.local_delete(5, 3))  # removes "llo", including the anchor atom
+    assert doc.to_string() == ">> he world"
+    assert doc.index_of_anchor(anchor) == 5
+    assert doc.index_of_anchor(None) == 0
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from rt_collab.core.config import get_settings
+from rt_collab.db import database
+from rt_collab.db.models import Base, Document
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def sqlite_engine(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}")
+    monkeypatch.setattr(settings, "db_pool_size", 3)
+    monkeypatch.setattr(settings, "db_bulk_batch_size", 40)
+    await database.dispose_engine()
+    engine = database.get_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await database.dispose_engine()
+
+
+@pytest.mark.anyio
+async def test_bulk_insert_batches_rows_and_records_pool_metrics(sqlite_engine):
+    assert sqlite_engine.pool.size() == 3
+    checkouts = database.metrics.pool_events["checkout"]
+    queries = database.metrics.query_latency.total
+
+    rows = ({"id": str(uuid.uuid4()), "title": f"doc {i}", "snapshot_version": 0} for i in range(100))
+    async with database.bulk_session() as session:
+        assert await database.bulk_insert(session, Document.__table__, rows) == 100
+
+    async with database.get_session() as session:
+        assert (await session.execute(select(func.count()).select_from(Document))).scalar_one() == 100
+
+    assert database.metrics.pool_events["checkout"] == checkouts + 2
+    # 3 executemany batches (40 + 40 + 20) plus the count query
+    assert database.metrics.query_latency.total >= queries + 4
+    assert database.metrics.pool_wait.total >= 2
+
+
+@pytest.mark.anyio
+async def test_failed_statements_do_not_skew_query_timing(sqlite_engine):
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+
+    async with sqlite_engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                await conn.execute(text("SELECT * FROM no_such_table"))
+        queries = database.metrics.query_latency.total
+        await conn.execute(text("SELECT 1"))
+        assert database.metrics.query_latency.total == queries + 1
+        # Nothing is left behind on the connection by the statements that raised
+        assert "query_start" not in conn.sync_connection.info
+
+
+def test_metrics_endpoint_exports_db_histograms():
+    from rt_collab.main import app
+
+    with TestClient(app) as client:
+        body = client.get("/metrics").text
+    assert 'db_query_latency_seconds_bucket{le="+Inf"}' in body
+    assert 'db_pool_wait_seconds_count' in body
+    assert 'db_pool_events_total{event="checkout"}' in body
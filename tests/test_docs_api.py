@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from rt_collab.main import app
+
+
+def test_create_doc_with_initial_content():
+    content = "line one\nline two\n" * 100
+    with TestClient(app) as client:
+        created = client.post("/v1/docs", json={"title": "Imported", "content": content})
+        assert created.status_code == 200
+        body = created.json()
+        assert body["version"] == 1
+
+        fetched = client.get(f"/v1/docs/{body['id']}").json()
+        assert fetched["text"] == content
+        assert fetched["version"] == 1
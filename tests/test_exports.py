@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import time
+
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from rt_collab.main import app
+from rt_collab.services.artifacts import artifacts
+from rt_collab.services.task_queue import task_queue
+
+
+def _wait_for_job(client: TestClient, job_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/v1/jobs/{job_id}").json()
+        if job["status"] in {"succeeded", "failed", "dead"}:
+            return job
+        time.sleep(0.05)
+    raise AssertionError("timeout waiting for export job")
+
+
+def test_export_is_stored_as_artifact_and_streamed_with_ranges():
+    content = "<b>bold</b> & plain\n" * 2000
+    with TestClient(app) as client:
+        doc_id = client.post("/v1/docs", json={"content": content}).json()["id"]
+        job = client.post(f"/v1/docs/{doc_id}/export", json={"format": "html"}).json()
+        job = _wait_for_job(client, job["id"])
+
+        assert job["status"] == "succeeded"
+        result = job["result"]
+        assert "content" not in result
+        assert result["content_type"].startswith("text/html")
+
+        full = client.get(result["download_url"])
+        assert full.status_code == 200
+        assert full.headers["accept-ranges"] == "bytes"
+        assert "&lt;b&gt;bold&lt;/b&gt; &amp; plain" in full.text
+        assert len(full.content) == result["size"]
+
+        part = client.get(result["download_url"], headers={"Range": "bytes=10-19"})
+        assert part.status_code == 206
+        assert part.headers["content-range"] == f"bytes 10-19/{result['size']}"
+        assert part.content == full.content[10:20]
+
+        tail = client.get(result["download_url"], headers={"Range": "bytes=-7"})
+        assert tail.content == full.content[-7:]
+
+        bad = client.get(result["download_url"], headers={"Range": f"bytes={result['size']}-"})
+        assert bad.status_code == 416
+
+
+def test_export_rejects_unknown_format():
+    with TestClient(app) as client:
+        doc_id = client.post("/v1/docs", json={}).json()["id"]
+        resp = client.post(f"/v1/docs/{doc_id}/export", json={"format": "pdf"})
+        assert resp.status_code == 400
+
+
+def test_empty_artifact_ignores_ranges_and_expires_with_its_job():
+    with TestClient(app) as client:
+        doc_id = client.post("/v1/docs", json={}).json()["id"]
+        job = client.post(f"/v1/docs/{doc_id}/export", json={"format": "plain"}).json()
+        result = _wait_for_job(client, job["id"])["result"]
+        assert result["size"] == 0
+
+        resp = client.get(result["download_url"], headers={"Range": "bytes=-5"})
+        assert resp.status_code == 200
+        assert resp.content == b""
+
+        assert task_queue.expire_jobs(datetime.utcnow() + timedelta(days=1)) >= 1
+        assert client.get(f"/v1/jobs/{job['id']}").status_code == 404
+        assert artifacts.get(result["artifact_id"]) is None
+        assert client.get(result["download_url"]).status_code == 404
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import json
+import random
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from rt_collab.core.config import get_settings
+from rt_collab.main import app
+from rt_collab.services.crdt import Change, TextCRDT
+from rt_collab.services.docs import InMemoryDocStore
+from rt_collab.services.history import history
+from rt_collab.services.snapshots import snapshots
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def checkpoint_every(monkeypatch):
+    monkeypatch.setattr(get_settings(), "history_checkpoint_every", 10)
+    return 10
+
+
+@pytest.mark.anyio
+async def test_text_at_every_version_matches_live_text(checkpoint_every):
+    rng = random.Random(3)
+    store = InMemoryDocStore()
+    await store.reset()
+    doc_id = uuid.uuid4()
+    remote = TextCRDT(site_id="remote")  # a second replica, fed every local op
+    expected = {0: ""}
+    for _ in range(60):
+        text, version = await store.snapshot_text(doc_id)
+        if rng.random() < 0.3 and text:
+            op, _, _ = await store.local_delete(doc_id, rng.randrange(len(text)), rng.randint(1, 4))
+            remote.apply(op)
+        elif rng.random() < 0.5:
+            op, _, _ = await store.local_insert(doc_id, rng.randint(0, len(text)), "ab")
+            remote.apply(op)
+        else:
+            # Remote batches go through apply_tracked
+            if text and rng.random() < 0.5:
+                op = remote.local_delete(rng.randrange(len(text)), 3)
+            else:
+                op = remote.local_insert(rng.randint(0, len(text)), "xyz")
+            await store.apply_ops(doc_id, op)
+        text, version = await store.snapshot_text(doc_id)
+        expected[version] = text
+
+    for version, text in expected.items():
+        assert await history.text_at(doc_id, version) == text
+    # No read replayed more than one checkpoint interval
+    assert history.stats["replayed"] <= len(expected) * checkpoint_every
+
+
+@pytest.mark.anyio
+async def test_snapshots_shorten_replay_and_cache_hits(checkpoint_every):
+    store = InMemoryDocStore()
+    await store.reset()
+    await snapshots.reset()
+    doc_id = uuid.uuid4()
+    for i in range(8):
+        await store.local_insert(doc_id, i, str(i))
+    await snapshots.record(doc_id, 7, "0123456")
+
+    assert await history.text_at(doc_id, 8) == "01234567"
+    assert history.stats["replayed"] == 1
+    assert await history.text_at(doc_id, 8) == "01234567"
+    assert history.stats["hits"] == 1
+    assert await history.text_at(doc_id, 0) == ""
+
+    with pytest.raises(LookupError):
+        await history.text_at(doc_id, 9)
+    with pytest.raises(LookupError):
+        await history.text_at(uuid.uuid4(), 1)
+    await snapshots.reset()
+
+
+@pytest.mark.anyio
+async def test_out_of_range_client_indices_are_journaled_as_applied():
+    store = InMemoryDocStore()
+    await store.reset()
+    doc_id = uuid.uuid4()
+    await store.create_from_text(doc_id, "abcdef")
+    for index in (-2, 99):
+        await store.local_insert(doc_id, index, "X")
+    await store.local_delete(doc_id, -3, 2)
+    await store.local_delete(doc_id, 50, 2)
+    text, version = await store.snapshot_text(doc_id)
+    assert text == "bcdefX"
+    for v in range(1, version + 1):
+        assert await history.text_at(doc_id, v) == ["abcdef", "Xabcdef", "XabcdefX", "bcdefX", "bcdefX"][v - 1]
+
+
+@pytest.mark.anyio
+async def test_retention_drops_whole_checkpoint_intervals(checkpoint_every, monkeypatch):
+    monkeypatch.setattr(get_settings(), "history_max_versions", 25)
+    store = InMemoryDocStore()
+    await store.reset()
+    doc_id = uuid.uuid4()
+    for i in range(60):
+        await store.local_insert(doc_id, i, "ab")
+        await store.local_delete(doc_id, i + 1, 1)  # leaves "a", tombstones "b"
+    crdt = store.peek(doc_id).crdt
+    # 120 versions: the newest checkpoint at least 25 behind is 90
+    with pytest.raises(LookupError):
+        await history.text_at(doc_id, 89)
+    assert await history.text_at(doc_id, 90) == "a" * 45
+    assert await history.text_at(doc_id, 91) == "a" * 45 + "ab"
+    hist = history._docs[doc_id]
+    assert hist.base == 90 and hist.checkpoints[0][0] == 90
+    assert min(hist.born_at.values()) > 90 and min(hist.died_at.values()) > 90
+    # Atoms tombstoned before the base no longer have a journaled death, and stay invisible
+    diff = history.diff(doc_id, crdt, 90, 120)
+    assert [(h.kind, h.text) for h in diff.hunks] == [("insert", "a" * 15)]
+
+    await store.drop(doc_id)
+    with pytest.raises(LookupError):
+        await history.text_at(doc_id, 120)
+
+
+def test_version_query_and_history_listing():
+    with TestClient(app) as client:
+        doc_id = client.post("/v1/docs", json={"content": "hello"}).json()["id"]
+        history.record(uuid.UUID(doc_id), 2, Change([(5, 0, " world")]), lambda: "hello world")
+
+        old = client.get(f"/v1/docs/{doc_id}", params={"version": 1})
+        assert old.status_code == 200
+        assert old.json() == {"id": doc_id, "text": "hello", "version": 1}
+        assert "immutable" in old.headers["cache-control"]
+        assert client.get(f"/v1/docs/{doc_id}", params={"version": 5}).status_code == 404
+
+        listing = client.get(f"/v1/docs/{doc_id}/history").json()
+        assert listing["current_version"] == 2
+        assert [(e["version"], e["inserted"]) for e in listing["entries"]] == [(2, 6)]
+        assert client.get(f"/v1/docs/{uuid.uuid4()}/history").status_code == 404
+
+
+@pytest.mark.anyio
+async def test_diff_reports_net_atom_changes_in_document_order():
+    store = InMemoryDocStore()
+    await store.reset()
+    doc_id = uuid.uuid4()
+    await store.local_insert(doc_id, 0, "hello world")  # v1
+    await store.local_delete(doc_id, 0, 5)  # v2: " world"
+    await store.local_insert(doc_id, 0, "goodbye")  # v3: "goodbye world"
+    await store.local_insert(doc_id, 13, "!!")  # v4
+    await store.local_delete(doc_id, 13, 2)  # v5: the "!!" again
+    crdt = store.peek(doc_id).crdt
+
+    diff = history.diff(doc_id, crdt, 1, 5)
+    assert (diff.inserted, diff.deleted) == (7, 5)
+    # LSEQ may interleave the new atoms with the tombstones they replaced, so
+    # hunk boundaries vary; per kind, the hunks still read in document order
+    assert "".join(h.text for h in diff.hunks if h.kind == "insert") == "goodbye"
+    assert "".join(h.text for h in diff.hunks if h.kind == "delete") == "hello"
+    assert [(h.kind, h.text) for h in history.diff(doc_id, crdt, 3, 4).hunks] == [("insert", "!!")]
+    assert history.diff(doc_id, crdt, 4, 4).hunks == []
+    with pytest.raises(LookupError):
+        history.diff(doc_id, crdt, 2, 6)
+
+
+def test_diff_endpoint_streams_ndjson():
+    with TestClient(app) as client:
+        doc_id = client.post("/v1/docs", json={"content": "abc"}).json()["id"]
+        resp = client.get(f"/v1/docs/{doc_id}/diff", params={"from": 1})
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        assert lines == [{"doc_id": doc_id, "from": 1, "to": 1, "inserted": 0, "deleted": 0, "hunks": 0}]
+        assert client.get(f"/v1/docs/{doc_id}/diff", params={"from": 0}).status_code == 404
+        assert client.get(f"/v1/docs/{doc_id}/diff", params={"from": 2, "to": 1}).status_code == 400
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import pytest
+
+from rt_collab.loadtest.config import TypingProfile, Scenario, scenario_from_dict
+from rt_collab.loadtest.runner import run_scenario
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def test_scenario_rejects_unknown_keys():
+    with pytest.raises(ValueError):
+        scenario_from_dict({"editors": 10, "typo_rate": 0.1})
+
+
+@pytest.mark.anyio
+async def test_inprocess_smoke_run_reports_latencies():
+    scenario = Scenario(
+        name="test",
+        docs=2,
+        editors=6,
+        duration_s=1.0,
+        ramp_up_s=0.2,
+        sample_interval_s=0.5,
+        seed=1,
+        protocol="msgpack",
+        typing=TypingProfile(key_delay_ms_median=20, pause_prob=0.0),
+    )
+    report = await run_scenario(scenario)
+
+    assert report["connect_failures"] == 0
+    assert report["acks"] > 0
+    assert report["ack_latency_ms"]["count"] == report["acks"]
+    assert report["broadcast_lag_ms"]["count"] > 0
+    assert report["timeline"]
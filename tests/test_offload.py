@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from rt_collab.core.config import get_settings
+from rt_collab.core.loop_monitor import LoopLagMonitor
+from rt_collab.services.artifacts import artifacts
+from rt_collab.services.crdt import TextCRDT
+from rt_collab.services.docs import InMemoryDocStore, store
+from rt_collab.services.history import history
+from rt_collab.services.job_handlers import handle_doc_export
+from rt_collab.services.offload import crdt_executor
+from rt_collab.services.search import search_index
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def offload_everything(monkeypatch):
+    s = get_settings()
+    monkeypatch.setattr(s, "crdt_offload_workers", 2)
+    monkeypatch.setattr(s, "crdt_offload_min_chars", 1)
+    monkeypatch.setattr(s, "crdt_offload_doc_chars", 1)
+    yield s
+    crdt_executor.shutdown()
+
+
+@pytest.mark.anyio
+async def test_offloaded_ops_keep_per_doc_order(offload_everything):
+    store = InMemoryDocStore()
+    await store.reset()
+    doc_id = uuid.uuid4()
+    await store.create_from_text(doc_id, "base")
+    before = crdt_executor.stats["offloaded"]
+
+    # Concurrent writers on one doc: each op must see the state left by the one before it
+    results = await asyncio.gather(*(store.local_insert(doc_id, 0, f"{i}.") for i in range(20)))
+    assert sorted(version for _, version, _ in results) == list(range(2, 22))
+    text, version = await store.snapshot_text(doc_id)
+    assert version == 21
+    assert text == "".join(f"{i}." for i in reversed(range(20))) + "base"
+    assert crdt_executor.stats["offloaded"] > before
+    assert not store.peek(doc_id).busy
+
+    remote = TextCRDT(site_id="remote")
+    await asyncio.gather(store.apply_ops(doc_id, remote.local_insert(0, "R")), store.local_delete(doc_id, 0, 2))
+    text, _ = await store.snapshot_text(doc_id)
+    assert await history.text_at(doc_id, 23) == text
+
+
+@pytest.mark.anyio
+async def test_full_search_reindex_is_sized_by_the_doc(offload_everything, monkeypatch):
+    store = InMemoryDocStore()
+    await store.reset()
+    doc_id = uuid.uuid4()
+    await store.create_from_text(doc_id, "a large document " * 100)
+    monkeypatch.setattr(offload_everything, "crdt_offload_min_chars", 10_000)
+    search_index.forget(doc_id)  # e.g. loaded from disk: the next edit re-tokenizes it all
+
+    before = crdt_executor.stats["offloaded"]
+    await store.local_insert(doc_id, 0, "x")  # the edit itself is small and stays inline
+    assert crdt_executor.stats["offloaded"] == before + 1
+    assert not search_index.needs_full(doc_id)
+    await store.local_insert(doc_id, 0, "y")
+    assert crdt_executor.stats["offloaded"] == before + 1
+
+
+@pytest.mark.anyio
+async def test_long_version_diffs_run_on_the_executor(offload_everything, monkeypatch):
+    store = InMemoryDocStore()
+    await store.reset()
+    doc_id = uuid.uuid4()
+    await store.create_from_text(doc_id, "hello")
+    await store.local_insert(doc_id, 5, " world")
+    inline = history.diff(doc_id, store.peek(doc_id).crdt, 1, 2)
+
+    before = crdt_executor.stats["offloaded"]
+    diff = await store.diff(doc_id, 1, 2)
+    assert crdt_executor.stats["offloaded"] == before + 1
+    assert [(h.kind, h.text) for h in diff.hunks] == [(h.kind, h.text) for h in inline.hunks] == [("insert", " world")]
+
+    # A range with fewer changes than the threshold stays inline
+    monkeypatch.setattr(offload_everything, "crdt_offload_min_chars", 7)
+    await store.diff(doc_id, 1, 2)
+    assert crdt_executor.stats["offloaded"] == before + 1
+    with pytest.raises(LookupError):
+        await store.diff(doc_id, 1, 3)
+
+
+@pytest.mark.anyio
+async def test_export_renders_and_writes_off_the_loop(monkeypatch, tmp_path):
+    monkeypatch.setattr(artifacts, "_root", tmp_path)
+    write = artifacts.write
+
+    def slow_write(chunks, **kwargs):
+        time.sleep(0.3)  # a slow disk
+        return write(chunks, **kwargs)
+
+    monkeypatch.setattr(artifacts, "write", slow_write)
+    doc_id = uuid.uuid4()
+    await store.create_from_text(doc_id, "x" * 300_000)
+
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.005)
+
+    ticking = asyncio.create_task(ticker())
+    export = asyncio.create_task(handle_doc_export({"doc_id": str(doc_id), "format": "plain"}))
+    await asyncio.sleep(0.05)
+    # An edit during the export waits for it, so the artifact matches the version it reports
+    await store.local_insert(doc_id, 0, "y")
+    result = await export
+    ticking.cancel()
+
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
+    assert result["version"] == 1 and result["size"] == 300_000
+    assert store.peek(doc_id).version == 2
+    await store.drop(doc_id)
+
+
+@pytest.mark.anyio
+async def test_loop_monitor_reports_blocked_loop(monkeypatch):
+    monkeypatch.setattr(get_settings(), "loop_lag_interval_ms", 10)
+    monkeypatch.setattr(get_settings(), "loop_lag_warn_ms", 50)
+    monitor = LoopLagMonitor()
+    await monitor.start()
+    await asyncio.sleep(0.03)
+    time.sleep(0.2)  # blocks the loop
+    await asyncio.sleep(0.03)
+    await monitor.stop()
+
+    assert monitor.stalls == 1
+    assert monitor.max_lag_s >= 0.15
+    # The watchdog caught the loop thread inside the blocking call
+    assert "test_loop_monitor_reports_blocked_loop" in monitor.last_stall_stack
+    assert "event_loop_stalls_total 1" in monitor.render()
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import uuid
+
+from fastapi.testclient import TestClient
+
+from rt_collab.core.config import get_settings
+from rt_collab.main import app
+from rt_collab.services.docs import store
+from rt_collab.ws.presence import PresenceHub
+
+
+def test_updates_coalesce_into_one_diff_per_doc():
+    hub = PresenceHub()
+    doc = uuid.uuid4()
+    for i in range(5):
+        hub.update(doc, "alice", {"index": i})
+    hub.update(doc, "bob", {"index": 9})
+
+    frames = hub.drain()
+    assert len(frames) == 1
+    _, frame = frames[0]
+    assert frame["updated"] == {"alice": {"data": {"index": 4}, "ts": None}, "bob": {"data": {"index": 9}, "ts": None}}
+    assert hub.drain() == []  # nothing changed since
+
+    hub.remove(doc, "bob")
+    (_, frame), = hub.drain()
+    assert frame == {"type": "presence", "updated": {}, "removed": ["bob"]}
+
+
+def test_stale_clients_expire(monkeypatch):
+    hub = PresenceHub()
+    doc = uuid.uuid4()
+    hub.update(doc, "idle", {"index": 1})
+    hub.drain()
+    monkeypatch.setattr(get_settings(), "presence_ttl_s", -1.0)
+
+    (_, frame), = hub.drain()
+    assert frame["removed"] == ["idle"]
+    assert hub.snapshot(doc) == {}
+
+
+def test_joiners_get_presence_snapshot_and_batched_frames():
+    doc_id = uuid.uuid4()
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/v1/ws/docs/{doc_id}?client_id=alice") as alice:
+            assert alice.receive_json()["client_id"] == "alice"
+            alice.send_json({"type": "edit.insert", "index": 0, "text": "hello"})
+            alice.receive_json()
+            with client.websocket_connect(f"/v1/ws/docs/{doc_id}?client_id=bob") as bob:
+                bob.receive_json()
+                for i in range(3):
+                    alice.send_json({"type": "cursor.update", "data": {"index": i}})
+                # A flush tick may split the burst, but the last frame carries the latest cursor
+                for _ in range(3):
+                    frame = bob.receive_json()
+                    assert frame["type"] == "presence"
+                    if frame["updated"]["alice"]["data"]["index"] == 2:
+                        break
+                else:
+                    raise AssertionError("latest cursor never arrived")
+
+                with client.websocket_connect(f"/v1/ws/docs/{doc_id}?client_id=carol") as carol:
+                    snap = carol.receive_json()
+                    assert snap["presence"]["alice"]["data"]["index"] == 2
+
+
+def test_cursors_follow_concurrent_edits_without_resend():
+    hub = PresenceHub()
+    doc = uuid.uuid4()
+    with TestClient(app) as client:
+        client.portal.call(store.create_from_text, doc, "hello world")
+        hub.update(doc, "alice", {"index": 6})  # just before "world"
+        hub.drain()
+
+        client.portal.call(store.local_insert, doc, 0, ">> ")
+        (_, frame), = hub.drain()
+        assert frame["updated"]["alice"]["data"]["index"] == 9
+
+        client.portal.call(store.local_insert, doc, 11, "!")  # after alice's caret
+        assert hub.drain() == []
+
+
+def test_non_object_cursor_payload_is_nacked():
+    doc_id = uuid.uuid4()
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/v1/ws/docs/{doc_id}?client_id=alice") as alice:
+            alice.receive_json()
+            alice.send_json({"type": "cursor.update", "data": "x"})
+            assert alice.receive_json() == {"type": "nack", "reason": "bad_cursor_args"}
+            # The connection survives and keeps serving
+            alice.send_json({"type": "edit.insert", "index": 0, "text": "ok"})
+            assert alice.receive_json()["type"] == "ack"
+
+
+def test_cursors_sent_while_the_doc_is_busy_are_anchored_later():
+    hub = PresenceHub()
+    doc = uuid.uuid4()
+    with TestClient(app) as client:
+        client.portal.call(store.create_from_text, doc, "hello world")
+        state = store.peek(doc)
+        state.busy = True  # as if an executor thread held the CRDT
+        hub.update(doc, "alice", {"index": 6})
+        (_, frame), = hub.drain()
+        assert frame["updated"]["alice"]["data"]["index"] == 6
+
+        state.busy = False
+        assert hub.drain() == []  # pinned where it was, nothing to resend
+        client.portal.call(store.local_insert, doc, 0, ">> ")
+        (_, frame), = hub.drain()
+        assert frame["updated"]["alice"]["data"]["index"] == 9
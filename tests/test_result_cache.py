@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+
+import pytest
+
+from rt_collab.services.artifacts import LocalArtifactStore
+from rt_collab.services.docs import InMemoryDocStore
+from rt_collab.services.result_cache import JobResultCache
+from rt_collab.services.task_queue import JobStatus, TaskQueue
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def _finished(queue: TaskQueue, job_id: uuid.UUID) -> None:
+    for _ in range(200):
+        if queue.get_job(job_id).status == JobStatus.succeeded:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+@pytest.mark.anyio
+async def test_one_render_per_version_and_format():
+    queue, docs = TaskQueue(), InMemoryDocStore()
+    renders = []
+
+    async def render(payload):
+        doc_id = uuid.UUID(payload["doc_id"])
+        text, version = await docs.snapshot_text(doc_id)
+        renders.append((version, payload["format"]))
+        return {"version": version, "artifact_id": uuid.uuid4().hex}
+
+    queue.register_handler("doc.export", render)
+    cache = JobResultCache(queue, docs, max_bytes=10_000)
+    doc_id = uuid.uuid4()
+    await docs.create_from_text(doc_id, "hello")
+    await queue.start()
+    try:
+        payload = {"doc_id": str(doc_id), "format": "html"}
+        first, second = await asyncio.gather(
+            cache.submit("doc.export", doc_id, payload, variant="html"),
+            cache.submit("doc.export", doc_id, payload, variant="html"),
+        )
+        assert first.id == second.id
+        await _finished(queue, first.id)
+
+        again = await cache.submit("doc.export", doc_id, payload, variant="html")
+        assert again.id == first.id and again.status == JobStatus.succeeded
+        other = await cache.submit("doc.export", doc_id, {**payload, "format": "plain"}, variant="plain")
+        assert other.id != first.id
+        await _finished(queue, other.id)
+
+        await docs.local_insert(doc_id, 5, "!")
+        fresh = await cache.submit("doc.export", doc_id, payload, variant="html")
+        assert fresh.id != first.id
+        await _finished(queue, fresh.id)
+        assert (await cache.submit("doc.export", doc_id, payload, variant="html")).id == fresh.id
+    finally:
+        await queue.stop()
+
+    assert renders == [(1, "html"), (1, "plain"), (2, "html")]
+    assert cache.stats == {"hits": 2, "misses": 3, "coalesced": 1, "evictions": 0}
+    # The superseded html result is kept (no longer a hit), first in line for eviction
+    assert [key[2:] for key in cache._entries] == [(1, "html"), (1, "plain"), (2, "html")]
+
+
+@pytest.mark.anyio
+async def test_byte_budget_evicts_least_recently_used():
+    queue, docs = TaskQueue(), InMemoryDocStore()
+
+    async def digest(payload):
+        return {"version": 0, "pad": "x" * 400}
+
+    queue.register_handler("activity.digest", digest)
+    cache = JobResultCache(queue, docs, max_bytes=1000)
+    await queue.start()
+    try:
+        ids = [uuid.uuid4() for _ in range(3)]
+        for doc_id in ids:
+            job = await cache.submit("activity.digest", doc_id, {"doc_id": str(doc_id)})
+            await _finished(queue, job.id)
+    finally:
+        await queue.stop()
+    assert cache.stats["evictions"] == 1
+    assert cache.bytes <= 1000
+    assert [key[1] for key in cache._entries] == ids[1:]
+
+
+@pytest.mark.anyio
+async def test_superseded_results_stay_fetchable_until_evicted(tmp_path):
+    queue, docs, store = TaskQueue(), InMemoryDocStore(), LocalArtifactStore(tmp_path)
+
+    async def render(payload):
+        text, version = await docs.snapshot_text(uuid.UUID(payload["doc_id"]))
+        artifact = store.write([text.encode() * 100], filename="x.txt", content_type="text/plain")
+        return {"version": version, "artifact_id": artifact.id, "size": artifact.size}
+
+    queue.register_handler("doc.export", render)
+    queue.register_cleanup("doc.export", lambda job: store.delete(job.result["artifact_id"]))
+    cache = JobResultCache(queue, docs, max_bytes=1500)
+    a, b = uuid.uuid4(), uuid.uuid4()
+    await docs.create_from_text(a, "aaaaa")
+    await docs.create_from_text(b, "bbbbb")
+    await queue.start()
+    try:
+        other = await cache.submit("doc.export", b, {"doc_id": str(b)})
+        await _finished(queue, other.id)
+        first = await cache.submit("doc.export", a, {"doc_id": str(a)})
+        await _finished(queue, first.id)
+        old = first.result["artifact_id"]
+        assert cache.bytes > 1000  # the artifacts' bytes count toward the budget
+
+        await docs.local_insert(a, 0, "!")
+        fresh = await cache.submit("doc.export", a, {"doc_id": str(a)})
+        assert fresh.id != first.id
+        await _finished(queue, fresh.id)
+    finally:
+        await queue.stop()
+    # Over budget: the superseded result goes first, ahead of the older but current one
+    assert cache.stats["evictions"] == 1
+    assert queue.get_job(first.id) is None and store.get(old) is None
+    assert queue.get_job(other.id) is not None
+    assert sorted(p.name for p in tmp_path.glob("*.bin")) == sorted(
+        f"{job.result['artifact_id']}.bin" for job in (fresh, other)
+    )
+
+
+@pytest.mark.anyio
+async def test_superseded_result_is_not_released_while_within_budget(tmp_path):
+    queue, docs, store = TaskQueue(), InMemoryDocStore(), LocalArtifactStore(tmp_path)
+
+    async def render(payload):
+        text, version = await docs.snapshot_text(uuid.UUID(payload["doc_id"]))
+        artifact = store.write([text.encode()], filename="x.txt", content_type="text/plain")
+        return {"version": version, "artifact_id": artifact.id, "size": artifact.size}
+
+    queue.register_handler("doc.export", render)
+    queue.register_cleanup("doc.export", lambda job: store.delete(job.result["artifact_id"]))
+    cache = JobResultCache(queue, docs, max_bytes=10_000)
+    doc_id = uuid.uuid4()
+    await docs.create_from_text(doc_id, "hello")
+    await queue.start()
+    try:
+        first = await cache.submit("doc.export", doc_id, {"doc_id": str(doc_id)})
+        await _finished(queue, first.id)
+        await docs.local_insert(doc_id, 0, "!")
+        fresh = await cache.submit("doc.export", doc_id, {"doc_id": str(doc_id)})
+        await _finished(queue, fresh.id)
+    finally:
+        await queue.stop()
+    # A client still polling the old job id or holding its download URL is served
+    assert queue.get_job(first.id).status == JobStatus.succeeded
+    assert store.get(first.result["artifact_id"]) is not None
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from rt_collab.core.config import get_settings
+from rt_collab.main import app
+from rt_collab.services.cron import CronExpr
+from rt_collab.services.task_queue import LocalScheduleLock, Schedule, TaskQueue, task_queue
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def test_cron_next_after():
+    monday = datetime(2026, 10, 19, 12, 34, 56)
+    assert CronExpr("*/15 * * * *").next_after(monday) == datetime(2026, 10, 19, 12, 45)
+    assert CronExpr("30 9 * * 1-5").next_after(monday) == datetime(2026, 10, 20, 9, 30)
+    assert CronExpr("@monthly").next_after(monday) == datetime(2026, 11, 1)
+    # Day-of-month and day-of-week both set: either matches (Friday the 23rd comes first)
+    assert CronExpr("0 0 13 * 5").next_after(monday) == datetime(2026, 10, 23)
+    assert CronExpr("0 12 29 2 *").next_after(monday) == datetime(2028, 2, 29, 12)
+    for bad in ("* * * *", "61 * * * *", "*/0 * * * *", "0 0 31 2 *"):
+        with pytest.raises(ValueError):
+            CronExpr(bad).next_after(monday)
+
+
+def test_interval_slots_are_utc_whatever_the_local_zone(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Kolkata")  # UTC+05:30
+    time.tzset()
+    try:
+        hourly = Schedule("h", "backup.run", {}, every_s=3600)
+        assert hourly.next_slot(datetime(2026, 10, 19, 12, 34)) == datetime(2026, 10, 19, 13, 0)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+@pytest.mark.anyio
+async def test_each_slot_runs_once_across_queues_and_overlap_is_skipped():
+    lock = LocalScheduleLock()  # stands in for the shared Redis
+    nodes = [TaskQueue(schedule_lock=lock), TaskQueue(schedule_lock=lock)]
+    for node in nodes:
+        node.add_schedule(Schedule("sweep", "backup.run", {}, every_s=60, jitter_s=5))
+    first = nodes[0].get_schedule("sweep")
+    assert first.slot.timestamp() % 60 == 0
+    assert first.slot <= first.next_run_at <= first.slot + timedelta(seconds=5)
+
+    due = first.slot + timedelta(seconds=6)
+    fired = [await node.fire_schedules(due) for node in nodes]
+    assert [len(f) for f in fired] == [1, 0]
+    assert nodes[1].get_schedule("sweep").skipped == 1
+
+    # Next slot: node 0's run is still queued, and holds the schedule's run
+    # lock, so neither node starts another one
+    later = due + timedelta(seconds=60)
+    fired = [await node.fire_schedules(later) for node in nodes]
+    assert [len(f) for f in fired] == [0, 0]
+    assert first.skipped == 1 and nodes[1].get_schedule("sweep").skipped == 2
+
+    # Once that run finishes the lock is released and the following slot fires
+    async def backup(payload):
+        return {}
+
+    nodes[0].register_handler("backup.run", backup)
+    await nodes[0].start(workers=1)
+    while nodes[0].get_job(first.last_job_id).status != "succeeded":
+        await asyncio.sleep(0.01)
+    await nodes[0].stop()
+    fired = [await node.fire_schedules(later + timedelta(seconds=60)) for node in nodes]
+    assert [len(f) for f in fired] == [1, 0]
+    assert first.runs == 2
+
+    nodes[0].pause_schedule("sweep")
+    assert await nodes[0].fire_schedules(later + timedelta(hours=1)) == []
+
+
+def test_schedules_api():
+    with TestClient(app) as client:
+        created = client.post(
+            "/v1/schedules", json={"name": "nightly", "type": "backup.run", "cron": "0 3 * * *", "jitter_s": 0}
+        ).json()
+        assert created["next_run_at"].endswith("03:00:00")
+        assert client.post("/v1/schedules", json={"name": "x", "type": "backup.run", "cron": "nope"}).status_code == 400
+        assert client.post("/v1/schedules", json={"name": "x", "type": "rm -rf", "every_s": 5}).status_code == 400
+
+        assert [s["name"] for s in client.get("/v1/schedules").json()] == ["nightly"]
+        paused = client.post("/v1/schedules/nightly/pause").json()
+        assert paused["paused"] and paused["next_run_at"] is None
+        assert client.post("/v1/schedules/nightly/resume").json()["paused"] is False
+        assert client.delete("/v1/schedules/nightly").status_code == 204
+        assert client.get("/v1/schedules/nightly").status_code == 404
+    assert task_queue.schedules() == []
+
+
+def test_schedule_tenant_comes_from_the_api_key(monkeypatch):
+    monkeypatch.setattr(get_settings(), "tenant_api_keys", "s3cret=acme")
+    body = {"name": "sweep", "type": "backup.run", "every_s": 60, "tenant": "victim"}
+    with TestClient(app) as client:
+        assert client.post("/v1/schedules", json=body).json()["tenant"] is None
+        assert client.post("/v1/schedules", json=body, headers={"X-Api-Key": "s3cret"}).json()["tenant"] == "acme"
+        assert client.delete("/v1/schedules/sweep").status_code == 204
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import random
+import uuid
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+
+from rt_collab.core.config import get_settings
+from rt_collab.main import app
+from rt_collab.services.crdt import TextCRDT
+from rt_collab.services.docs import InMemoryDocStore
+from rt_collab.services.search import SearchIndex, search_index
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def index_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "search.sqlite3")
+    monkeypatch.setattr(get_settings(), "search_index_path", path)
+    return path
+
+
+@pytest.mark.anyio
+async def test_incremental_updates_match_full_tokenization(index_path):
+    rng = random.Random(5)
+    store = InMemoryDocStore()
+    await store.reset()
+    doc_id = uuid.uuid4()
+    await store.create_from_text(doc_id, "The quick brown fox jumps over the lazy dog")
+    remote = TextCRDT(site_id="remote")
+    remote.apply({"type": "ins_batch", "atoms": [
+        {"pos": a.pos, "site": a.site_id, "ctr": a.counter, "ch": a.char} for a in store.peek(doc_id).crdt.atoms()
+    ]})
+    pieces = ["fox", " ", "dog ", "x", ".", "quick brown", "\n", "Ünïcode"]
+    for _ in range(200):
+        text, _ = await store.snapshot_text(doc_id)
+        roll = rng.random()
+        if roll < 0.35 and text:
+            op, _, _ = await store.local_delete(doc_id, rng.randrange(len(text)), rng.randint(1, 6))
+            remote.apply(op)
+        elif roll < 0.7:
+            op, _, _ = await store.local_insert(doc_id, rng.randint(0, len(text)), rng.choice(pieces))
+            remote.apply(op)
+        else:
+            # Remote batches (scattered inserts/deletes) go through apply_tracked
+            if text and rng.random() < 0.5:
+                op = remote.local_delete(rng.randrange(len(text)), rng.randint(1, 4))
+            else:
+                op = remote.local_insert(rng.randint(0, len(text)), rng.choice(pieces))
+            await store.apply_ops(doc_id, op)
+        text, _ = await store.snapshot_text(doc_id)
+        assert search_index._docs[doc_id].tf == dict(Counter(word.casefold() for word in _split(text)))
+
+
+def _split(text):
+    words, buf = [], []
+    for ch in text + " ":
+        if ch.isalnum() or ch == "_":
+            buf.append(ch)
+        elif buf:
+            words.append("".join(buf))
+            buf = []
+    return words
+
+
+@pytest.mark.anyio
+async def test_ranking_pagination_and_persistence(index_path):
+    index = SearchIndex()
+    docs = {name: uuid.uuid4() for name in ("both", "fox", "fox_twice", "none")}
+    texts = {
+        "both": "a fox and a dog",
+        "fox": "a fox sat by a long quiet river bank all day",
+        "fox_twice": "fox fox",
+        "none": "nothing to see",
+    }
+    for name, doc_id in docs.items():
+        index.index_doc(doc_id, TextCRDT.from_text(str(doc_id), texts[name]))
+
+    page = index.search("FOX dog")
+    assert page.total == 3
+    assert page.hits[0].doc_id == docs["both"]
+    assert page.hits[0].matches == {"fox": 1, "dog": 1}
+    assert index.search("fox", limit=1, offset=2).hits[0].doc_id == docs["fox"]
+    assert index.search("absent").total == 0
+
+    assert await index.flush() > 0
+    await index.stop()
+    reloaded = SearchIndex()
+    await reloaded.load(docs.values())
+    assert [h.doc_id for h in reloaded.search("fox dog").hits] == [h.doc_id for h in page.hits]
+    # A doc loaded from disk is re-tokenized from its CRDT on its next edit
+    crdt = TextCRDT.from_text(str(docs["none"]), "now a dog")
+    reloaded.index_doc(docs["none"], crdt)
+    assert reloaded.search("dog").total == 2
+    await reloaded.stop()
+
+    # After a restart that lost "both", its postings are stale: dropped from the file too
+    survivors = [doc_id for name, doc_id in docs.items() if name != "both"]
+    restarted = SearchIndex()
+    await restarted.start(survivors)
+    assert restarted.search("fox").total == 2
+    await restarted.stop()
+    again = SearchIndex()
+    await again.load()
+    assert docs["both"] not in again._docs
+    again.reset()  # reset wipes the file as well as memory
+    assert await again.load() == 0
+    await again.stop()
+
+
+def test_search_endpoint(index_path):
+    with TestClient(app) as client:
+        doc_id = client.post("/v1/docs", json={"content": "Collaborative editing with CRDTs"}).json()["id"]
+        body = client.get("/v1/search", params={"q": "crdts editing"}).json()
+        assert body["total"] == 1
+        assert body["results"][0]["doc_id"] == doc_id
+        assert body["results"][0]["matches"] == {"crdts": 1, "editing": 1}
+        assert "search_query_seconds_count" in client.get("/metrics").text
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from rt_collab.main import app
+from rt_collab.services.docs import InMemoryDocStore, store
+from rt_collab.services.snapshot_cache import SnapshotFrameCache
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.mark.anyio
+async def test_concurrent_misses_share_one_encode():
+    docs = InMemoryDocStore()
+    doc_id = uuid.uuid4()
+    await docs.create_from_text(doc_id, "storm " * 1000)
+    cache = SnapshotFrameCache(docs, max_bytes=2**20)
+    cache.offload_min_chars = 0  # force the thread hop so waiters pile up
+
+    entries = await asyncio.gather(*(cache.get(doc_id, "json") for _ in range(20)))
+    assert all(e is entries[0] for e in entries)
+    assert cache.stats["misses"] == 1 and cache.stats["coalesced"] == 19
+
+    await docs.local_insert(doc_id, 0, "x")
+    newer = await cache.get(doc_id, "json")
+    assert newer.version == entries[0].version + 1 and newer.etag != entries[0].etag
+    assert cache.bytes == len(newer.payload)  # the old version was dropped
+
+
+@pytest.mark.anyio
+async def test_byte_budget_evicts_least_recently_used():
+    docs = InMemoryDocStore()
+    ids = [uuid.uuid4() for _ in range(3)]
+    for doc_id in ids:
+        await docs.create_from_text(doc_id, "a" * 100)
+    cache = SnapshotFrameCache(docs, max_bytes=250)
+    for doc_id in ids[:2]:
+        await cache.get(doc_id, "json")
+    await cache.get(ids[0], "json")  # touch: ids[1] is now the LRU entry
+    await cache.get(ids[2], "json")
+
+    assert cache.stats["evictions"] == 1 and cache.bytes <= 250
+    await cache.get(ids[0], "json")
+    assert cache.stats["hits"] == 2
+
+
+def test_rest_snapshot_supports_etags():
+    with TestClient(app) as client:
+        doc_id = client.post("/v1/docs", json={"content": "cached"}).json()["id"]
+        first = client.get(f"/v1/docs/{doc_id}")
+        assert first.json() == {"id": doc_id, "text": "cached", "version": 1}
+        etag = first.headers["etag"]
+
+        unchanged = client.get(f"/v1/docs/{doc_id}", headers={"If-None-Match": etag})
+        assert unchanged.status_code == 304 and unchanged.headers["etag"] == etag
+
+        client.portal.call(store.local_insert, uuid.UUID(doc_id), 6, "!")
+        changed = client.get(f"/v1/docs/{doc_id}", headers={"If-None-Match": etag})
+        assert changed.status_code == 200 and changed.json()["text"] == "cached!"
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import time
+import uuid
+
+import pytest
+
+from rt_collab.core.config import get_settings
+from rt_collab.services.snapshot_scheduler import SnapshotScheduler
+from rt_collab.services.task_queue import TaskQueue
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    s = get_settings()
+    for name, value in {
+        "snapshot_interval": 5,
+        "snapshot_bytes": 1000,
+        "snapshot_idle_s": 2.0,
+        "snapshot_max_delay_s": 30.0,
+        "snapshot_pressure_bytes": 10_000,
+    }.items():
+        monkeypatch.setattr(s, name, value)
+    return s
+
+
+def _snapshot_jobs(queue: TaskQueue):
+    return [j for j in queue.all_jobs().values() if j.type == "snapshot.create"]
+
+
+@pytest.mark.anyio
+async def test_counts_edits_and_coalesces_while_a_job_is_pending(settings):
+    queue = TaskQueue()
+    sched = SnapshotScheduler(queue)
+    doc_id = uuid.uuid4()
+    for _ in range(4):
+        await sched.note_edit(doc_id)
+    assert _snapshot_jobs(queue) == []
+
+    # A burst of 3 edits in one batch still trips the threshold it jumps past
+    await sched.note_edit(doc_id, 3)
+    jobs = _snapshot_jobs(queue)
+    assert len(jobs) == 1 and jobs[0].payload == {"doc_id": str(doc_id)} and jobs[0].idempotency_key is None
+
+    for _ in range(10):
+        await sched.note_edit(doc_id)
+    assert len(_snapshot_jobs(queue)) == 1
+    assert sched.stats == {"scheduled": 1, "coalesced": 1}
+
+    jobs[0].mark_complete({"version": 15})
+    sched._on_finished(jobs[0])
+    await sched.note_edit(doc_id)
+    assert len(_snapshot_jobs(queue)) == 2
+
+
+@pytest.mark.anyio
+async def test_idle_and_max_delay_timers(settings):
+    queue = TaskQueue()
+    sched = SnapshotScheduler(queue)
+    quiet, busy = uuid.uuid4(), uuid.uuid4()
+    await sched.note_edit(quiet)
+    await sched.note_edit(busy)
+    now = time.monotonic()
+    assert sched.due(now) == []
+    assert sched.due(now + 2.5) == [quiet, busy]
+
+    # busy keeps typing: not idle, but the max delay still forces a snapshot
+    sched._docs[busy].last_edit = now + 29
+    assert sched.due(now + 29.5) == [quiet]
+    assert sched.due(now + 31) == [quiet, busy]
+    await sched.tick(now + 31)
+    assert len(_snapshot_jobs(queue)) == 2
+    assert sched.due(now + 60) == []
+
+
+@pytest.mark.anyio
+async def test_pressure_snapshots_dirtiest_docs_and_failures_restore_work(settings):
+    settings.snapshot_bytes = 100_000
+    queue = TaskQueue()
+    sched = SnapshotScheduler(queue)
+    small, large = uuid.uuid4(), uuid.uuid4()
+    await sched.note_edit(small, 3000)
+    await sched.note_edit(large, 7500)
+    jobs = _snapshot_jobs(queue)
+    assert [j.payload["doc_id"] for j in jobs] == [str(large)]
+    assert sched.dirty_bytes == 3000
+
+    jobs[0].mark_dead("boom")
+    sched._on_finished(jobs[0])
+    assert sched.dirty_bytes == 10_500
+    assert sched._docs[large].pending is None and sched._docs[large].bytes == 7500
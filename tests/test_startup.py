@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from rt_collab.db import database
+
+
+def test_importing_app_defers_db_redis_and_server_modules():
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    snippet = (
+        "import sys, rt_collab.main; "
+        "print(sorted(m for m in ('sqlalchemy', 'redis', 'uvicorn', 'rt_collab.services.job_handlers') if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", snippet], env={**os.environ, "PYTHONPATH": src}, capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == "[]"
+
+
+def test_lifespan_registers_handlers_and_leaves_engine_unopened():
+    from rt_collab.main import app
+    from rt_collab.services.task_queue import task_queue
+
+    with TestClient(app) as client:
+        assert client.get("/healthz").status_code == 200
+        assert "doc.export" in task_queue._handlers
+    assert database._engine is None
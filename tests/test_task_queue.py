@@ -1,8 +1,13 @@
 from __future__ import annotations
 
 import asyncio
+import time
 
 import pytest
+from fastapi.testclient import TestClient
+
+from rt_collab.core.config import get_settings
+from rt_collab.main import app
 
 from rt_collab.services.task_queue import RetryableError, TaskQueue
 
@@ -61,3 +66,133 @@ async def test_idempotent_enqueue_reuses_job():
 
     assert job1.id == job2.id
     assert result.result == {"ok": True}
+
+
+@pytest.mark.anyio
+async def test_batch_handler_maps_results_and_failures_per_job():
+    queue = TaskQueue()
+    calls = []
+
+    async def batch(payloads):
+        calls.append([p["n"] for p in payloads])
+        return [RetryableError("odd") if p["n"] == 3 else {"double": p["n"] * 2} for p in payloads]
+
+    async def single(payload):
+        return {"single": True}
+
+    queue.register_batch_handler("work", batch, max_batch=4, max_wait_ms=20)
+    queue.register_handler("other", single)
+    jobs = [await queue.enqueue("work", {"n": n}, max_attempts=1) for n in range(6)]
+    other = await queue.enqueue("other", {})
+    await queue.start()
+
+    done = [await wait_for_status(queue, job.id, {"succeeded", "dead"}) for job in jobs]
+    assert (await wait_for_status(queue, other.id, {"succeeded"})).result == {"single": True}
+    await queue.stop()
+
+    assert calls == [[0, 1, 2, 3], [4, 5]]
+    assert [job.result for job in done if job.status == "succeeded"] == [{"double": n * 2} for n in (0, 1, 2, 4, 5)]
+    assert done[3].status == "dead" and done[3].error == "odd"
+    assert (queue.metrics.batches, queue.metrics.batched_jobs) == (2, 6)
+
+
+@pytest.mark.anyio
+async def test_batch_handler_exception_fails_the_whole_batch():
+    queue = TaskQueue()
+
+    async def broken(payloads):
+        raise ValueError("nope")
+
+    queue.register_batch_handler("work", broken, max_batch=10)
+    jobs = [await queue.enqueue("work", {}) for _ in range(3)]
+    await queue.start()
+    done = [await wait_for_status(queue, job.id, {"failed"}) for job in jobs]
+    await queue.stop()
+    assert {job.error for job in done} == {"nope"}
+
+
+@pytest.mark.anyio
+async def test_batch_takes_only_its_type_and_leaves_the_rest_in_order():
+    queue = TaskQueue()
+    other = [await queue.enqueue("other", {"n": n}) for n in range(500)]
+    work = [await queue.enqueue("work", {"n": n}) for n in range(5)]
+    state = queue._tenants["default"]
+    other_heap = state.pending["other"]
+
+    taken = await queue._take_ready("default", "work", 3)
+    assert [job.id for job in taken] == [job.id for job in work[:3]]
+    # The other type's heap was never popped or rebuilt
+    assert state.pending["other"] is other_heap and len(other_heap) == 500
+    assert queue.queue_depths() == {"default": 502}
+
+    assert len(await queue._take_ready("default", "work", 10)) == 2
+    assert "work" not in state.pending
+    first = await queue._dispatch()
+    assert first.id == other[0].id
+
+
+@pytest.mark.anyio
+async def test_weighted_fair_queuing_across_tenants():
+    queue = TaskQueue()
+    order = []
+
+    async def work(payload):
+        order.append(payload["tenant_id"])
+        await asyncio.sleep(0.002)
+
+    queue.register_handler("work", work)
+    queue.set_tenant("bulk", weight=3)
+    # "bulk" floods the queue before "small" shows up
+    jobs = [await queue.enqueue("work", {"tenant_id": "bulk"}, tenant="bulk") for _ in range(60)]
+    jobs += [await queue.enqueue("work", {"tenant_id": "small"}, tenant="small") for _ in range(10)]
+    assert queue.queue_depths() == {"bulk": 60, "small": 10}
+    await queue.start(workers=1)
+    for job in jobs:
+        await wait_for_status(queue, job.id, {"succeeded"})
+    await queue.stop()
+
+    # Interleaved at roughly 3:1 rather than all of "bulk" first
+    first = order[:24]
+    assert 3 <= first.count("small") <= 9
+    assert order.index("small") < 6
+    assert queue.tenant_metrics.completed == {"bulk": 60, "small": 10}
+    assert queue.tenant_metrics.wait["small"].total == 10
+
+    # Idle tenants are dropped, queue state and metric series alike; set_tenant ones stay
+    assert queue.evict_idle_tenants(now=time.monotonic() + 3600) == ["small"]
+    assert list(queue.queue_depths()) == ["bulk"]
+    assert queue.tenant_metrics.completed == {"bulk": 60}
+
+
+@pytest.mark.anyio
+async def test_tenant_concurrency_cap():
+    queue = TaskQueue()
+    running = {"a": 0, "b": 0}
+    peak = {"a": 0, "b": 0}
+
+    async def work(payload):
+        tenant = payload["tenant_id"]
+        running[tenant] += 1
+        peak[tenant] = max(peak[tenant], running[tenant])
+        await asyncio.sleep(0.01)
+        running[tenant] -= 1
+
+    queue.register_handler("work", work)
+    queue.set_tenant("a", max_concurrent=1)
+    jobs = [await queue.enqueue("work", {"tenant_id": t}, tenant=t) for t in "ab" * 6]
+    await queue.start(workers=4)
+    for job in jobs:
+        await wait_for_status(queue, job.id, {"succeeded"})
+    await queue.stop()
+    assert peak["a"] == 1 and peak["b"] > 1
+
+
+def test_tenant_comes_from_the_api_key_not_the_request(monkeypatch):
+    monkeypatch.setattr(get_settings(), "tenant_api_keys", "s3cret=acme")
+    with TestClient(app) as client:
+        body = {"type": "email.notify", "payload": {"tenant_id": "spoofed", "recipients": ["a@b.c"]}}
+        claimed = client.post("/v1/jobs", json=body, headers={"X-Tenant-Id": "spoofed"}).json()
+        assert claimed["tenant"] == "default"
+        keyed = client.post("/v1/jobs", json=body, headers={"X-Api-Key": "s3cret"}).json()
+        assert keyed["tenant"] == "acme"
+        assert client.post("/v1/jobs", json=body, headers={"X-Api-Key": "guess"}).json()["tenant"] == "default"
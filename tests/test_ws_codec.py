@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from hypothesis import given, strategies as st
+
+from rt_collab.main import app
+from rt_collab.ws.codec import MSGPACK_CODEC, SUBPROTOCOL_MSGPACK, negotiate, packb, splice_snapshot, unpackb
+
+frames = st.recursive(
+    st.none() | st.booleans() | st.integers(min_value=-(2**63), max_value=2**64 - 1)
+    | st.floats(allow_nan=False) | st.text(),
+    lambda children: st.lists(children, max_size=5) | st.dictionaries(st.text(max_size=8), children, max_size=5),
+    max_leaves=30,
+)
+
+
+@given(frames)
+def test_msgpack_round_trips(value):
+    assert unpackb(packb(value)) == value
+
+
+def test_msgpack_rejects_garbage_and_negotiates():
+    for bad in (b"", b"\x92\x01", b"\xc1", b"\x01\x02", b"\xdd\xff\xff\xff\xff"):
+        with pytest.raises(ValueError):
+            unpackb(bad)
+    assert negotiate(["chat", SUBPROTOCOL_MSGPACK])[0] == SUBPROTOCOL_MSGPACK
+    assert negotiate([])[0] is None
+
+
+@pytest.mark.parametrize("count", [3, 13, 14, 40])
+def test_spliced_snapshot_decodes_past_fixmap_size(count):
+    fields = {f"f{i}": i for i in range(count)}
+    frame = splice_snapshot(MSGPACK_CODEC, packb("hello"), fields)
+    assert unpackb(frame) == {"type": "snapshot", "text": "hello", **fields}
+
+
+def test_binary_and_json_clients_share_a_doc():
+    doc_id = uuid.uuid4()
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/v1/ws/docs/{doc_id}", subprotocols=[SUBPROTOCOL_MSGPACK]) as binary:
+            assert unpackb(binary.receive_bytes())["type"] == "snapshot"
+            with client.websocket_connect(f"/v1/ws/docs/{doc_id}") as plain:
+                plain.receive_json()
+                binary.send_bytes(packb({"type": "edit.insert", "index": 0, "text": "héllo"}))
+                ack = unpackb(binary.receive_bytes())
+                assert ack == {"type": "ack", "version": 1, "text": "héllo"}
+                assert plain.receive_json()["text"] == "héllo"
+
+                plain.send_json({"type": "edit.delete", "index": 0, "length": 1})
+                plain.receive_json()
+                assert unpackb(binary.receive_bytes())["text"] == "éllo"
+
+                binary.send_bytes(b"\xc1")
+                assert unpackb(binary.receive_bytes())["reason"] == "invalid_frame"
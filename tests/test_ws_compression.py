@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import zlib
+
+import pytest
+import websockets
+from fastapi.testclient import TestClient
+from websockets.frames import Frame, Opcode
+
+from rt_collab.core.config import get_settings
+from rt_collab.loadtest.runner import serve_inprocess
+from rt_collab.main import app
+from rt_collab.services.snapshot_cache import snapshot_cache
+from rt_collab.ws.compression import PRECOMPRESSED_MARKER, deflate_factory
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def test_small_and_precompressed_frames_skip_deflate(monkeypatch):
+    monkeypatch.setattr(get_settings(), "ws_compress_min_bytes", 64)
+    _, ext = deflate_factory().process_request_params([], [])
+
+    assert not ext.encode(Frame(Opcode.TEXT, b'{"type":"ack","version":1}')).rsv1
+    assert not ext.encode(Frame(Opcode.BINARY, PRECOMPRESSED_MARKER + b"\x00" * 500)).rsv1
+    big = ext.encode(Frame(Opcode.TEXT, b"hello world " * 100))
+    assert big.rsv1 and len(big.data) < 100
+
+
+def test_joiners_share_one_compressed_snapshot(monkeypatch):
+    monkeypatch.setattr(get_settings(), "ws_compress_min_bytes", 64)
+    snapshot_cache.reset()
+    content = "shared paragraph " * 200
+    with TestClient(app) as client:
+        doc_id = client.post("/v1/docs", json={"title": "Big", "content": content}).json()["id"]
+        for _ in range(3):
+            with client.websocket_connect(f"/v1/ws/docs/{doc_id}?compress=deflate") as ws:
+                snapshot = ws.receive_json()
+                assert snapshot["text"] is None and snapshot["text_encoding"] == "deflate"
+                body = ws.receive_bytes()
+                assert body[:1] == PRECOMPRESSED_MARKER and len(body) < len(content) // 10
+                assert zlib.decompress(body[1:], -15).decode() == content
+        with client.websocket_connect(f"/v1/ws/docs/{doc_id}") as ws:
+            assert ws.receive_json()["text"] == content  # no opt-in, plain snapshot
+    # One deflate encode for three joiners (plus the JSON encoding used for sizing)
+    assert snapshot_cache.stats["misses"] == 2
+
+
+@pytest.mark.anyio
+async def test_uvicorn_protocol_negotiates_tuned_deflate():
+    async with serve_inprocess() as base_url:
+        url = base_url.replace("http", "ws", 1) + "/v1/ws/docs/6b1e5c9e-8a51-4d6c-9a39-7f0d2f1c8e11"
+        async with websockets.connect(url) as ws:
+            await ws.recv()
+            (ext,) = ws.protocol.extensions
+            assert ext.remote_max_window_bits == get_settings().ws_deflate_window_bits
+
+
+def test_snapshot_threshold_follows_reloaded_settings(monkeypatch):
+    monkeypatch.setenv("WS_COMPRESS_MIN_BYTES", "1")
+    get_settings.cache_clear()
+    try:
+        snapshot_cache.reset()
+        with TestClient(app) as client:
+            doc_id = client.post("/v1/docs", json={"content": "tiny"}).json()["id"]
+            with client.websocket_connect(f"/v1/ws/docs/{doc_id}?compress=deflate") as ws:
+                assert ws.receive_json()["text_encoding"] == "deflate"
+                assert zlib.decompress(ws.receive_bytes()[1:], -15) == b"tiny"
+    finally:
+        get_settings.cache_clear()
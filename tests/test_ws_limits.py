@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import uuid
+
+from fastapi.testclient import TestClient
+
+from rt_collab.core.config import get_settings
+from rt_collab.main import app
+from rt_collab.ws.limits import TokenBucket, limiter
+
+
+def test_token_bucket_allows_burst_then_refills(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("rt_collab.ws.limits.time.monotonic", lambda: clock[0])
+    bucket = TokenBucket(rate=10, burst=3)
+    assert [bucket.try_take() for _ in range(4)] == [True, True, True, False]
+    assert abs(bucket.retry_after() - 0.1) < 1e-9
+    clock[0] += 0.15
+    assert bucket.try_take()
+    assert not bucket.try_take()
+
+
+def test_flooding_client_gets_rate_limited_nacks(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "ws_conn_rate", 0.001)
+    monkeypatch.setattr(settings, "ws_conn_burst", 3)
+    limiter.reset()
+    doc_id = uuid.uuid4()
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/v1/ws/docs/{doc_id}") as ws:
+            ws.receive_json()
+            for i in range(5):
+                ws.send_json({"type": "edit.insert", "index": i, "text": "x"})
+            replies = [ws.receive_json() for _ in range(5)]
+        assert [r["type"] for r in replies] == ["ack", "ack", "ack", "nack", "nack"]
+        assert replies[-1]["reason"] == "rate_limited"
+        assert replies[-1]["scope"] == "connection"
+        assert replies[-1]["retry_after_ms"] > 0
+        assert replies[2]["text"] == "xxx"
+        assert 'ws_throttled_total{scope="connection"} 2' in client.get("/metrics").text
+    limiter.reset()
+
+
+def test_client_sent_nack_is_not_reflected():
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/v1/ws/docs/{uuid.uuid4()}") as ws:
+            ws.receive_json()
+            ws.send_json({"type": "nack", "reason": "rate_limited", "forged": True})
+            assert ws.receive_json() == {"type": "nack", "reason": "unknown_type"}
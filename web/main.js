@@ -9,16 +9,48 @@
   const statusPill = $("status");
   const statusText = $("statusText");
   const activeDoc = $("activeDoc");
+  const peersChip = $("peers");
   const endpoint = $("endpoint");
   const howToToggle = $("howToToggle");
   const howToContent = $("howToContent");
   const howToPanel = howToContent ? howToContent.parentElement : null;
 
   const LAST_DOC_KEY = "rtc_last_doc_id";
+  // Offer the compact binary protocol first; `?proto=json` on the page URL forces JSON
+  const PROTOCOLS = new URLSearchParams(location.search).get("proto") === "json" || !window.RtcMsgpack
+    ? ["rtc.json.v1"]
+    : ["rtc.msgpack.v1", "rtc.json.v1"];
 
   let ws = null;
   let suppressLocal = false;
   let lastText = "";
+  let clientId = null;
+  const peers = new Map(); // client_id -> latest cursor data from presence frames
+
+  function renderPeers() {
+    if (peersChip) peersChip.textContent = `${peers.size} other${peers.size === 1 ? "" : "s"} here`;
+  }
+  // Encode for whichever subprotocol the server picked in the handshake
+  function send(msg) {
+    ws.send(ws.protocol === "rtc.msgpack.v1" ? window.RtcMsgpack.encode(msg) : JSON.stringify(msg));
+  }
+  function parseFrame(raw) {
+    return typeof raw === "string" ? JSON.parse(raw) : window.RtcMsgpack.decode(raw);
+  }
+  // Large join snapshots can arrive as one raw-deflate binary frame (marker byte 0xC1)
+  const CAN_INFLATE = typeof DecompressionStream !== "undefined";
+  async function inflateText(raw) {
+    const stream = new Blob([new Uint8Array(raw, 1)]).stream().pipeThrough(new DecompressionStream("deflate-raw"));
+    return new Response(stream).text();
+  }
+  function sendCursor() {
+    if (!ws || ws.readyState !== WebSocket.OPEN) return;
+    send({
+      type: 'cursor.update',
+      data: { index: editor.selectionStart, end: editor.selectionEnd },
+      ts: Date.now(),
+    });
+  }
   const setActiveDoc = (id) => {
     const val = (id || "").trim();
     activeDoc.textContent = val || "None";
@@ -56,41 +88,80 @@
     return i;
   }
 
+  // Map a caret through an old -> new text change (single edited region via prefix/suffix)
+  function transformCaret(pos, oldText, newText) {
+    const p = lcp(oldText, newText);
+    if (pos <= p) return pos;
+    const s = lcs(oldText.slice(p), newText.slice(p));
+    if (pos >= oldText.length - s) return pos + (newText.length - oldText.length);
+    return Math.min(pos, newText.length - s);
+  }
+  // Apply authoritative text without yanking the local caret/selection
+  function applyRemoteText(text) {
+    const next = text || "";
+    if (next !== editor.value) {
+      const start = transformCaret(editor.selectionStart, editor.value, next);
+      const end = transformCaret(editor.selectionEnd, editor.value, next);
+      suppressLocal = true;
+      editor.value = next;
+      if (document.activeElement === editor) editor.setSelectionRange(start, end);
+      setTimeout(() => (suppressLocal = false), 0);
+    }
+    lastText = editor.value;
+  }
+
   function connect(docId) {
     if (ws) { ws.close(); ws = null; }
-    const url = `${location.protocol === 'https:' ? 'wss' : 'ws'}://${location.host}/v1/ws/docs/${docId}`;
-    ws = new WebSocket(url);
+    const url = `${location.protocol === 'https:' ? 'wss' : 'ws'}://${location.host}/v1/ws/docs/${docId}${CAN_INFLATE ? '?compress=deflate' : ''}`;
+    ws = new WebSocket(url, PROTOCOLS);
+    ws.binaryType = "arraybuffer";
     setActiveDoc(docId);
     setStatus("connecting", "Connecting...");
-    ws.onopen = () => setStatus("connected", "Connected");
-    ws.onclose = () => setStatus("disconnected", "Disconnected");
+    ws.onopen = () => setStatus("connected", `Connected (${ws.protocol === "rtc.msgpack.v1" ? "binary" : "json"})`);
+    ws.onclose = () => { setStatus("disconnected", "Disconnected"); peers.clear(); renderPeers(); };
     ws.onerror = (e) => addLog({ error: 'ws', details: e });
-    ws.onmessage = (ev) => {
+    let pendingSnapshot = null;
+    let inbox = Promise.resolve();
+    // Inflating is async, so frames are handled through a chain to keep their order
+    ws.onmessage = (ev) => { inbox = inbox.then(() => handleFrame(ev.data)).catch(() => {}); };
+    async function handleFrame(raw) {
       let data;
-      try { data = JSON.parse(ev.data); } catch { return; }
+      if (pendingSnapshot && typeof raw !== "string" && new Uint8Array(raw)[0] === 0xc1) {
+        data = { ...pendingSnapshot, text: await inflateText(raw) };
+        pendingSnapshot = null;
+      } else {
+        try { data = parseFrame(raw); } catch { return; }
+      }
+      if (data.type === 'snapshot' && data.text_encoding === 'deflate') {
+        pendingSnapshot = data;
+        return;
+      }
       if (data.type === 'snapshot') {
         suppressLocal = true;
         editor.value = data.text || "";
         lastText = editor.value;
         setTimeout(() => (suppressLocal = false), 0);
         addLog({ snapshot: { version: data.version } });
+        clientId = data.client_id || null;
+        peers.clear();
+        Object.entries(data.presence || {}).forEach(([id, p]) => { if (id !== clientId) peers.set(id, p); });
+        renderPeers();
+      } else if (data.type === 'presence') {
+        // Batched diff: only clients that moved, plus the ones that left
+        Object.entries(data.updated || {}).forEach(([id, p]) => { if (id !== clientId) peers.set(id, p); });
+        (data.removed || []).forEach((id) => peers.delete(id));
+        renderPeers();
       } else if (data.type === 'doc.update') {
-        suppressLocal = true;
-        editor.value = data.text || "";
-        lastText = editor.value;
-        setTimeout(() => (suppressLocal = false), 0);
+        // Our caret is mapped locally and peers get it re-resolved from its
+        // CRDT anchor server-side, so no cursor.update is needed after this
+        applyRemoteText(data.text);
       } else if (data.type === 'ack') {
         // keep editor in sync with authoritative text if provided
-        if (typeof data.text === 'string') {
-          suppressLocal = true;
-          editor.value = data.text;
-          lastText = editor.value;
-          setTimeout(() => (suppressLocal = false), 0);
-        }
+        if (typeof data.text === 'string') applyRemoteText(data.text);
       } else if (data.type === 'nack') {
         addLog({ nack: data });
       }
-    };
+    }
   }
 
   btnCreate.onclick = async () => {
@@ -128,18 +199,20 @@
 
     if (oldMid && !newMid) {
       // deletion
-      ws.send(JSON.stringify({ type: 'edit.delete', index: p, length: oldMid.length }));
+      send({ type: 'edit.delete', index: p, length: oldMid.length });
     } else if (!oldMid && newMid) {
       // insertion
-      ws.send(JSON.stringify({ type: 'edit.insert', index: p, text: newMid }));
+      send({ type: 'edit.insert', index: p, text: newMid });
     } else {
       // replacement = delete then insert
-      if (oldMid.length > 0) ws.send(JSON.stringify({ type: 'edit.delete', index: p, length: oldMid.length }));
-      if (newMid.length > 0) ws.send(JSON.stringify({ type: 'edit.insert', index: p, text: newMid }));
+      if (oldMid.length > 0) send({ type: 'edit.delete', index: p, length: oldMid.length });
+      if (newMid.length > 0) send({ type: 'edit.insert', index: p, text: newMid });
     }
 
     lastText = newText; // optimistic
   });
+  // The server keeps only the latest cursor and batches it, so sending on every move is fine
+  ['select', 'keyup', 'click'].forEach((evt) => editor.addEventListener(evt, sendCursor));
 
   // Show endpoint info on load
   endpoint.textContent = `Target: ${location.origin}`;
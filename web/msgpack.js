@@ -0,0 +1,125 @@
+// Minimal MessagePack codec for the rtc.msgpack.v1 WebSocket subprotocol.
+// Covers what the server sends: nil, bool, int, float64, str, bin, array, map.
+(() => {
+  const utf8enc = new TextEncoder();
+  const utf8dec = new TextDecoder();
+
+  function encode(value) {
+    let buf = new Uint8Array(256);
+    let view = new DataView(buf.buffer);
+    let pos = 0;
+    const ensure = (n) => {
+      if (pos + n <= buf.length) return;
+      let size = buf.length * 2;
+      while (size < pos + n) size *= 2;
+      const next = new Uint8Array(size);
+      next.set(buf);
+      buf = next;
+      view = new DataView(buf.buffer);
+    };
+    const u8 = (b) => { ensure(1); buf[pos++] = b; };
+    const head = (code, n, bytes) => {
+      ensure(1 + bytes);
+      buf[pos++] = code;
+      if (bytes === 1) view.setUint8(pos, n);
+      else if (bytes === 2) view.setUint16(pos, n);
+      else view.setUint32(pos, n);
+      pos += bytes;
+    };
+    const sized = (n, fixBase, fixMax, c8, c16, c32) => {
+      if (n <= fixMax) u8(fixBase | n);
+      else if (c8 && n <= 0xff) head(c8, n, 1);
+      else if (n <= 0xffff) head(c16, n, 2);
+      else head(c32, n, 4);
+    };
+    const write = (v) => {
+      if (v === null || v === undefined) u8(0xc0);
+      else if (v === false) u8(0xc2);
+      else if (v === true) u8(0xc3);
+      else if (typeof v === 'number') {
+        if (Number.isInteger(v) && v >= 0 && v < 0x80) u8(v);
+        else if (Number.isInteger(v) && v < 0 && v >= -0x20) u8(v & 0xff);
+        else if (Number.isInteger(v) && v >= 0 && v <= 0xffffffff) sized(v, 0, -1, 0xcc, 0xcd, 0xce);
+        else if (Number.isInteger(v) && v < 0 && v >= -0x80000000) {
+          ensure(5); buf[pos++] = 0xd2; view.setInt32(pos, v); pos += 4;
+        } else if (Number.isSafeInteger(v)) {
+          // Deep CRDT position digits outgrow 32 bits; keep them integers
+          ensure(9);
+          if (v > 0) { buf[pos++] = 0xcf; view.setBigUint64(pos, BigInt(v)); } else { buf[pos++] = 0xd3; view.setBigInt64(pos, BigInt(v)); }
+          pos += 8;
+        } else {
+          ensure(9); buf[pos++] = 0xcb; view.setFloat64(pos, v); pos += 8;
+        }
+      } else if (typeof v === 'string') {
+        const raw = utf8enc.encode(v);
+        sized(raw.length, 0xa0, 31, 0xd9, 0xda, 0xdb);
+        ensure(raw.length); buf.set(raw, pos); pos += raw.length;
+      } else if (v instanceof Uint8Array) {
+        sized(v.length, 0, -1, 0xc4, 0xc5, 0xc6);
+        ensure(v.length); buf.set(v, pos); pos += v.length;
+      } else if (Array.isArray(v)) {
+        sized(v.length, 0x90, 15, 0, 0xdc, 0xdd);
+        v.forEach(write);
+      } else {
+        const keys = Object.keys(v).filter((k) => v[k] !== undefined);
+        sized(keys.length, 0x80, 15, 0, 0xde, 0xdf);
+        keys.forEach((k) => { write(k); write(v[k]); });
+      }
+    };
+    write(value);
+    return buf.subarray(0, pos);
+  }
+
+  function decode(input) {
+    const buf = input instanceof Uint8Array ? input : new Uint8Array(input);
+    const view = new DataView(buf.buffer, buf.byteOffset, buf.byteLength);
+    let pos = 0;
+    const need = (n) => { if (pos + n > buf.length) throw new Error('truncated msgpack frame'); };
+    const str = (n) => { need(n); const s = utf8dec.decode(buf.subarray(pos, pos + n)); pos += n; return s; };
+    const bin = (n) => { need(n); const b = buf.slice(pos, pos + n); pos += n; return b; };
+    const num = (getter, size) => { need(size); const v = view[getter](pos); pos += size; return v; };
+    const big = (getter) => { need(8); const v = Number(view[getter](pos)); pos += 8; return v; };
+    const arr = (n) => { const out = new Array(n); for (let i = 0; i < n; i++) out[i] = read(); return out; };
+    const map = (n) => { const out = {}; for (let i = 0; i < n; i++) { const k = read(); out[k] = read(); } return out; };
+    function read() {
+      need(1);
+      const b = buf[pos++];
+      if (b < 0x80) return b;
+      if (b >= 0xe0) return b - 0x100;
+      if (b >= 0xa0 && b <= 0xbf) return str(b & 0x1f);
+      if (b >= 0x90 && b <= 0x9f) return arr(b & 0x0f);
+      if (b >= 0x80 && b <= 0x8f) return map(b & 0x0f);
+      switch (b) {
+        case 0xc0: return null;
+        case 0xc2: return false;
+        case 0xc3: return true;
+        case 0xcc: return num('getUint8', 1);
+        case 0xcd: return num('getUint16', 2);
+        case 0xce: return num('getUint32', 4);
+        case 0xcf: return big('getBigUint64');
+        case 0xd0: return num('getInt8', 1);
+        case 0xd1: return num('getInt16', 2);
+        case 0xd2: return num('getInt32', 4);
+        case 0xd3: return big('getBigInt64');
+        case 0xca: return num('getFloat32', 4);
+        case 0xcb: return num('getFloat64', 8);
+        case 0xd9: return str(num('getUint8', 1));
+        case 0xda: return str(num('getUint16', 2));
+        case 0xdb: return str(num('getUint32', 4));
+        case 0xc4: return bin(num('getUint8', 1));
+        case 0xc5: return bin(num('getUint16', 2));
+        case 0xc6: return bin(num('getUint32', 4));
+        case 0xdc: return arr(num('getUint16', 2));
+        case 0xdd: return arr(num('getUint32', 4));
+        case 0xde: return map(num('getUint16', 2));
+        case 0xdf: return map(num('getUint32', 4));
+        default: throw new Error(`unsupported msgpack type byte 0x${b.toString(16)}`);
+      }
+    }
+    const out = read();
+    if (pos !== buf.length) throw new Error('trailing bytes after msgpack frame');
+    return out;
+  }
+
+  window.RtcMsgpack = { encode, decode };
+})();